@@ -0,0 +1,540 @@
+"""
+SVG notation renderer for Music Theory AI Chat.
+This module draws simple single-staff tunes straight from the ABC tokens as
+SVG: notes, rests, chords, bar lines, key and time signatures, repeats and
+numbered endings, ties, slurs and chord symbols. A tune renders in
+milliseconds, without music21 or MuseScore. Tunes it cannot draw (several
+voices, tuplets, grace notes, decorations, key or meter changes) raise
+UnsupportedTune and are left to the MuseScore renderer.
+"""
+
+import re
+from fractions import Fraction
+from xml.sax.saxutils import escape
+
+from abc_tokenizer import default_unit_length, split_tune, tokenize_line
+
+# Part of the render cache key, bumped when the drawing changes
+RENDERER_VERSION = 1
+
+# Distance between two staff lines; notes move half of it per diatonic step
+LINE_GAP = 10
+STEP = LINE_GAP / 2
+MARGIN = 20
+CLEF_WIDTH = 34
+KEY_ACCIDENTAL_WIDTH = 9
+METER_WIDTH = 24
+STEM_LENGTH = 7 * STEP
+# Room kept above and below a staff for stems, chord symbols and endings
+ROOM_ABOVE = 45
+ROOM_BELOW = 35
+TITLE_HEIGHT = 34
+# Bar lines drawn as thin lines (t), thick lines (T) and repeat dots (:)
+BAR_SHAPES = {"|": "t", "||": "tt", "|]": "tT", "[|": "Tt", "|:": "Tt:", ":|": ":tT",
+              "::": ":tt:", ":|:": ":tt:", ":||:": ":tt:"}
+BAR_PART_WIDTHS = {"t": 4, "T": 7, ":": 6}
+
+# Diatonic position of the bottom staff line, counted in steps from C0
+CLEF_BOTTOM_LINE = {"treble": 4 * 7 + 2, "bass": 2 * 7 + 4}
+# Staff step of the line each clef is drawn around (G for treble, F for bass)
+CLEF_LINES = {"treble": 2, "bass": 6}
+# Staff steps (above the bottom treble line) of the key signature accidentals
+SHARP_STEPS = [8, 5, 9, 6, 3, 7, 4]
+FLAT_STEPS = [4, 7, 3, 6, 2, 5, 1]
+# Position of each tonic letter on the circle of fifths, and the fifths each mode moves the key by
+LETTER_FIFTHS = {"F": -1, "C": 0, "G": 1, "D": 2, "A": 3, "E": 4, "B": 5}
+MODE_FIFTHS = {"": 0, "maj": 0, "ion": 0, "m": -3, "min": -3, "aeo": -3, "mix": -1,
+               "dor": -2, "phr": -4, "lyd": 1, "loc": -5}
+NOTE_PATTERN = re.compile(r"^(\^\^|\^|=|__|_)?([A-Ga-g])([,']*)(.*)$")
+# Note values that can be drawn: whole to 32nd notes, with up to two dots
+NOTE_VALUES = [Fraction(1, 2 ** power) for power in range(6)]
+
+class UnsupportedTune(Exception):
+    """Raised for tunes the native renderer cannot draw."""
+
+def _parse_length(text):
+    """Return the length multiplier written after a note, e.g. 2, /2, 3/4 or //."""
+    try:
+        if not text:
+            return Fraction(1)
+        if '/' not in text:
+            return Fraction(int(text))
+        numerator, _, denominator = text.partition('/')
+        numerator = int(numerator) if numerator else 1
+        if not denominator.strip('/'):
+            return Fraction(numerator, 2 ** text.count('/'))
+        return Fraction(numerator, int(denominator))
+    except (ValueError, ZeroDivisionError):
+        raise UnsupportedTune(f"note length {text!r}")
+
+def _note_value(duration):
+    """
+    Split a duration into a drawable note value and its dots.
+
+    Returns:
+        tuple: (base value in whole notes, number of dots)
+    """
+    for base in NOTE_VALUES:
+        for dots, factor in enumerate((Fraction(1), Fraction(3, 2), Fraction(7, 4))):
+            if duration == base * factor:
+                return base, dots
+    raise UnsupportedTune(f"duration {duration}")
+
+def _parse_key(value):
+    """
+    Read a K: field.
+
+    Returns:
+        tuple: (number of sharps, negative for flats; clef name)
+    """
+    clef = "treble"
+    words = value.split()
+    key = []
+    for word in words:
+        name = word.lower().split('=')[-1]
+        if name in CLEF_BOTTOM_LINE:
+            clef = name
+        elif '=' in word or word[0] in "^_=":
+            raise UnsupportedTune(f"key field {value!r}")
+        else:
+            key.append(word)
+    key = "".join(key)
+    if not key or key.lower() == "none":
+        return 0, clef
+    match = re.match(r"^([A-G])([#b]?)([A-Za-z]*)$", key)
+    if not match:
+        raise UnsupportedTune(f"key {key!r}")
+    mode = match.group(3).lower()
+    mode = mode if mode == "m" else mode[:3]
+    if mode not in MODE_FIFTHS:
+        raise UnsupportedTune(f"mode {match.group(3)!r}")
+    fifths = LETTER_FIFTHS[match.group(1)] + {"": 0, "#": 7, "b": -7}[match.group(2)] + MODE_FIFTHS[mode]
+    if abs(fifths) > 7:
+        raise UnsupportedTune(f"key {key!r}")
+    return fifths, clef
+
+def _parse_meter(value):
+    """
+    Read an M: field.
+
+    Returns:
+        tuple: (numerator, denominator) as text, ("C", "") / ("C|", "") or None for no time signature
+    """
+    value = value.strip()
+    if value in ("C", "C|"):
+        return value, ""
+    if value == "none":
+        return None
+    match = re.match(r"^\(?([\d+]+)\)?/(\d+)$", value)
+    if not match:
+        raise UnsupportedTune(f"meter {value!r}")
+    return match.group(1), match.group(2)
+
+def _parse_note(text):
+    """Return ((diatonic position, accidental), length multiplier) of a note token."""
+    match = NOTE_PATTERN.match(text)
+    if not match:
+        raise UnsupportedTune(f"note {text!r}")
+    accidental, letter, octave_marks, length = match.groups()
+    octave = 4 if letter.isupper() else 5
+    octave += octave_marks.count("'") - octave_marks.count(",")
+    return (octave * 7 + "CDEFGAB".index(letter.upper()), accidental), _parse_length(length)
+
+def _parse_body(lines, unit):
+    """
+    Turn the body lines into staff systems of events.
+
+    Args:
+        lines (list): Body lines of the tune
+        unit (Fraction): Default note length from the L: field
+
+    Returns:
+        list: One list of event dicts per staff system
+    """
+    systems = [[]]
+    state = {"annotation": None, "factor": Fraction(1), "slurs": 0, "continued": False}
+
+    def add(event):
+        event["duration"] *= state["factor"]
+        event["annotation"] = state["annotation"]
+        event["slur_starts"] = state["slurs"]
+        event["slur_ends"] = 0
+        state.update(annotation=None, factor=Fraction(1), slurs=0)
+        systems[-1].append(event)
+
+    def last_sounding():
+        for event in reversed(systems[-1]):
+            if event["kind"] in ("note", "rest"):
+                return event
+        raise UnsupportedTune("tie, slur or broken rhythm without a note")
+
+    for line in lines:
+        line = line.strip()
+        if not line or line.startswith('%'):
+            continue
+        if re.match(r'^[A-Za-z+]:', line):
+            raise UnsupportedTune(f"field in the tune body: {line[:20]}")
+        if systems[-1] and not state["continued"]:
+            systems.append([])
+        state["continued"] = False
+        tokens, invalid = tokenize_line(line)
+        if invalid:
+            raise UnsupportedTune(invalid[0][1])
+        chord = None
+        for kind, text, _ in tokens:
+            if chord is not None and kind not in ("note", "chord_end"):
+                raise UnsupportedTune(f"{kind.replace('_', ' ')} inside a chord")
+            if kind == "note":
+                pitch, length = _parse_note(text)
+                if chord is not None:
+                    chord.append((pitch, length))
+                else:
+                    add({"kind": "note", "pitches": [pitch], "duration": unit * length, "tie": False})
+            elif kind == "rest":
+                if text[0] in "ZX":
+                    raise UnsupportedTune("multi-measure rest")
+                add({"kind": "rest", "duration": unit * _parse_length(text[1:]), "invisible": text[0] == "x"})
+            elif kind == "chord_start":
+                chord = []
+            elif kind == "chord_end":
+                if not chord:
+                    raise UnsupportedTune("empty chord")
+                add({"kind": "note", "pitches": [pitch for pitch, _ in chord],
+                     "duration": unit * chord[0][1] * _parse_length(text[1:]), "tie": False})
+                chord = None
+            elif kind == "bar":
+                if text not in BAR_SHAPES:
+                    raise UnsupportedTune(f"bar line {text!r}")
+                systems[-1].append({"kind": "bar", "text": text})
+            elif kind == "ending":
+                systems[-1].append({"kind": "ending", "label": text.lstrip('[')})
+            elif kind == "annotation":
+                annotation = text[1:-1]
+                state["annotation"] = annotation[1:] if annotation[:1] in "^_<>@" else annotation
+            elif kind == "slur_start":
+                state["slurs"] += 1
+            elif kind == "slur_end":
+                last_sounding()["slur_ends"] += 1
+            elif kind == "symbol" and text == "-":
+                last_sounding()["tie"] = True
+            elif kind == "symbol" and text in "<>":
+                if state["factor"] != 1:
+                    raise UnsupportedTune("double broken rhythm")
+                longer, shorter = Fraction(3, 2), Fraction(1, 2)
+                last_sounding()["duration"] *= longer if text == ">" else shorter
+                state["factor"] = shorter if text == ">" else longer
+            elif kind == "symbol" and text == "y":
+                continue
+            elif kind == "continuation":
+                state["continued"] = True
+            else:
+                raise UnsupportedTune(f"{kind.replace('_', ' ')} {text!r}")
+    return [system for system in systems if system]
+
+def _advance(duration):
+    """Horizontal space after a note or rest, growing with its duration."""
+    return 16 + 22 * float(duration * 4) ** 0.5
+
+class _Canvas:
+    """SVG elements of one drawing."""
+
+    def __init__(self):
+        self.parts = []
+
+    def line(self, x1, y1, x2, y2, width=1.0):
+        self.parts.append(f'<line x1="{x1:.1f}" y1="{y1:.1f}" x2="{x2:.1f}" y2="{y2:.1f}" '
+                          f'stroke="black" stroke-width="{width}"/>')
+
+    def rect(self, x, y, width, height):
+        self.parts.append(f'<rect x="{x:.1f}" y="{y:.1f}" width="{width:.1f}" height="{height:.1f}" fill="black"/>')
+
+    def circle(self, x, y, radius):
+        self.parts.append(f'<circle cx="{x:.1f}" cy="{y:.1f}" r="{radius}" fill="black"/>')
+
+    def path(self, d, width=1.5, fill="none"):
+        self.parts.append(f'<path d="{d}" fill="{fill}" stroke="black" stroke-width="{width}"/>')
+
+    def text(self, x, y, content, size=14, anchor="start", font="serif", weight="normal"):
+        self.parts.append(f'<text x="{x:.1f}" y="{y:.1f}" font-family="{font}" font-size="{size}" '
+                          f'font-weight="{weight}" text-anchor="{anchor}">{escape(content)}</text>')
+
+    def notehead(self, x, y, filled):
+        fill = "black" if filled else "none"
+        self.parts.append(f'<ellipse cx="{x:.1f}" cy="{y:.1f}" rx="5.5" ry="4" fill="{fill}" stroke="black" '
+                          f'stroke-width="1.5" transform="rotate(-20 {x:.1f} {y:.1f})"/>')
+
+class _SystemDrawer:
+    """Draws one staff system; y positions come from staff steps above the bottom line."""
+
+    def __init__(self, canvas, bottom):
+        self.canvas = canvas
+        self.bottom = bottom
+
+    def y(self, step):
+        return self.bottom - step * STEP
+
+    def staff(self, x1, x2):
+        for step in range(0, 9, 2):
+            self.canvas.line(x1, self.y(step), x2, self.y(step))
+
+    def clef(self, x, clef):
+        """Draw a clef as paths, so the image does not depend on a music font."""
+        y = self.y(CLEF_LINES[clef])
+        if clef == "treble":
+            self.canvas.path(f"M{x + 6:.1f} {y + 21:.1f} C {x + 6:.1f} {y + 26:.1f} {x + 12:.1f} {y + 26:.1f} "
+                             f"{x + 12:.1f} {y + 20:.1f} L {x + 9:.1f} {y - 30:.1f} "
+                             f"C {x + 9:.1f} {y - 38:.1f} {x + 17:.1f} {y - 38:.1f} {x + 16:.1f} {y - 30:.1f} "
+                             f"C {x + 15:.1f} {y - 22:.1f} {x + 1:.1f} {y - 14:.1f} {x + 1:.1f} {y - 2:.1f} "
+                             f"C {x + 1:.1f} {y + 8:.1f} {x + 19:.1f} {y + 8:.1f} {x + 19:.1f} {y - 1:.1f} "
+                             f"C {x + 19:.1f} {y - 8:.1f} {x + 7:.1f} {y - 9:.1f} {x + 7:.1f} {y - 2:.1f} "
+                             f"C {x + 7:.1f} {y + 2:.1f} {x + 11:.1f} {y + 3:.1f} {x + 12:.1f} {y + 2:.1f}", width=1.8)
+        else:
+            self.canvas.circle(x + 5, y, 3)
+            self.canvas.path(f"M{x + 3:.1f} {y - 3:.1f} C {x + 4:.1f} {y - 10:.1f} {x + 18:.1f} {y - 10:.1f} "
+                             f"{x + 18:.1f} {y - 1:.1f} C {x + 18:.1f} {y + 10:.1f} {x + 8:.1f} {y + 18:.1f} "
+                             f"{x + 2:.1f} {y + 20:.1f}", width=2.2)
+            self.canvas.circle(x + 23, y - STEP, 1.8)
+            self.canvas.circle(x + 23, y + STEP, 1.8)
+
+    def accidental(self, x, y, accidental):
+        """Draw a sharp, flat, natural, double sharp or double flat centred on x, y."""
+        canvas = self.canvas
+        if accidental == "^":
+            canvas.line(x - 2, y - 10, x - 2, y + 10, width=1.2)
+            canvas.line(x + 2, y - 11, x + 2, y + 9, width=1.2)
+            canvas.line(x - 5, y - 2, x + 5, y - 5, width=2.5)
+            canvas.line(x - 5, y + 4, x + 5, y + 1, width=2.5)
+        elif accidental == "=":
+            canvas.line(x - 3, y - 11, x - 3, y + 5, width=1.2)
+            canvas.line(x + 3, y - 5, x + 3, y + 11, width=1.2)
+            canvas.line(x - 3, y - 2, x + 3, y - 4, width=2.5)
+            canvas.line(x - 3, y + 5, x + 3, y + 3, width=2.5)
+        elif accidental == "^^":
+            canvas.line(x - 4, y - 4, x + 4, y + 4, width=2)
+            canvas.line(x - 4, y + 4, x + 4, y - 4, width=2)
+        else:
+            for offset in ((0,) if accidental == "_" else (-4, 3)):
+                left = x - 3 + offset
+                canvas.line(left, y - 13, left, y + 4, width=1.2)
+                canvas.path(f"M{left:.1f} {y + 4:.1f} C {left + 9:.1f} {y - 1:.1f} {left + 7:.1f} {y - 7:.1f} "
+                            f"{left:.1f} {y - 2:.1f}", width=1.6)
+
+    def ledger_lines(self, x, step):
+        for ledger in range(-2, step - 1, -2):
+            self.canvas.line(x - 9, self.y(ledger), x + 9, self.y(ledger))
+        for ledger in range(10, step + 1, 2):
+            self.canvas.line(x - 9, self.y(ledger), x + 9, self.y(ledger))
+
+    def dots(self, x, step, dots):
+        # Dots sit in a space, so notes on a line move them up
+        y = self.y(step + 1 if step % 2 == 0 else step)
+        for dot in range(dots):
+            self.canvas.circle(x + 10 + dot * 5, y, 1.7)
+
+    def note(self, event, steps):
+        canvas = self.canvas
+        x = event["x"]
+        base, dots = _note_value(event["duration"])
+        up = sum(step for step, _ in steps) / len(steps) < 4
+        for (step, accidental) in steps:
+            self.ledger_lines(x, step)
+            canvas.notehead(x, self.y(step), filled=base < Fraction(1, 2))
+            if accidental:
+                self.accidental(x - 13, self.y(step), accidental)
+            if dots:
+                self.dots(x, step, dots)
+        if base == 1:
+            return
+        low = min(step for step, _ in steps)
+        high = max(step for step, _ in steps)
+        if up:
+            stem_x, start, end = x + 5, self.y(low), self.y(high) - STEM_LENGTH
+        else:
+            stem_x, start, end = x - 5, self.y(high), self.y(low) + STEM_LENGTH
+        canvas.line(stem_x, start, stem_x, end, width=1.3)
+        flags = {Fraction(1, 8): 1, Fraction(1, 16): 2, Fraction(1, 32): 3}.get(base, 0)
+        direction = 1 if up else -1
+        for flag in range(flags):
+            y = end + direction * flag * 7
+            canvas.path(f"M{stem_x:.1f} {y:.1f} c 1 {6 * direction} 10 {9 * direction} 7 {19 * direction}")
+        event["stem_up"] = up
+
+    def rest(self, event):
+        canvas = self.canvas
+        x = event["x"]
+        base, dots = _note_value(event["duration"])
+        if base == 1:
+            canvas.rect(x - 6, self.y(6), 12, 5)
+        elif base == Fraction(1, 2):
+            canvas.rect(x - 6, self.y(4) - 5, 12, 5)
+        elif base == Fraction(1, 4):
+            canvas.path(f"M{x - 2:.1f} {self.y(7):.1f} l 5 6 l -5 5 l 5 6 c -6 -2 -7 4 -1 7", width=2.2)
+        else:
+            flags = {Fraction(1, 8): 1, Fraction(1, 16): 2, Fraction(1, 32): 3}[base]
+            top = self.y(5)
+            canvas.line(x + 3, top, x - 2, top + 12 + 7 * flags, width=1.4)
+            for flag in range(flags):
+                canvas.circle(x - 2 - flag * 1.5, top + 1 + flag * 7, 2.3)
+                canvas.line(x - 2 - flag * 1.5, top + 2 + flag * 7, x + 3 - flag * 1.5, top + flag * 7, width=1.2)
+        if dots:
+            self.dots(x, 5, dots)
+
+    def bar(self, x, text):
+        top, bottom = self.y(8), self.y(0)
+        for part in BAR_SHAPES[text]:
+            if part == "t":
+                self.canvas.line(x + 0.5, top, x + 0.5, bottom)
+            elif part == "T":
+                self.canvas.rect(x, top, 4, bottom - top)
+            else:
+                self.canvas.circle(x + 2, self.y(5), 2)
+                self.canvas.circle(x + 2, self.y(3), 2)
+            x += BAR_PART_WIDTHS[part]
+
+    def arc(self, x1, x2, y1, y2, below):
+        direction = 1 if below else -1
+        y1 += direction * 6
+        y2 += direction * 6
+        middle = (x1 + x2) / 2
+        bend = max(y1, y2) + 8 if below else min(y1, y2) - 8
+        self.canvas.path(f"M{x1:.1f} {y1:.1f} Q {middle:.1f} {bend:.1f} {x2:.1f} {y2:.1f}", width=1.2)
+
+def _bar_width(text):
+    """Width of a drawn bar line, without the gap after its last part."""
+    return sum(BAR_PART_WIDTHS[part] for part in BAR_SHAPES[text]) - 3
+
+def _steps(event, clef):
+    return [(position - CLEF_BOTTOM_LINE[clef], accidental) for position, accidental in event["pitches"]]
+
+def _system_extent(system, clef):
+    """Lowest and highest staff step used in a system (at least the staff itself)."""
+    steps = [step for event in system if event["kind"] == "note" for step, _ in _steps(event, clef)]
+    return min(steps + [0]), max(steps + [8])
+
+def render_svg(abc_notation):
+    """
+    Draw a tune as SVG.
+
+    Args:
+        abc_notation (str): ABC notation string (checked with check_abc first)
+
+    Returns:
+        str: SVG document
+
+    Raises:
+        UnsupportedTune: If the tune uses notation this renderer cannot draw
+    """
+    header, body = split_tune(abc_notation)
+    fields = {}
+    for letter, value in header:
+        if letter == "V":
+            raise UnsupportedTune("several voices")
+        fields.setdefault(letter, value)
+    meter_field = fields.get("M", "none")
+    unit = _parse_length(fields.get("L", default_unit_length(meter_field)).strip())
+    fifths, clef = _parse_key(fields.get("K", "C"))
+    meter = _parse_meter(meter_field)
+    systems = _parse_body(body, unit)
+    if not systems:
+        raise UnsupportedTune("no music")
+
+    canvas = _Canvas()
+    title = fields.get("T")
+    cursor = MARGIN + (TITLE_HEIGHT if title else 0)
+    key_steps = (SHARP_STEPS if fifths > 0 else FLAT_STEPS)[:abs(fifths)]
+    # Bass clef key signatures sit two steps lower than treble ones
+    key_steps = [step - 2 if clef == "bass" else step for step in key_steps]
+    width = 0
+    for number, system in enumerate(systems):
+        low, high = _system_extent(system, clef)
+        bottom = cursor + ROOM_ABOVE + (high - 8) * STEP + 8 * STEP
+        drawer = _SystemDrawer(canvas, bottom)
+
+        drawer.clef(MARGIN + 2, clef)
+        x = MARGIN + CLEF_WIDTH
+        for step in key_steps:
+            drawer.accidental(x + 4, drawer.y(step), "^" if fifths > 0 else "_")
+            x += KEY_ACCIDENTAL_WIDTH
+        x += 6 if key_steps else 0
+        if number == 0 and meter:
+            upper, lower = meter
+            if lower:
+                canvas.text(x + 8, drawer.y(4) - 1, upper, size=21, anchor="middle", weight="bold")
+                canvas.text(x + 8, drawer.y(0) - 1, lower, size=21, anchor="middle", weight="bold")
+            else:
+                canvas.text(x + 8, drawer.y(2) + 1, "C", size=24, anchor="middle", weight="bold")
+                if upper == "C|":
+                    canvas.line(x + 8, drawer.y(8) - 4, x + 8, drawer.y(0) + 4, width=1.5)
+            x += METER_WIDTH
+        x += 8
+
+        # Horizontal layout
+        for event in system:
+            if event["kind"] in ("note", "rest"):
+                if event["kind"] == "note" and any(accidental for _, accidental in event["pitches"]):
+                    x += 8
+                event["x"] = x
+                x += _advance(event["duration"])
+            elif event["kind"] == "bar":
+                event["x"] = x - 4
+                x = event["x"] + _bar_width(event["text"]) + 12
+            else:
+                event["x"] = x - 4
+        end = x if system[-1]["kind"] != "bar" else system[-1]["x"] + _bar_width(system[-1]["text"])
+        drawer.staff(MARGIN, end)
+        width = max(width, end + MARGIN)
+
+        # Notes, rests and bar lines, then ties, slurs, chord symbols and endings on top
+        slurs = []
+        tied = None
+        ending = None
+        annotation_y = min(drawer.y(high) - STEM_LENGTH, drawer.y(8)) - 8
+        ending_y = annotation_y - 18
+        for event in system:
+            kind = event["kind"]
+            if kind == "note":
+                steps = _steps(event, clef)
+                drawer.note(event, steps)
+                event["y"] = drawer.y(steps[0][0])
+            elif kind == "rest":
+                if not event["invisible"]:
+                    drawer.rest(event)
+                event["y"] = drawer.y(4)
+                event["stem_up"] = True
+            elif kind == "bar":
+                drawer.bar(event["x"], event["text"])
+                if ending and (":" in event["text"] or event["text"] in ("||", "|]")):
+                    canvas.line(ending[0], ending_y, event["x"] + 2, ending_y)
+                    ending = None
+                continue
+            elif kind == "ending":
+                if ending:
+                    canvas.line(ending[0], ending_y, event["x"] - 2, ending_y)
+                canvas.line(event["x"] + 2, ending_y, event["x"] + 2, ending_y + 10)
+                canvas.text(event["x"] + 6, ending_y + 12, f"{event['label']}.", size=12)
+                ending = (event["x"] + 2,)
+                continue
+
+            if event["annotation"]:
+                canvas.text(event["x"] - 5, annotation_y, event["annotation"], size=13)
+            if tied is not None:
+                if kind == "note":
+                    drawer.arc(tied["x"] + 4, event["x"] - 4, tied["y"], event["y"], below=tied["stem_up"])
+                tied = None
+            if kind == "note" and event["tie"]:
+                tied = event
+            slurs.extend([event] * event["slur_starts"])
+            for _ in range(event["slur_ends"]):
+                if slurs:
+                    start = slurs.pop()
+                    drawer.arc(start["x"], event["x"], start["y"], event["y"], below=start["stem_up"])
+        if ending:
+            canvas.line(ending[0], ending_y, end, ending_y)
+        cursor = bottom + (0 - low) * STEP + ROOM_BELOW
+
+    if title:
+        canvas.text(width / 2, MARGIN + 16, title, size=18, anchor="middle", weight="bold")
+    height = cursor + MARGIN
+    return (f'<svg xmlns="http://www.w3.org/2000/svg" width="{width:.0f}" height="{height:.0f}" '
+            f'viewBox="0 0 {width:.0f} {height:.0f}">\n<rect width="100%" height="100%" fill="white"/>\n'
+            + "\n".join(canvas.parts) + "\n</svg>\n")
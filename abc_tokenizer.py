@@ -0,0 +1,307 @@
+"""
+ABC tokenizer for Music Theory AI Chat.
+This module checks ABC notation before it reaches music21. It splits a tune
+into header fields and body tokens in a single pass, repairs the common
+mistakes of model-written ABC (a missing K: field, stray prose, unclosed chords
+or chord symbols) and rejects tunes that cannot be rendered, in microseconds
+instead of a failed music21 parse.
+"""
+
+import re
+
+# A header or body field line such as "K:G" or "w:lyrics"
+FIELD_LINE = re.compile(r'^([A-Za-z+]):(.*)$')
+# Header fields checked before the tune is parsed, with their defaults. X:, M: (free
+# meter) and L: (derived from the meter) are ABC defaults; only K: is a required field.
+REQUIRED_FIELDS = {"X": "1", "M": "none", "L": None, "K": "C"}
+VALID_FIELD_VALUES = {
+    "X": re.compile(r'^\s*\d+\s*$'),
+    "M": re.compile(r'^\s*(C\|?|none|\(?\d+(\+\d+)*\)?/\d+)\s*$'),
+    "L": re.compile(r'^\s*1/\d+\s*$'),
+    "K": re.compile(r'^\s*(none|HP|Hp|[A-G][#b]?\s*[A-Za-z]*)(\s+.*)?$'),
+}
+# Body lines where more than this share of characters is invalid are prose, not music
+PROSE_RATIO = 0.3
+
+NOTE_LETTERS = "ABCDEFGabcdefg"
+REST_LETTERS = "zxZX"
+ACCIDENTALS = "^_="
+# Decoration shorthands (staccato, roll, fermata, ...), ties, broken rhythm and spacers
+SINGLE_SYMBOLS = ".~HLMOPSTuv-<>y&"
+# Closing character of delimited tokens
+DELIMITED = {'"': '"', '!': '!', '+': '+'}
+
+def _read_length(line, i):
+    """Return the end of a note length such as 2, /2, 3/4 or //."""
+    while i < len(line) and (line[i].isdigit() or line[i] == '/'):
+        i += 1
+    return i
+
+def tokenize_line(line):
+    """
+    Split one body line into tokens.
+
+    Args:
+        line (str): A line of ABC music
+
+    Returns:
+        tuple: (tokens, invalid) where tokens is a list of (kind, text, column) and
+            invalid a list of (column, message) for characters that are not ABC.
+            Kinds are note, rest, chord_start, chord_end, bar, field, decoration,
+            annotation, grace_start, grace_end, tuplet, slur_start, slur_end,
+            ending, symbol and continuation.
+    """
+    tokens = []
+    invalid = []
+    in_chord = False
+    i = 0
+    length = len(line)
+    while i < length:
+        c = line[i]
+        start = i
+        if in_chord and (c in ' \t|:"' or c in REST_LETTERS):
+            # A chord must be closed before spaces, bars, chord symbols or rests
+            invalid.append((i, "unclosed chord"))
+            in_chord = False
+        if c in ' \t`':
+            i += 1
+            continue
+        if c == '%':
+            break
+        if c in DELIMITED:
+            end = line.find(DELIMITED[c], i + 1)
+            if end == -1:
+                invalid.append((i, f"unclosed {c}"))
+                i += 1
+                continue
+            tokens.append(("annotation" if c == '"' else "decoration", line[i:end + 1], start))
+            i = end + 1
+        elif c == '[':
+            following = line[i + 1:i + 3]
+            if len(following) == 2 and following[0].isalpha() and following[1] == ':':
+                end = line.find(']', i)
+                if end == -1:
+                    invalid.append((i, "unclosed inline field"))
+                    i += 1
+                    continue
+                tokens.append(("field", line[i:end + 1], start))
+                i = end + 1
+            elif following[:1].isdigit():
+                i = _read_length(line, i + 1)
+                tokens.append(("ending", line[start:i], start))
+            elif following[:1] == '|':
+                i += 2
+                tokens.append(("bar", line[start:i], start))
+            elif in_chord:
+                invalid.append((i, "chord inside a chord"))
+                i += 1
+            else:
+                in_chord = True
+                tokens.append(("chord_start", c, start))
+                i += 1
+        elif c == ']':
+            if not in_chord:
+                invalid.append((i, "] without a chord"))
+                i += 1
+                continue
+            in_chord = False
+            i = _read_length(line, i + 1)
+            tokens.append(("chord_end", line[start:i], start))
+        elif c in '|:':
+            i += 1
+            while i < length and line[i] in '|:]':
+                i += 1
+            text = line[start:i]
+            if text == ':':
+                invalid.append((start, "lone colon"))
+                continue
+            # Numbered repeat endings written as |1 or :|2
+            end = i
+            while end < length and line[end].isdigit():
+                end += 1
+            tokens.append(("bar", text, start))
+            if end > i:
+                tokens.append(("ending", line[i:end], i))
+                i = end
+        elif c in ACCIDENTALS or c in NOTE_LETTERS:
+            while i < length and line[i] in ACCIDENTALS:
+                i += 1
+            if i >= length or line[i] not in NOTE_LETTERS:
+                invalid.append((start, "accidental without a note"))
+                i = max(i, start + 1)
+                continue
+            i += 1
+            while i < length and line[i] in ",'":
+                i += 1
+            i = _read_length(line, i)
+            tokens.append(("note", line[start:i], start))
+        elif c in REST_LETTERS:
+            i = _read_length(line, i + 1)
+            tokens.append(("rest", line[start:i], start))
+        elif c == '{':
+            tokens.append(("grace_start", c, start))
+            i += 1
+        elif c == '}':
+            tokens.append(("grace_end", c, start))
+            i += 1
+        elif c == '(':
+            if i + 1 < length and line[i + 1].isdigit():
+                i += 2
+                while i < length and (line[i].isdigit() or line[i] == ':'):
+                    i += 1
+                tokens.append(("tuplet", line[start:i], start))
+            else:
+                tokens.append(("slur_start", c, start))
+                i += 1
+        elif c == ')':
+            tokens.append(("slur_end", c, start))
+            i += 1
+        elif c in SINGLE_SYMBOLS:
+            tokens.append(("symbol", c, start))
+            i += 1
+        elif c == '\\' and not line[i + 1:].strip():
+            tokens.append(("continuation", c, start))
+            i = length
+        elif c.isdigit() or c == '/':
+            # A length that does not follow a note
+            i = _read_length(line, i)
+            invalid.append((start, "length without a note"))
+        else:
+            invalid.append((start, f"unexpected character {c!r}"))
+            i += 1
+    if in_chord:
+        invalid.append((length, "unclosed chord"))
+    return tokens, invalid
+
+def split_tune(abc_notation):
+    """
+    Separate the header fields from the body of a tune.
+
+    The header runs from the first line up to the K: field (or the first line
+    that is not a field when K: is missing).
+
+    Args:
+        abc_notation (str): ABC notation string
+
+    Returns:
+        tuple: (header fields as a list of (letter, value), body lines)
+    """
+    lines = [line.rstrip() for line in abc_notation.replace('\r\n', '\n').replace('\r', '\n').split('\n')]
+    # Code fences and blank lines around the tune are not part of it
+    lines = [line for line in lines if line.strip() and not line.strip().startswith('```')]
+    # Text in front of the X: field is not part of the tune
+    for index, line in enumerate(lines):
+        if line.strip().startswith('X:'):
+            lines = lines[index:]
+            break
+    header = []
+    index = 0
+    while index < len(lines):
+        stripped = lines[index].strip()
+        match = FIELD_LINE.match(stripped)
+        if stripped.startswith('%'):
+            index += 1
+            continue
+        if not match:
+            break
+        header.append((match.group(1), match.group(2).strip()))
+        index += 1
+        if match.group(1) == 'K':
+            break
+    return header, lines[index:]
+
+def default_unit_length(meter):
+    """
+    ABC's default note length for an M: field value.
+
+    Args:
+        meter (str): M: field value, e.g. "6/8", "C" or "none"
+
+    Returns:
+        str: "1/16" for meters below 3/4, otherwise "1/8"
+    """
+    match = re.match(r'^\s*\(?([\d+]+)\)?/(\d+)\s*$', meter)
+    if match and sum(int(beats) for beats in match.group(1).split('+')) / int(match.group(2)) < 0.75:
+        return "1/16"
+    return "1/8"
+
+def check_abc(abc_notation):
+    """
+    Validate a tune and repair what can be repaired.
+
+    Args:
+        abc_notation (str): ABC notation string
+
+    Returns:
+        dict: "abc" (the repaired tune, or None if it was rejected), "errors"
+            (why it was rejected), "repairs" (what was changed) and "notes"
+            (number of notes and rests in the tune)
+    """
+    repairs = []
+    errors = []
+    header, body = split_tune(abc_notation)
+
+    # Header: X: first, K: last, required fields present and well-formed
+    fields = {}
+    invalid_fields = {}
+    ordered = []
+    for letter, value in header:
+        if letter in VALID_FIELD_VALUES and not VALID_FIELD_VALUES[letter].match(value):
+            invalid_fields.setdefault(letter, value)
+            continue
+        if letter in REQUIRED_FIELDS:
+            if letter in fields:
+                repairs.append(f"dropped repeated {letter}: field")
+                continue
+            fields[letter] = value
+        else:
+            ordered.append((letter, value))
+    # Missing fields take ABC's defaults, which leave the music unchanged; only a missing K: is a repair
+    if "K" not in fields and "K" not in invalid_fields:
+        repairs.append(f"added missing K:{REQUIRED_FIELDS['K']}")
+    for letter, value in REQUIRED_FIELDS.items():
+        fields.setdefault(letter, value if value is not None else default_unit_length(fields["M"]))
+    for letter, value in invalid_fields.items():
+        repairs.append(f"replaced invalid {letter}:{value} with {letter}:{fields[letter]}")
+    header_lines = [f"X:{fields['X']}"] + [f"{letter}:{value}" for letter, value in ordered]
+    header_lines += [f"M:{fields['M']}", f"L:{fields['L']}", f"K:{fields['K']}"]
+
+    # Body: tokenize every music line, drop prose and characters that are not ABC
+    body_lines = []
+    notes = 0
+    for number, line in enumerate(body, len(header) + 1):
+        stripped = line.strip()
+        if stripped.startswith('%') or FIELD_LINE.match(stripped):
+            body_lines.append(stripped)
+            continue
+        tokens, invalid = tokenize_line(stripped)
+        if invalid:
+            characters = len(stripped.replace(' ', '')) or 1
+            if len(invalid) / characters > PROSE_RATIO:
+                repairs.append(f"dropped text line {number}: {stripped[:40]}")
+                continue
+            repaired = list(stripped) + ['']
+            for column, message in invalid:
+                if message == "unclosed chord":
+                    repaired[column] = ']' + repaired[column]
+                    repairs.append(f"line {number}: closed unclosed chord at column {column + 1}")
+                else:
+                    repaired[column] = ''
+                    repairs.append(f"line {number}: removed {message} at column {column + 1}")
+            stripped = ''.join(repaired)
+            tokens, invalid = tokenize_line(stripped)
+            if invalid:
+                errors.append(f"line {number}: {invalid[0][1]}")
+                continue
+        grace_depth = sum(1 if kind == "grace_start" else -1 for kind, _, _ in tokens if kind in ("grace_start", "grace_end"))
+        if grace_depth > 0:
+            stripped += '}' * grace_depth
+            repairs.append(f"line {number}: closed grace notes")
+        notes += sum(1 for kind, _, _ in tokens if kind in ("note", "rest"))
+        body_lines.append(stripped)
+
+    if not notes:
+        errors.append("the tune has no notes")
+    if errors:
+        return {"abc": None, "errors": errors, "repairs": repairs, "notes": notes}
+    return {"abc": '\n'.join(header_lines + body_lines), "errors": [], "repairs": repairs, "notes": notes}
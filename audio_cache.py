@@ -0,0 +1,151 @@
+"""
+Synthesized speech cache for Music Theory AI Chat.
+This module stores the audio of spoken chunks on disk, keyed by a hash of
+the engine, voice, rate, volume and text, so repeated phrases play at once
+and work offline. The cache is trimmed to a size limit, least recently used
+files first.
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+
+# Size limit of the audio cache
+MAX_AUDIO_BYTES = 100 * 1024 * 1024
+
+def make_audio_key(engine, voice, rate, volume, text):
+    """
+    Build the cache key of a spoken chunk.
+
+    Args:
+        engine (str): Speech engine ("cloud" or "pyttsx3")
+        voice (str): Voice id (or language for cloud speech)
+        rate (int): Speech rate
+        volume (float): Volume level
+        text (str): Text of the chunk
+
+    Returns:
+        str: Hex digest identifying the audio
+    """
+    payload = json.dumps([engine, voice, rate, round(float(volume), 2), ' '.join(text.split())])
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+class AudioCache:
+    """
+    Content-addressed audio files with LRU eviction.
+    """
+
+    def __init__(self, directory, max_bytes=MAX_AUDIO_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.stats = {"hits": 0, "misses": 0, "stores": 0, "evictions": 0}
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        # File name -> [size, last use], built once so stores don't rescan the directory
+        self._index = {}
+        for name in os.listdir(directory):
+            path = os.path.join(directory, name)
+            if name.startswith("tmp-"):
+                # Left over from an interrupted synthesis
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+            elif os.path.isfile(path):
+                stat = os.stat(path)
+                self._index[name] = [stat.st_size, stat.st_mtime]
+
+    def get(self, key, extension):
+        """
+        Look up a cached audio file.
+
+        Args:
+            key (str): Key from make_audio_key
+            extension (str): File extension such as ".mp3" or ".wav"
+
+        Returns:
+            str: Path of the audio file, or None on a miss
+        """
+        name = key + extension
+        path = os.path.join(self.directory, name)
+        with self._lock:
+            if name not in self._index or not os.path.exists(path):
+                self._index.pop(name, None)
+                self.stats["misses"] += 1
+                return None
+            self.stats["hits"] += 1
+            now = time.time()
+            self._index[name][1] = now
+        try:
+            # The modification time keeps the LRU order across sessions
+            os.utime(path, (now, now))
+        except OSError:
+            pass
+        return path
+
+    def store(self, key, extension, produce):
+        """
+        Create a cached audio file.
+
+        Args:
+            key (str): Key from make_audio_key
+            extension (str): File extension
+            produce: Function writing the audio to the path it is given
+
+        Returns:
+            str: Path of the cached file, or None if nothing was written
+        """
+        name = key + extension
+        path = os.path.join(self.directory, name)
+        temp_path = os.path.join(self.directory, f"tmp-{threading.get_ident()}-{name}")
+        produce(temp_path)
+        if not os.path.exists(temp_path) or os.path.getsize(temp_path) == 0:
+            return None
+        os.replace(temp_path, path)
+        with self._lock:
+            self._index[name] = [os.path.getsize(path), time.time()]
+            self.stats["stores"] += 1
+            self._evict()
+        return path
+
+    def fetch(self, key, extension, produce):
+        """Return the cached file for a key, creating it with produce on a miss."""
+        return self.get(key, extension) or self.store(key, extension, produce)
+
+    def _evict(self):
+        total = sum(size for size, _ in self._index.values())
+        if total <= self.max_bytes:
+            return
+        for name, (size, _) in sorted(self._index.items(), key=lambda item: item[1][1]):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except OSError:
+                pass
+            del self._index[name]
+            total -= size
+            self.stats["evictions"] += 1
+
+    def clear(self):
+        """Remove all cached audio."""
+        with self._lock:
+            for name in list(self._index):
+                try:
+                    os.remove(os.path.join(self.directory, name))
+                except OSError:
+                    pass
+            self._index.clear()
+
+    def summary(self):
+        """
+        Describe the cache for display.
+
+        Returns:
+            dict: Statistics plus the number of files and their total size
+        """
+        with self._lock:
+            return dict(self.stats, files=len(self._index),
+                        disk_bytes=sum(size for size, _ in self._index.values()))
@@ -0,0 +1,156 @@
+"""
+Headless batch mode for Music Theory AI Chat.
+This module answers a JSONL file of questions concurrently and writes the
+results as streaming JSONL, so a crashed run can be resumed where it stopped.
+"""
+
+import asyncio
+import json
+import os
+import time
+
+from context_window import estimate_tokens
+from rate_limiter import PRIORITY_BATCH
+
+def load_questions(input_path):
+    """
+    Read questions from a JSONL file.
+
+    Each line is either a JSON object with a "question" field (and optional
+    "id", "topic" and "model" fields) or a plain JSON string.
+
+    Args:
+        input_path (str): Path to the questions file
+
+    Returns:
+        list: Question dictionaries with an "id" for every entry
+
+    Raises:
+        ValueError: If a line is not valid JSON or has no question, naming the file and line
+    """
+    questions = []
+    with open(input_path, 'r', encoding='utf-8') as f:
+        for line_number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError as e:
+                raise ValueError(f"{input_path}, line {line_number}: invalid JSON ({e.msg})") from e
+            if isinstance(entry, str):
+                entry = {"question": entry}
+            if not isinstance(entry, dict) or "question" not in entry:
+                raise ValueError(f"{input_path}, line {line_number}: expected a string or an object with a \"question\" field")
+            entry.setdefault("id", str(line_number))
+            entry["id"] = str(entry["id"])
+            questions.append(entry)
+    return questions
+
+def load_completed_ids(output_path):
+    """
+    Collect the ids that were already answered successfully in an earlier run.
+
+    A final line without a newline was cut off by a crash: it is removed from the
+    file, so new results start on a fresh line, and its question is asked again.
+
+    Args:
+        output_path (str): Path to the results file
+
+    Returns:
+        set: Ids of successful results
+
+    Raises:
+        ValueError: If a complete line is not valid JSON, naming the file and line
+    """
+    completed = set()
+    if not os.path.exists(output_path):
+        return completed
+    with open(output_path, 'rb') as f:
+        data = f.read()
+    complete, _, partial = data.rpartition(b"\n")
+    for line_number, line in enumerate(complete.split(b"\n") if complete else [], 1):
+        if not line.strip():
+            continue
+        try:
+            result = json.loads(line)
+        except json.JSONDecodeError as e:
+            raise ValueError(f"{output_path}, line {line_number}: invalid JSON ({e.msg})") from e
+        if result.get("status") == "ok":
+            completed.add(str(result.get("id")))
+    if partial:
+        with open(output_path, 'r+b') as f:
+            f.truncate(len(data) - len(partial))
+    return completed
+
+def resolve_model(model, models, default_model):
+    """Accept a model id or a key of the MODELS table."""
+    if not model:
+        return default_model
+    if model in models:
+        return models[model]["id"]
+    return model
+
+async def run_batch(engine, questions, output_path, system_prompts, models, default_model,
+                    temperature, concurrency=4, on_result=None):
+    """
+    Answer questions concurrently and append every result to the output file.
+
+    Args:
+        engine (ChatEngine): Engine used for streaming completions
+        questions (list): Questions from load_questions
+        output_path (str): Path of the JSONL results file
+        system_prompts (dict): System prompts by topic
+        models (dict): The MODELS table
+        default_model (str): Model id used when a question does not name one
+        temperature (float): Sampling temperature
+        concurrency (int): Maximum number of requests in flight
+        on_result: Optional callback receiving every result
+
+    Returns:
+        dict: Throughput report
+    """
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+    totals = {"ok": 0, "error": 0, "tokens": 0, "stream_time": 0.0}
+    start = time.monotonic()
+
+    with open(output_path, 'a', encoding='utf-8') as output:
+        async def answer(entry):
+            topic = entry.get("topic", "general")
+            model = resolve_model(entry.get("model"), models, default_model)
+            messages = [
+                {"role": "system", "content": system_prompts.get(topic, system_prompts["general"])},
+                {"role": "user", "content": entry["question"]}
+            ]
+            result = {"id": entry["id"], "topic": topic, "model": model, "question": entry["question"]}
+
+            async with semaphore:
+                request_start = time.monotonic()
+                try:
+                    answer_text = await engine.stream_completion(messages, model, temperature,
+                                                                 priority=PRIORITY_BATCH)
+                    result.update(status="ok", answer=answer_text, tokens=estimate_tokens(answer_text))
+                    totals["tokens"] += result["tokens"]
+                except Exception as e:
+                    result.update(status="error", error=str(e))
+                result["latency_s"] = round(time.monotonic() - request_start, 3)
+
+            totals[result["status"]] += 1
+            totals["stream_time"] += result["latency_s"]
+            # One line per result, flushed immediately so a crash loses nothing already answered
+            output.write(json.dumps(result, ensure_ascii=False) + "\n")
+            output.flush()
+            if on_result:
+                on_result(result)
+
+        await asyncio.gather(*(answer(entry) for entry in questions))
+
+    elapsed = time.monotonic() - start
+    return {
+        "answered": totals["ok"],
+        "failed": totals["error"],
+        "elapsed_s": elapsed,
+        "questions_per_min": totals["ok"] * 60 / elapsed if elapsed else 0.0,
+        "tokens_per_s": totals["tokens"] / elapsed if elapsed else 0.0,
+        "mean_latency_s": totals["stream_time"] / len(questions) if questions else 0.0,
+    }
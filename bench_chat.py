@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+"""
+End-to-end chat benchmark for Music Theory AI Chat.
+This script starts the local stub server, drives scripted sessions through
+first_ai.py and reports the distribution of turn latencies, so performance
+changes can be measured offline and reproducibly.
+
+Usage:
+    python3 bench_chat.py --runs 3 --ttft 0.3 --tokens-per-second 250
+    python3 bench_chat.py --script sessions.json --json results.json
+"""
+
+import argparse
+import glob
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import stub_server
+from turn_metrics import load_metrics, percentile
+
+DEFAULT_SCRIPT = [
+    [
+        "What is a Neapolitan sixth chord?",
+        "How does it resolve?",
+        "Give me an example in ABC notation.",
+    ],
+    [
+        "Explain the difference between the Dorian and Aeolian modes.",
+        "Which famous songs use Dorian?",
+    ],
+]
+
+FIELDS = ("ttft_s", "stream_s", "postprocess_s", "turn_s", "tokens_per_s")
+
+def load_script(script_path, sessions_dir):
+    """
+    Load scripted sessions (lists of user messages).
+
+    The script is a JSON list of sessions. Without a script, the user messages
+    of the saved sessions are replayed, or a small built-in script is used.
+
+    Args:
+        script_path (str): Path to a JSON script, or None
+        sessions_dir (str): Directory with saved sessions
+
+    Returns:
+        list: Sessions, each a list of user messages
+    """
+    if script_path:
+        with open(script_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    sessions = []
+    for path in sorted(glob.glob(os.path.join(sessions_dir, "*.json"))):
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                conversation = json.load(f)
+        except (json.JSONDecodeError, IOError):
+            continue
+        # Multi-line messages can't be typed into the prompt, keep the first line
+        messages = [m["content"].splitlines()[0] for m in conversation
+                    if m.get("role") == "user" and m.get("content", "").strip()]
+        if messages:
+            sessions.append(messages)
+    return sessions or DEFAULT_SCRIPT
+
+def run_session(messages, base_url, metrics_path, cache_dir, timeout):
+    """
+    Drive one scripted session through first_ai.py.
+
+    Returns:
+        float: Wall time of the session in seconds
+    """
+    app = os.path.join(os.path.dirname(os.path.abspath(__file__)), "first_ai.py")
+    env = dict(os.environ,
+               GROQ_API_KEY=os.getenv("GROQ_API_KEY", "stub-key"),
+               MUSIC_THEORY_AI_METRICS=metrics_path,
+               MUSIC_THEORY_AI_CACHE_DIR=cache_dir)
+    start = time.perf_counter()
+    subprocess.run(
+        [sys.executable, app, "--base-url", base_url],
+        input="\n".join(messages + ["exit"]) + "\n",
+        env=env, capture_output=True, text=True, timeout=timeout
+    )
+    return time.perf_counter() - start
+
+def summarize(records, session_times):
+    """
+    Compute latency distributions.
+
+    Returns:
+        dict: Count, mean and percentiles for every measured field
+    """
+    summary = {}
+    for field in FIELDS:
+        values = [r[field] for r in records if r.get(field) is not None]
+        if not values:
+            continue
+        summary[field] = {
+            "count": len(values),
+            "mean": sum(values) / len(values),
+            "p50": percentile(values, 50),
+            "p90": percentile(values, 90),
+            "p99": percentile(values, 99),
+            "max": max(values),
+        }
+    if session_times:
+        summary["session_s"] = {
+            "count": len(session_times),
+            "mean": sum(session_times) / len(session_times),
+            "p50": percentile(session_times, 50),
+            "p90": percentile(session_times, 90),
+            "p99": percentile(session_times, 99),
+            "max": max(session_times),
+        }
+    return summary
+
+def print_summary(summary):
+    print(f"{'metric':<15}{'count':>7}{'mean':>10}{'p50':>10}{'p90':>10}{'p99':>10}{'max':>10}")
+    for field, stats in summary.items():
+        print(f"{field:<15}{stats['count']:>7}" + "".join(
+            f"{stats[key]:>10.3f}" for key in ("mean", "p50", "p90", "p99", "max")))
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the chat loop against the local stub server")
+    parser.add_argument("--script", help="JSON list of sessions, each a list of user messages")
+    parser.add_argument("--runs", type=int, default=1, help="How often every session is replayed")
+    parser.add_argument("--ttft", type=float, default=0.3, help="Stub time to first token in seconds")
+    parser.add_argument("--tokens-per-second", type=float, default=250.0, help="Stub streaming speed")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Random timing variation of the stub")
+    parser.add_argument("--recordings", default="stub_recordings.jsonl", help="Recorded streams to replay")
+    parser.add_argument("--port", type=int, default=0, help="Stub server port (default: any free port)")
+    parser.add_argument("--timeout", type=float, default=300.0, help="Timeout per session in seconds")
+    parser.add_argument("--json", help="Also write the summary to this JSON file")
+    options = parser.parse_args()
+
+    server_options = stub_server.parse_arguments([
+        "--port", str(options.port),
+        "--ttft", str(options.ttft),
+        "--tokens-per-second", str(options.tokens_per_second),
+        "--jitter", str(options.jitter),
+        "--recordings", options.recordings,
+    ])
+    server = stub_server.create_server(server_options)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_address[1]}"
+
+    sessions = load_script(options.script, server_options.sessions_dir)
+    print(f"Benchmarking {len(sessions)} session(s) x {options.runs} run(s) against {base_url}")
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        metrics_path = os.path.join(work_dir, "metrics.jsonl")
+        session_times = []
+        for run in range(options.runs):
+            for number, messages in enumerate(sessions, 1):
+                elapsed = run_session(messages, base_url, metrics_path, work_dir, options.timeout)
+                session_times.append(elapsed)
+                print(f"  run {run + 1}, session {number}: {len(messages)} turns in {elapsed:.2f}s")
+        records = load_metrics(metrics_path)
+
+    server.shutdown()
+    summary = summarize(records, session_times)
+    print(f"\n{len(records)} turns recorded (times in seconds, tokens_per_s in tokens/s)")
+    print_summary(summary)
+
+    if options.json:
+        with open(options.json, 'w', encoding='utf-8') as f:
+            json.dump({"settings": vars(options), "summary": summary}, f, indent=2)
+        print(f"\nSummary written to {options.json}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Pitch-class-set benchmark for Music Theory AI Chat.
+This script identifies and transposes a large batch of random chords with the
+vectorized tables in pitch_class_sets.py and with music21's chord.Chord, and
+reports the throughput of both paths and how often their roots agree.
+
+Usage:
+    python3 bench_pitch_class_sets.py --chords 20000
+    python3 bench_pitch_class_sets.py --chords 5000 --music21-chords 1000 --json results.json
+"""
+
+import argparse
+import json
+import time
+
+import numpy as np
+
+import pitch_class_sets as pcs
+
+def random_chords(count, seed=0):
+    """
+    Build random chords from the known qualities in random transpositions and voicings.
+
+    Returns:
+        tuple: (padded pitch-class array with the bass note first, expected roots)
+    """
+    rng = np.random.default_rng(seed)
+    templates = [[pc for pc in range(12) if mask >> pc & 1] for _, _, mask in pcs.CHORD_QUALITIES]
+    quality_choice = rng.integers(0, len(templates), count)
+    roots = rng.integers(0, 12, count)
+    width = max(len(t) for t in templates)
+    notes = np.full((count, width), -1, dtype=np.int64)
+    for row, (quality, root) in enumerate(zip(quality_choice, roots)):
+        chord = [(pc + root) % 12 + 48 for pc in templates[quality]]
+        # Inversions: rotate the voicing so another chord tone is in the bass
+        shift = rng.integers(0, len(chord))
+        chord = chord[shift:] + [pc + 12 for pc in chord[:shift]]
+        notes[row, :len(chord)] = chord
+    return notes, roots
+
+def bench_numpy(notes):
+    start = time.perf_counter()
+    masks = pcs.masks_from_pitch_classes(notes)
+    roots, qualities = pcs.identify_chords(masks, bass=notes[:, 0])
+    transposed = pcs.transpose(masks, 5)
+    pcs.identify_chords(transposed, bass=notes[:, 0] + 5)
+    elapsed = time.perf_counter() - start
+    return elapsed, roots, qualities
+
+def bench_music21(notes):
+    from music21 import chord
+
+    start = time.perf_counter()
+    roots = []
+    names = []
+    for row in notes:
+        c = chord.Chord([int(n) for n in row if n >= 0])
+        roots.append(c.root().pitchClass)
+        names.append(c.commonName)
+        c.transpose(5).root()
+    elapsed = time.perf_counter() - start
+    return elapsed, np.array(roots), names
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark vectorized pitch-class sets against music21")
+    parser.add_argument("--chords", type=int, default=20000, help="Chords identified by the NumPy tables")
+    parser.add_argument("--music21-chords", type=int, default=2000,
+                        help="Chords identified by music21 (slower, so a subset is used)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="Also write the results to this JSON file")
+    options = parser.parse_args()
+
+    notes, expected_roots = random_chords(options.chords, options.seed)
+    numpy_time, roots, qualities = bench_numpy(notes)
+    numpy_rate = options.chords / numpy_time
+
+    results = {
+        "numpy": {"chords": options.chords, "seconds": numpy_time, "chords_per_s": numpy_rate,
+                  "identified": float(np.mean(qualities >= 0)),
+                  "root_matches_generated": float(np.mean(roots == expected_roots))},
+    }
+    print(f"NumPy tables: {options.chords} chords in {numpy_time * 1000:.1f} ms "
+          f"({numpy_rate:,.0f} chords/s, {results['numpy']['identified']:.1%} identified, "
+          f"{results['numpy']['root_matches_generated']:.1%} with the generated root)")
+
+    subset = min(options.music21_chords, options.chords)
+    try:
+        music21_time, music21_roots, _ = bench_music21(notes[:subset])
+    except ImportError:
+        print("music21 is not installed, skipping the comparison")
+    else:
+        music21_rate = subset / music21_time
+        # Symmetric chords (augmented, diminished seventh) and pairs such as C6/Am7 have no single correct root
+        agreement = float(np.mean(music21_roots == roots[:subset]))
+        results["music21"] = {"chords": subset, "seconds": music21_time, "chords_per_s": music21_rate,
+                              "root_agreement": agreement}
+        results["speedup"] = numpy_rate / music21_rate
+        print(f"music21 chord.Chord: {subset} chords in {music21_time * 1000:.1f} ms ({music21_rate:,.0f} chords/s)")
+        print(f"Speedup: {results['speedup']:,.0f}x, roots agree on {agreement:.1%} of the chords")
+
+    if options.json:
+        with open(options.json, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+        print(f"\nResults written to {options.json}")
+
+if __name__ == "__main__":
+    main()
@@ -11,7 +11,7 @@ mkdir -p music-theory-ai/etc/music-theory-ai
 
 # Kopiere Anwendungsdateien
 echo "Kopiere Anwendungsdateien..."
-cp first_ai.py music_notation.py prompt_manager.py topic_manager.py system_prompts.json requirements.txt setup.sh compat_layer.py music-theory-ai/usr/local/bin/music-theory-ai/
+cp first_ai.py music_notation.py prompt_manager.py topic_manager.py system_prompts.json requirements.txt setup.sh compat_layer.py abc_svg.py abc_tokenizer.py audio_cache.py batch_runner.py chat_engine.py context_window.py live_renderer.py model_health.py progress_report.py pitch_class_sets.py query_router.py rate_limiter.py render_cache.py render_pool.py response_cache.py speech_output.py theory_engine.py tts_worker.py startup_profile.py turn_metrics.py voice_input.py music-theory-ai/usr/local/bin/music-theory-ai/
 
 # Erstelle Verzeichnisse für Daten
 mkdir -p music-theory-ai/usr/local/bin/music-theory-ai/saved_chats
@@ -0,0 +1,329 @@
+"""
+Asynchronous chat engine for Music Theory AI Chat.
+This module runs an asyncio event loop in a background thread. The loop streams
+AI responses with the Groq async client and runs background jobs (notation
+rendering, text-to-speech) while the command prompt stays responsive.
+"""
+
+import asyncio
+import concurrent.futures
+import threading
+
+from context_window import count_message_tokens
+from model_health import ModelHealth, is_model_error
+from rate_limiter import RequestScheduler, PRIORITY_INTERACTIVE, EXPECTED_COMPLETION_TOKENS
+
+class ChatEngine:
+    """
+    Event loop that drives token streaming and background jobs.
+
+    Chat turns are executed one after another (each turn needs the answer to the
+    previous one), while background jobs run concurrently with them.
+    """
+
+    def __init__(self, client, scheduler=None, health=None, fallback_models=None):
+        """
+        Args:
+            client: A groq.AsyncGroq client (its own retries should be disabled), or a
+                function creating one, called when the first request is sent
+            scheduler (RequestScheduler, optional): Shared rate limit scheduler
+            health (ModelHealth, optional): Health state used for model fallback
+            fallback_models (list, optional): Model ids to fall back to, in order of preference
+        """
+        self._client = None if callable(client) else client
+        self._client_factory = client
+        self.scheduler = scheduler or RequestScheduler()
+        self.health = health or ModelHealth()
+        self.fallback_models = fallback_models or []
+        # Seconds without a first token before the request is hedged, None disables hedging
+        self.hedge_after = None
+        self.on_retry = None
+        self.on_fallback = None
+        self.stats = {"hedged": 0, "hedge_wins": 0, "fallbacks": 0}
+        self.loop = asyncio.new_event_loop()
+        self._turn_lock = None
+        self._pending = set()
+        # Chat turns only, so commands can wait for answers without waiting for renders or speech
+        self._turns = set()
+        self._pending_lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run_loop, name="chat-engine", daemon=True)
+        self._thread.start()
+
+    @property
+    def client(self):
+        """The API client, created on first use when a factory was given."""
+        if self._client is None:
+            self._client = self._client_factory()
+        return self._client
+
+    def _run_loop(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+
+    def _track(self, future, turn=False):
+        with self._pending_lock:
+            self._pending.add(future)
+            if turn:
+                self._turns.add(future)
+
+        def forget(done):
+            with self._pending_lock:
+                self._pending.discard(done)
+                self._turns.discard(done)
+
+        future.add_done_callback(forget)
+        return future
+
+    def submit(self, coroutine):
+        """
+        Schedule a coroutine on the engine loop.
+
+        Args:
+            coroutine: Coroutine to run
+
+        Returns:
+            concurrent.futures.Future: Future with the result of the coroutine
+        """
+        return self._track(asyncio.run_coroutine_threadsafe(coroutine, self.loop))
+
+    def submit_turn(self, turn_function, *args):
+        """
+        Schedule a chat turn. Turns run strictly one after another.
+
+        Args:
+            turn_function: Coroutine function implementing the turn
+            *args: Arguments for the turn function
+
+        Returns:
+            concurrent.futures.Future: Future with the result of the turn
+        """
+        async def run_turn():
+            if self._turn_lock is None:
+                self._turn_lock = asyncio.Lock()
+            async with self._turn_lock:
+                return await turn_function(*args)
+
+        return self._track(asyncio.run_coroutine_threadsafe(run_turn(), self.loop), turn=True)
+
+    def run_in_background(self, function, *args, on_done=None, **kwargs):
+        """
+        Run a blocking function (rendering, TTS) in a worker thread.
+
+        Args:
+            function: Blocking function to call
+            *args: Positional arguments for the function
+            on_done: Optional callback receiving the result when the job finishes
+            **kwargs: Keyword arguments for the function
+
+        Returns:
+            concurrent.futures.Future: Future with the result of the function
+        """
+        async def job():
+            result = await asyncio.to_thread(function, *args, **kwargs)
+            if on_done:
+                on_done(result)
+            return result
+
+        return self.submit(job())
+
+    def run_in_executor(self, executor, function, *args, on_done=None):
+        """
+        Run a function in a given executor, e.g. a process pool for CPU-bound rendering.
+
+        Args:
+            executor: concurrent.futures executor to run the function in
+            function: Function to call (picklable for process pools)
+            *args: Positional arguments for the function
+            on_done: Optional callback receiving the result when the job finishes
+
+        Returns:
+            concurrent.futures.Future: Future with the result of the function
+        """
+        async def job():
+            result = await self.loop.run_in_executor(executor, function, *args)
+            if on_done:
+                on_done(result)
+            return result
+
+        return self.submit(job())
+
+    async def _open_stream(self, messages, model, temperature):
+        response = await self.client.chat.completions.with_raw_response.create(
+            messages=messages,
+            model=model,
+            temperature=temperature,
+            stream=True
+        )
+        self.scheduler.update_from_headers(model, response.headers)
+        return await response.parse()
+
+    async def _start_stream(self, messages, model, temperature, priority):
+        """Open a stream and wait for its first content chunk."""
+        stream = await self.scheduler.call(
+            model,
+            count_message_tokens(messages) + EXPECTED_COMPLETION_TOKENS,
+            lambda: self._open_stream(messages, model, temperature),
+            priority=priority,
+            on_retry=self.on_retry
+        )
+        try:
+            async for chunk in stream:
+                content = chunk.choices[0].delta.content
+                if content:
+                    return model, stream, content
+        except BaseException:
+            # A cancelled hedge loser or a broken read must release its connection
+            await stream.close()
+            raise
+        return model, stream, ""
+
+    async def _start_hedged(self, messages, model, temperature, priority, candidates):
+        """
+        Start the request on the model and, if the first token is late, on a backup model.
+
+        Returns:
+            tuple: (model, stream, first content) of the request that answered first
+        """
+        primary = asyncio.ensure_future(self._start_stream(messages, model, temperature, priority))
+        done, _ = await asyncio.wait({primary}, timeout=self.hedge_after)
+        backups = [m for m in candidates if m != model]
+        if done or not backups:
+            return await primary
+
+        self.stats["hedged"] += 1
+        backup = asyncio.ensure_future(self._start_stream(messages, backups[0], temperature, priority))
+        task_models = {primary: model, backup: backups[0]}
+        pending = {primary, backup}
+        error = None
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is not None:
+                    error = task.exception()
+                    if pending and is_model_error(error):
+                        # The other request is still running, remember this model as failing
+                        self.health.mark_failure(task_models[task], error)
+                    continue
+                # The first stream to produce a token wins, the other one is cancelled
+                for loser in pending:
+                    loser.cancel()
+                # Wait until cancelled losers have closed their streams
+                await asyncio.gather(*pending, return_exceptions=True)
+                for loser in done - {task}:
+                    if loser.exception() is None:
+                        await loser.result()[1].close()
+                if task is backup:
+                    self.stats["hedge_wins"] += 1
+                return task.result()
+        raise error
+
+    async def stream_completion(self, messages, model, temperature, on_token=None,
+                                priority=PRIORITY_INTERACTIVE, details=None):
+        """
+        Stream a chat completion through the rate limit scheduler.
+
+        If the model fails before producing any output, the request falls back to
+        the next healthy model. With hedging enabled, a slow first token starts
+        the same request on a backup model and the faster stream is used.
+
+        Args:
+            messages (list): Messages to send
+            model (str): Model id
+            temperature (float): Sampling temperature
+            on_token: Optional callback receiving every content chunk
+            priority (int): Scheduler priority (interactive turns go first)
+            details (dict, optional): Filled with the model that actually answered
+
+        Returns:
+            str: The complete response text
+        """
+        candidates = self.health.candidates(model, self.fallback_models)
+        error = None
+        for candidate in candidates:
+            try:
+                if self.hedge_after is not None:
+                    answered_by, stream, first = await self._start_hedged(
+                        messages, candidate, temperature, priority, candidates[candidates.index(candidate):])
+                else:
+                    answered_by, stream, first = await self._start_stream(
+                        messages, candidate, temperature, priority)
+                break
+            except Exception as e:
+                if not is_model_error(e):
+                    raise
+                error = e
+                self.health.mark_failure(candidate, e)
+                self.stats["fallbacks"] += 1
+                if self.on_fallback and candidate != candidates[-1]:
+                    self.on_fallback(candidate, e)
+        else:
+            raise error
+
+        self.health.mark_success(answered_by)
+        if details is not None:
+            details["model"] = answered_by
+
+        parts = []
+        if first:
+            if on_token:
+                on_token(first)
+            parts.append(first)
+        async for chunk in stream:
+            content = chunk.choices[0].delta.content
+            if content:
+                if on_token:
+                    on_token(content)
+                parts.append(content)
+        return "".join(parts)
+
+    @property
+    def pending_jobs(self):
+        """Number of turns and background jobs that have not finished yet."""
+        with self._pending_lock:
+            return len(self._pending)
+
+    @property
+    def pending_turns(self):
+        """Number of chat turns that have not finished yet."""
+        with self._pending_lock:
+            return len(self._turns)
+
+    def wait_idle(self, timeout=None):
+        """
+        Wait until all turns and background jobs have finished.
+
+        Args:
+            timeout (float, optional): Maximum time to wait in seconds
+
+        Returns:
+            bool: True if everything finished in time
+        """
+        return self._wait(self._pending, timeout)
+
+    def wait_turns(self, timeout=None):
+        """
+        Wait until all queued chat turns have finished; renders and speech keep running.
+
+        Args:
+            timeout (float, optional): Maximum time to wait in seconds
+
+        Returns:
+            bool: True if the turns finished in time
+        """
+        return self._wait(self._turns, timeout)
+
+    def _wait(self, futures, timeout):
+        while True:
+            with self._pending_lock:
+                pending = list(futures)
+            if not pending:
+                return True
+            # Jobs submitted while waiting (e.g. a render started by a turn) are picked up by the next round
+            _, not_done = concurrent.futures.wait(pending, timeout=timeout)
+            if not_done:
+                return False
+
+    def shutdown(self):
+        """Stop the event loop."""
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self._thread.join(timeout=5)
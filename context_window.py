@@ -0,0 +1,169 @@
+"""
+Conversation context window for Music Theory AI Chat.
+This module keeps the system prompt plus the most recent turns inside a
+token budget and folds older turns into a compact running summary.
+"""
+
+import re
+
+# Rough number of characters per token for English text
+CHARS_PER_TOKEN = 4
+# Extra tokens the API spends on every message (role, separators)
+MESSAGE_OVERHEAD_TOKENS = 4
+# Budget used when a model does not define its own
+DEFAULT_CONTEXT_BUDGET = 6000
+# Maximum size of the running summary
+SUMMARY_TOKEN_BUDGET = 600
+# Maximum characters kept from a single folded message
+SUMMARY_LINE_CHARS = 160
+
+def estimate_tokens(text):
+    """
+    Estimate the number of tokens in a piece of text.
+
+    Args:
+        text (str): Text to measure
+
+    Returns:
+        int: Approximate token count
+    """
+    if not text:
+        return 0
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+def count_message_tokens(messages):
+    """
+    Estimate the token count of a list of chat messages.
+
+    Args:
+        messages (list): Messages in the chat completions format
+
+    Returns:
+        int: Approximate token count including per-message overhead
+    """
+    return sum(estimate_tokens(m.get("content", "")) + MESSAGE_OVERHEAD_TOKENS for m in messages)
+
+def summarize_message(message, max_chars=SUMMARY_LINE_CHARS):
+    """
+    Reduce a single message to a one-line summary.
+
+    Args:
+        message (dict): Chat message with role and content
+        max_chars (int): Maximum length of the summary line
+
+    Returns:
+        str: Summary line such as "User asked: ..."
+    """
+    content = re.sub(r'```.*?```', '[music example]', message.get("content", ""), flags=re.DOTALL)
+    content = re.sub(r'[#*`>|]', '', content)
+    content = ' '.join(content.split())
+
+    # Keep the first sentence, it usually carries the point of the message
+    first_sentence = re.split(r'(?<=[.!?])\s+', content, maxsplit=1)[0]
+    if len(first_sentence) > max_chars:
+        first_sentence = first_sentence[:max_chars - 3].rstrip() + "..."
+
+    prefix = "User asked" if message.get("role") == "user" else "Assistant answered"
+    return f"{prefix}: {first_sentence}"
+
+class ContextWindow:
+    """
+    Selects the messages that are sent to the model on every turn.
+
+    The full conversation stays untouched (it is still used for saving and
+    exporting). Messages that no longer fit into the budget are folded, oldest
+    first, into a running summary which is updated incrementally: every message
+    is summarized exactly once.
+    """
+
+    def __init__(self, summary_budget=SUMMARY_TOKEN_BUDGET):
+        self.summary_budget = summary_budget
+        self.summary_lines = []
+        self.omitted_lines = 0
+        self.folded_count = 0
+
+    def reset(self):
+        """Forget the running summary, e.g. after clearing or loading a conversation."""
+        self.summary_lines = []
+        self.omitted_lines = 0
+        self.folded_count = 0
+
+    def summary_message(self):
+        """Return the running summary as a system message, or None if nothing was folded."""
+        if not self.summary_lines:
+            return None
+        lines = ["Summary of the earlier conversation (older turns were condensed):"]
+        if self.omitted_lines:
+            lines.append(f"- ({self.omitted_lines} earlier messages omitted)")
+        lines.extend(f"- {line}" for line in self.summary_lines)
+        return {"role": "system", "content": "\n".join(lines)}
+
+    def _fold(self, message):
+        self.summary_lines.append(summarize_message(message))
+        self.folded_count += 1
+
+        # Keep the summary itself compact by dropping its oldest lines
+        while len(self.summary_lines) > 1 and count_message_tokens([self.summary_message()]) > self.summary_budget:
+            self.summary_lines.pop(0)
+            self.omitted_lines += 1
+
+    def _assemble(self, conversation):
+        messages = [conversation[0]]
+        summary = self.summary_message()
+        if summary:
+            messages.append(summary)
+        messages.extend(conversation[1 + self.folded_count:])
+        return messages
+
+    def build_messages(self, conversation, budget=DEFAULT_CONTEXT_BUDGET):
+        """
+        Build the list of messages to send for the next completion.
+
+        Args:
+            conversation (list): Full conversation, starting with the system prompt
+            budget (int): Token budget for the request
+
+        Returns:
+            list: System prompt, optional running summary and the most recent turns
+        """
+        history_length = len(conversation) - 1
+        if self.folded_count > history_length:
+            # The conversation was replaced or shortened behind our back
+            self.reset()
+
+        messages = self._assemble(conversation)
+        # Always keep at least the latest message, even if it alone exceeds the budget
+        while count_message_tokens(messages) > budget and history_length - self.folded_count > 1:
+            self._fold(conversation[1 + self.folded_count])
+            # Never start the recent window with an assistant reply
+            while (history_length - self.folded_count > 1
+                   and conversation[1 + self.folded_count]["role"] == "assistant"):
+                self._fold(conversation[1 + self.folded_count])
+            messages = self._assemble(conversation)
+
+        return messages
+
+    def usage(self, conversation, budget=DEFAULT_CONTEXT_BUDGET):
+        """
+        Report token usage of the conversation and the current window.
+
+        Args:
+            conversation (list): Full conversation, starting with the system prompt
+            budget (int): Token budget of the current model
+
+        Returns:
+            dict: Token and message counts for display
+        """
+        if self.folded_count > len(conversation) - 1:
+            self.reset()
+        summary = self.summary_message()
+        window = self._assemble(conversation)
+        return {
+            "budget": budget,
+            "window_tokens": count_message_tokens(window),
+            "full_tokens": count_message_tokens(conversation),
+            "system_tokens": count_message_tokens(conversation[:1]),
+            "summary_tokens": count_message_tokens([summary]) if summary else 0,
+            "recent_messages": len(conversation) - 1 - self.folded_count,
+            "folded_messages": self.folded_count,
+        }
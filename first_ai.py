@@ -5,15 +5,24 @@
 import sys
 import warnings
 
+# Startup profiling starts before anything else is imported
+from startup_profile import StartupProfile
+startup = StartupProfile(enabled="--profile-startup" in sys.argv)
+
 try:
     # Try to import our compatibility layer
-    from compat_layer import warn_about_compatibility
+    from compat_layer import warn_about_compatibility, is_module_available
     # Warn about any compatibility issues
     is_compatible = warn_about_compatibility()
     if not is_compatible:
         warnings.warn("Critical compatibility issues detected. Some features may not work.")
 except ImportError:
     warnings.warn("Compatibility layer not available. Proceeding without compatibility checks.")
+    import importlib.util
+
+    def is_module_available(module_name):
+        """Check if a module is available without importing it."""
+        return importlib.util.find_spec(module_name) is not None
 
 # Standard library imports
 import re
@@ -21,38 +30,33 @@ import os
 import datetime
 import time
 import json
+import asyncio
+import argparse
 from pathlib import Path
+startup.mark("standard library")
 
-# Try to import groq - handle import errors for different Python versions
-try:
-    import groq
-except ImportError:
-    warnings.warn("Failed to import groq module. Attempting alternative imports...")
-    try:
-        # Try to import from a different location
-        import site
-        site_packages = site.getsitepackages()[0]
-        sys.path.append(site_packages)
-        import groq
-    except ImportError:
+# The groq client is imported when the first request is sent; only check that it is installed
+if not is_module_available("groq"):
+    warnings.warn("Failed to find groq module. Attempting alternative locations...")
+    # Try to import from a different location
+    import site
+    site_packages = site.getsitepackages()[0]
+    sys.path.append(site_packages)
+    if not is_module_available("groq"):
         print("ERROR: Could not import groq module. API functionality will not work.")
         print("Try installing groq with: pip install --no-build-isolation groq==0.24.0")
-        groq = None
 
-# Other dependencies
+# Other dependencies (PDF and Word exporters are imported when a chat is saved)
 try:
     from dotenv import load_dotenv
-    from fpdf import FPDF
-    from docx import Document
     from rich.console import Console
-    from rich.progress import Progress, SpinnerColumn, TextColumn, BarColumn, TimeElapsedColumn
     from rich.panel import Panel
     from rich.table import Table
     from rich import box
-    from rich.markdown import Markdown
 except ImportError as e:
     print(f"Error importing dependency: {e}")
     print("Some features may not be available.")
+startup.mark("dotenv, rich")
 
 # Import API configuration
 try:
@@ -62,51 +66,79 @@ except ImportError:
     
 # Import path configuration
 try:
-    from path_config import get_directories
+    from path_config import get_directories, get_cache_directory
 except ImportError:
     get_directories = None
+    get_cache_directory = None
 # Import topic manager for system prompts
 try:
     from topic_manager import change_topic
     from prompt_manager import get_current_prompt_type, set_current_prompt_type
 except ImportError:
     pass
-# Import voice interaction capabilities
-try:
-    import pyttsx3
-    import speech_recognition as sr
-    import pyaudio  # Required by speech_recognition for microphone input
+startup.mark("configuration modules")
+# Check voice interaction capabilities; the packages are imported on first use
+# (pyaudio is required by speech_recognition for microphone input)
+missing_voice_modules = [name for name in ("pyttsx3", "speech_recognition", "pyaudio") if not is_module_available(name)]
+if not missing_voice_modules:
     VOICE_AVAILABLE = True
     print("Voice capabilities are enabled!")
     
-    # Import cloud TTS capabilities
-    try:
-        import requests
-        from playsound import playsound
-        import tempfile
+    # Check cloud TTS capabilities
+    missing_cloud_modules = [name for name in ("requests", "playsound") if not is_module_available(name)]
+    if not missing_cloud_modules:
         CLOUD_TTS_AVAILABLE = True
         print("Cloud TTS capabilities are enabled!")
-    except ImportError as e:
-        print(f"Cloud TTS not available: {e}")
+    else:
+        print(f"Cloud TTS not available: No module named '{missing_cloud_modules[0]}'")
         CLOUD_TTS_AVAILABLE = False
     
     # TTS settings
     AUTO_TTS_ENABLED = False  # Only use TTS when user explicitly requests it
     USE_CLOUD_TTS = True      # Prefer cloud TTS when available
-    TTS_RATE = 150            # Speech rate (150 is a good default)
-    TTS_VOLUME = 1.0          # Volume (0.0 to 1.0)
         
-except ImportError as e:
-    print(f"Voice capabilities not available: {e}")
+else:
+    print(f"Voice capabilities not available: No module named '{missing_voice_modules[0]}'")
     VOICE_AVAILABLE = False
     CLOUD_TTS_AVAILABLE = False
     AUTO_TTS_ENABLED = False
-# Import music notation module
-try:
-    from music_notation import render_abc_notation, extract_abc_notation, get_abc_example
-    MUSIC_NOTATION_AVAILABLE = True
-except ImportError:
-    MUSIC_NOTATION_AVAILABLE = False
+startup.mark("voice capability checks")
+# Import the asynchronous chat engine
+from chat_engine import ChatEngine
+from model_health import ModelHealth
+# Import the live Markdown renderer
+from live_renderer import LiveMarkdownRenderer
+# Import headless batch mode
+from batch_runner import load_questions, load_completed_ids, run_batch
+# Import the shared progress layer
+from progress_report import ProgressReporter
+# Import per-turn latency metrics
+from turn_metrics import TurnTimer, MetricsStore, load_metrics
+# Import conversation context window
+from context_window import ContextWindow, DEFAULT_CONTEXT_BUDGET
+# Import response cache
+from response_cache import ResponseCache, make_cache_key
+# Import offline theory engine
+from theory_engine import answer_query
+# Import complexity-based model routing
+from query_router import QueryRouter, estimate_savings
+# Import speech text cleaning and the speak-while-streaming pipeline
+from speech_output import clean_text_for_speech, chunk_sentences, SentenceStreamer, SpeechQueue, CloudSpeech, AudioPlayer
+# Import the synthesized speech cache
+from audio_cache import AudioCache
+# Import the persistent text-to-speech worker
+from tts_worker import TTSWorker
+from voice_input import VoiceListener
+startup.mark("chat modules")
+# Import music notation module (music21 itself is loaded at the first render)
+MUSIC_NOTATION_AVAILABLE = is_module_available("music21")
+if MUSIC_NOTATION_AVAILABLE:
+    from music_notation import extract_abc_notation, get_abc_example, start_prewarm, prewarm_status
+    from music_notation import find_cached_render, get_render_cache, AbcStreamDetector
+    from music_notation import render_abc_notation, set_notation_format, NOTATION_FORMATS, RENDER_OPTIONS
+    from render_pool import RenderPool, render_job, DEFAULT_RENDER_WORKERS
+    from abc_tokenizer import check_abc
+startup.mark("music notation")
 
 # Function to check system audio capabilities
 def check_audio_system():
@@ -119,40 +151,13 @@ def check_audio_system():
         "best_voice_id": None
     }
     
-    # Check basic TTS
-    try:
-        import pyttsx3
-        engine = pyttsx3.init()
+    # Check basic TTS (the worker has already chosen the best voice)
+    if VOICE_AVAILABLE and get_tts_worker().wait_ready():
         status["tts_basic"] = True
-        
-        # Find the best voice
-        voices = engine.getProperty('voices')
-        if voices:
-            # Prefer female voices as they often sound clearer
-            for voice in voices:
-                if "female" in voice.name.lower():
-                    status["best_voice_id"] = voice.id
-                    break
-            
-            # If no female voice found, use the first voice
-            if not status["best_voice_id"] and voices:
-                status["best_voice_id"] = voices[0].id
-                
-        # Clean up
-        del engine
-    except Exception:
-        status["tts_basic"] = False
+        status["best_voice_id"] = get_tts_worker().settings["voice"]
     
-    # Check cloud TTS
-    try:
-        import requests
-        from playsound import playsound
-        import tempfile
-        
-        # Just check if the modules are available, don't make actual requests
-        status["tts_cloud"] = True
-    except Exception:
-        status["tts_cloud"] = False
+    # Check cloud TTS (just check if the modules are available, don't make actual requests)
+    status["tts_cloud"] = CLOUD_TTS_AVAILABLE
     
     # Check speech recognition
     try:
@@ -173,15 +178,15 @@ def check_audio_system():
     return status
 
 # Function for enhanced text-to-speech
-def enhanced_tts(text, use_cloud=True, rate=150, volume=1.0):
+def enhanced_tts(text, use_cloud=True, rate=None, volume=None):
     """
     Enhanced text-to-speech function with cloud and fallback options.
     
     Args:
         text: Text to speak
         use_cloud: Whether to attempt cloud TTS first
-        rate: Speech rate (words per minute)
-        volume: Volume level (0.0 to 1.0)
+        rate: Speech rate (words per minute), defaults to the voice settings
+        volume: Volume level (0.0 to 1.0), defaults to the voice settings
     
     Returns:
         bool: True if successful, False otherwise
@@ -192,73 +197,19 @@ def enhanced_tts(text, use_cloud=True, rate=150, volume=1.0):
     
     # Clean the text for better speech synthesis
     # Remove markdown formatting, code blocks, etc.
-    clean_text = re.sub(r'```.*?```', 'code block', text, flags=re.DOTALL)
-    clean_text = re.sub(r'`.*?`', '', clean_text)
-    clean_text = re.sub(r'\*\*(.*?)\*\*', r'\1', clean_text)
-    clean_text = re.sub(r'\*(.*?)\*', r'\1', clean_text)
+    clean_text = clean_text_for_speech(text)
     
     # Try cloud TTS if requested and available
     if use_cloud and CLOUD_TTS_AVAILABLE:
         console.print("[yellow]Using cloud TTS...[/yellow]")
         
         try:
-            # Maximum length per request
-            MAX_LENGTH = 200
-            # Split text into sentences for more natural breaks
-            import re
-            sentences = re.split(r'(?<=[.!?])\s+', clean_text)
-            
-            # Group sentences into chunks under MAX_LENGTH
-            chunks = []
-            current_chunk = ""
+            # Split text into sentence-aware chunks under the request length limit
+            chunks = chunk_sentences(clean_text)
             
-            for sentence in sentences:
-                if len(current_chunk) + len(sentence) <= MAX_LENGTH:
-                    current_chunk += sentence + " "
-                else:
-                    if current_chunk:
-                        chunks.append(current_chunk.strip())
-                    current_chunk = sentence + " "
-            
-            if current_chunk:
-                chunks.append(current_chunk.strip())
-            
-            with Progress(
-                SpinnerColumn(),
-                TextColumn("[bold blue]Generating speech..."),
-                BarColumn(),
-                TimeElapsedColumn()
-            ) as progress:
-                task = progress.add_task("[green]Processing...", total=len(chunks))
-                
-                for i, chunk in enumerate(chunks):
-                    # Google Translate TTS API - no API key required
-                    tts_url = f"https://translate.google.com/translate_tts"
-                    params = {
-                        "ie": "UTF-8",
-                        "q": chunk,
-                        "tl": "en",
-                        "client": "tw-ob"
-                    }
-                    
-                    response = requests.get(tts_url, params=params)
-                    
-                    if response.status_code == 200:
-                        # Create temp file for the audio
-                        with tempfile.NamedTemporaryFile(delete=False, suffix='.mp3') as f:
-                            f.write(response.content)
-                            audio_file = f.name
-                        
-                        # Play the audio
-                        playsound(audio_file)
-                        
-                        # Clean up the temp file
-                        try:
-                            os.remove(audio_file)
-                        except:
-                            pass
-                    
-                    progress.update(task, advance=1)
+            with progress_reporter.task("Generating speech...", len(chunks)) as task:
+                # The next chunks download while the current one plays
+                get_cloud_speech().speak_chunks(chunks, on_chunk=task.advance)
             
             return True
                 
@@ -269,24 +220,7 @@ def enhanced_tts(text, use_cloud=True, rate=150, volume=1.0):
     # Use basic TTS as fallback
     try:
         console.print("[yellow]Using basic TTS...[/yellow]")
-        engine = pyttsx3.init()
-        
-        # Try to use a better voice if available
-        voices = engine.getProperty('voices')
-        if len(voices) > 1:  # If multiple voices are available
-            # Try to find a female voice which is often clearer
-            for voice in voices:
-                if "female" in voice.name.lower():
-                    engine.setProperty('voice', voice.id)
-                    break
-        
-        # Adjust rate for better clarity
-        engine.setProperty('rate', rate)
-        engine.setProperty('volume', volume)
-        
-        engine.say(clean_text)
-        engine.runAndWait()
-        return True
+        return get_tts_worker().speak(clean_text, rate, volume).result()
     
     except Exception as e:
         console.print(f"[bold red]Error with basic TTS:[/bold red] {e}")
@@ -329,18 +263,55 @@ except ImportError:
 # Create console for rich output
 console = Console()
 
+# Command line options
+def parse_arguments():
+    parser = argparse.ArgumentParser(description="Music Theory AI Chat")
+    parser.add_argument("--batch", metavar="QUESTIONS.jsonl",
+                        help="Answer the questions in a JSONL file without the interactive chat")
+    parser.add_argument("--concurrency", type=int, default=4,
+                        help="Number of requests answered at the same time in batch mode (default: 4)")
+    parser.add_argument("--output", metavar="RESULTS.jsonl",
+                        help="Results file for batch mode (default: <questions>.results.jsonl)")
+    parser.add_argument("--base-url", default=os.getenv("GROQ_BASE_URL"),
+                        help="API base URL, e.g. a local stub server (default: $GROQ_BASE_URL or the Groq API)")
+    parser.add_argument("--render-workers", type=int, default=None,
+                        help="Number of processes rendering notation blocks at the same time (default: up to 4)")
+    parser.add_argument("--no-prewarm", action="store_true",
+                        help="Do not load the notation renderer in the background after the prompt appears")
+    parser.add_argument("--quiet", action="store_true",
+                        help="Show no progress bars (the default when output is not a terminal)")
+    parser.add_argument("--profile-startup", action="store_true",
+                        help="Print how long each part of the startup took before the first prompt")
+    return parser.parse_args()
+
+args = parse_arguments()
+
+# Progress bars driven by real work units; suppressed for scripted and headless use
+progress_reporter = ProgressReporter(console, quiet=args.quiet or not console.is_terminal)
+
 # Define available models
 MODELS = {
-    "1": {"id": "llama-3.3-70b-versatile", "name": "Llama 3.3 70B (Versatile)"},
-    "2": {"id": "llama-3.1-70b-versatile", "name": "Llama 3.1 70B (Versatile)"},
-    "3": {"id": "mixtral-8x7b-32768", "name": "Mixtral 8x7B-32K"},
-    "4": {"id": "gemma-7b-it", "name": "Gemma 7B-IT"}
+    "1": {"id": "llama-3.3-70b-versatile", "name": "Llama 3.3 70B (Versatile)", "context_budget": 8000},
+    "2": {"id": "llama-3.1-70b-versatile", "name": "Llama 3.1 70B (Versatile)", "context_budget": 8000},
+    "3": {"id": "mixtral-8x7b-32768", "name": "Mixtral 8x7B-32K", "context_budget": 8000},
+    "4": {"id": "gemma-7b-it", "name": "Gemma 7B-IT", "context_budget": 4000},
+    "5": {"id": "llama-3.1-8b-instant", "name": "Llama 3.1 8B (Instant)", "context_budget": 8000, "tier": "small"}
 }
 
+def get_context_budget(model_id):
+    """Return the token budget for the conversation window of a model."""
+    for model in MODELS.values():
+        if model["id"] == model_id:
+            return model.get("context_budget", DEFAULT_CONTEXT_BUDGET)
+    return DEFAULT_CONTEXT_BUDGET
+
 # Default model and temperature
 current_model = "llama-3.3-70b-versatile"
 temperature = 0.7
 
+# Maximum number of times per second the streaming answer is re-rendered
+MARKDOWN_REFRESH_RATE = 8
+
 load_dotenv()
 
 # Check if API key is available
@@ -359,13 +330,224 @@ if not api_key:
     console.print("3. Run music-theory-ai-config (if installed as a Debian package)")
     exit(1)
 
-client = groq.Client(api_key=api_key)
+# Directory for caches and cached state
+if get_cache_directory:
+    cache_dir = get_cache_directory()
+else:
+    cache_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "cache")
+    os.makedirs(cache_dir, exist_ok=True)
+startup.mark("arguments, API key, cache directory")
+
+# Synthesized speech, reused for repeated phrases and offline playback
+audio_cache = AudioCache(os.path.join(cache_dir, "audio"))
+# Speech services are created by the first voice command that needs them
+voice_services = {}
+
+def play_audio(path):
+    """Play an audio file with playsound (imported on first use)."""
+    from playsound import playsound
+    playsound(path)
+
+# Plays speech in a player process that 'voice skip' and 'voice stop' can interrupt, else with playsound
+audio_player = AudioPlayer(fallback=play_audio)
+
+def get_cloud_speech():
+    """Shared connection pool and prefetch-ahead playback for cloud TTS."""
+    if "cloud" not in voice_services:
+        voice_services["cloud"] = CloudSpeech(audio_player, audio_cache=audio_cache) if CLOUD_TTS_AVAILABLE else None
+    return voice_services["cloud"]
+
+def get_tts_worker():
+    """One pyttsx3 engine on a worker thread; voice, rate and volume persist in voice_settings.json."""
+    if "tts" not in voice_services:
+        voice_services["tts"] = TTSWorker(
+            os.path.join(cache_dir, "voice_settings.json"),
+            audio_cache=audio_cache,
+            play_file=audio_player if CLOUD_TTS_AVAILABLE else None
+        )
+    return voice_services["tts"]
+
+def get_voice_listener():
+    """Background microphone listener, calibrated once; threshold and options persist in voice_input.json."""
+    if "listener" not in voice_services:
+        voice_services["listener"] = VoiceListener(os.path.join(cache_dir, "voice_input.json"))
+    return voice_services["listener"]
+
+def create_client():
+    """Create the API client; groq is imported here, when the first request is sent."""
+    import groq
+    # Retries are handled by the rate limit scheduler in the chat engine
+    return groq.AsyncGroq(api_key=api_key, base_url=args.base_url, max_retries=0)
+
+# Event loop for streaming and background jobs, falling back along the MODELS table
+chat_engine = ChatEngine(
+    create_client,
+    health=ModelHealth(os.path.join(cache_dir, "model_health.json")),
+    fallback_models=[model["id"] for model in MODELS.values()]
+)
+
+def report_retry(attempt, delay, error):
+    status = getattr(error, "status_code", None)
+    reason = "Rate limit reached" if status == 429 else f"Temporary API error ({status or type(error).__name__})"
+    console.print(f"\n[yellow]{reason}, retrying in {delay:.1f}s (attempt {attempt})...[/yellow]")
+
+def report_fallback(model, error):
+    console.print(f"\n[yellow]Model {model} failed ({error}), trying the next healthy model...[/yellow]")
+
+chat_engine.on_retry = report_retry
+chat_engine.on_fallback = report_fallback
+
+# Worker processes that render several notation blocks at the same time
+render_pool = RenderPool(args.render_workers or DEFAULT_RENDER_WORKERS) if MUSIC_NOTATION_AVAILABLE else None
+
+def format_render_time(seconds):
+    """Show native renders in milliseconds and MuseScore renders in seconds."""
+    return f"{seconds * 1000:.0f} ms" if seconds < 1 else f"{seconds:.1f}s"
+
+def submit_render(abc_notation, on_done):
+    """
+    Render a tune without blocking the prompt.
+    
+    Invalid tunes are rejected at once, simple tunes are drawn as SVG right away,
+    in milliseconds, and the others are rendered with MuseScore in the render pool.
+    
+    Args:
+        abc_notation (str): ABC notation to render
+        on_done: Callback receiving the cached image path (None if rendering failed) and the render time
+    
+    Returns:
+        bool: True if the tune is rendering in the background, False if on_done was already called
+    """
+    start = time.perf_counter()
+    # Rejected tunes stop here, so they are not checked again (and reported twice) by the pool
+    check = check_abc(abc_notation)
+    if not check["abc"]:
+        console.print(f"[red]Invalid ABC notation:[/red] {'; '.join(check['errors'])}")
+        on_done(None, time.perf_counter() - start)
+        return False
+    image_path = render_abc_notation(abc_notation, musescore=False)
+    if image_path:
+        on_done(image_path, time.perf_counter() - start)
+        return False
+    
+    def finish(result):
+        on_done(render_pool.store(abc_notation, result), result[1])
+    
+    def report_crash(future):
+        # A crashed worker process never reaches finish
+        if not future.cancelled() and future.exception():
+            on_done(None, 0.0)
+    
+    chat_engine.run_in_executor(render_pool.executor, render_job, abc_notation, on_done=finish).add_done_callback(report_crash)
+    return True
+
+# Render ABC blocks while the answer streams: "off", "on" (every topic) or "topics" ('auto render ...')
+AUTO_RENDER = "off"
+# Topics whose answers are rendered in "topics" mode
+AUTO_RENDER_TOPICS = ("composition", "harmony")
+
+def auto_render_active():
+    """Whether ABC blocks in the next answer should be rendered while it streams."""
+    if not MUSIC_NOTATION_AVAILABLE:
+        return False
+    return AUTO_RENDER == "on" or (AUTO_RENDER == "topics" and get_current_prompt_type() in AUTO_RENDER_TOPICS)
+
+def start_stream_render(abc_block, renders):
+    """
+    Start rendering a block found in an answer that is still streaming (runs on the engine loop).
+
+    Args:
+        abc_block (str): ABC notation block
+        renders (list): Gets an asyncio future per block, resolving to (image path or None, detail)
+    """
+    result = chat_engine.loop.create_future()
+    renders.append(result)
+    cached_path = find_cached_render(abc_block)
+    if cached_path:
+        result.set_result((cached_path, "from render cache"))
+        return
+    check = check_abc(abc_block)
+    if not check["abc"]:
+        result.set_result((None, "; ".join(check["errors"])))
+        return
+
+    def finish(image_path, seconds):
+        if not result.done():
+            result.set_result((image_path, format_render_time(seconds) if image_path else "render failed"))
+
+    # Native renders finish right here and pool renders report on the loop, so finish runs on the loop thread
+    submit_render(abc_block, finish)
+
+def list_stream_renders(detector, renders):
+    """
+    Finish the blocks of a streamed answer and list the rendered images below it.
+    
+    Renders that are still running are listed when they finish, so the next
+    turn does not wait for them.
+
+    Args:
+        detector (AbcStreamDetector): Detector the answer was fed to
+        renders (list): Futures filled by start_stream_render
+    """
+    detector.flush()
+    if not renders:
+        return
+    console.print("\n[bold yellow]Notation rendered while streaming:[/bold yellow]")
+    for number, result in enumerate(renders, 1):
+        def report(done, number=number):
+            image_path, detail = done.result()
+            if image_path:
+                console.print(f"  [green]Block {number}:[/green] {image_path} [dim]({detail})[/dim]")
+            else:
+                console.print(f"  [red]Block {number} was not rendered:[/red] {detail}")
+
+        if result.done():
+            report(result)
+        else:
+            console.print(f"  [blue]Block {number} is still rendering and is listed when it finishes.[/blue]")
+            result.add_done_callback(report)
+startup.mark("audio cache, chat engine")
 # Setting up the conversation
 current_topic = get_current_prompt_type()  # Get current topic from prompt manager
 conversation = [
     {"role": "system",
      "content": SYSTEM_PROMPTS[current_topic]}
 ]
+# Keeps the messages sent to the model inside the token budget
+context_window = ContextWindow()
+
+# Cache for repeated questions (memory + SQLite)
+response_cache = ResponseCache(os.path.join(cache_dir, "responses.sqlite3"))
+
+# Latency metrics of every turn, appended to a JSONL file for graphing
+turn_metrics = MetricsStore(os.getenv("MUSIC_THEORY_AI_METRICS") or os.path.join(cache_dir, "metrics.jsonl"))
+
+# Lookup questions (scales, chords, intervals...) answered by the offline theory engine
+LOCAL_THEORY_MODEL = "local-theory-engine"
+local_theory = {"enabled": True, "local": 0, "total": 0}
+
+# Sentences waiting to be spoken in auto-speak mode ('auto speak on'), created on first use
+speech_queue = None
+
+# Sends simple questions to a small model when automatic routing is on ('route on')
+query_router = QueryRouter(MODELS, os.path.join(cache_dir, "routing.jsonl"))
+
+# Function to replay a cached response
+async def replay_cached_response(text, renderer, simulate_streaming=False):
+    """
+    Show a cached response, optionally word by word like a live stream.
+    
+    Args:
+        text (str): The cached response
+        renderer (LiveMarkdownRenderer): Renderer that displays the response
+        simulate_streaming (bool): Whether to feed the response in small chunks
+    """
+    if not simulate_streaming:
+        renderer.append(text)
+        return
+    for word in re.findall(r'\S+\s*', text):
+        renderer.append(word)
+        await asyncio.sleep(0.01)
 
 # Function to extract and format URLs from text
 def extract_urls(text):
@@ -395,59 +577,14 @@ def speak_text(text, use_cloud=None, show_progress=True):
             console.print("[yellow]Using cloud TTS...[/yellow]")
         
         try:
-            # Maximum length per request
-            MAX_LENGTH = 200
-            chunks = [text[i:i+MAX_LENGTH] for i in range(0, len(text), MAX_LENGTH)]
+            # Sentence-aware chunks, so words are never cut between requests
+            chunks = chunk_sentences(text)
             
             if show_progress:
-                progress_indicator = Progress(
-                    SpinnerColumn(),
-                    TextColumn("[bold blue]Generating speech..."),
-                    BarColumn(),
-                    TimeElapsedColumn()
-                )
+                with progress_reporter.task("Generating speech...", len(chunks)) as task:
+                    get_cloud_speech().speak_chunks(chunks, on_chunk=task.advance)
             else:
-                # Create a dummy progress context manager that does nothing
-                class DummyProgress:
-                    def __enter__(self): return self
-                    def __exit__(self, *args): pass
-                    def add_task(self, *args, **kwargs): return 0
-                    def update(self, *args, **kwargs): pass
-                progress_indicator = DummyProgress()
-            
-            with progress_indicator as progress:
-                if show_progress:
-                    task = progress.add_task("[green]Processing...", total=len(chunks))
-                
-                for i, chunk in enumerate(chunks):
-                    # Google Translate TTS API - no API key required
-                    tts_url = f"https://translate.google.com/translate_tts"
-                    params = {
-                        "ie": "UTF-8",
-                        "q": chunk,
-                        "tl": "en",
-                        "client": "tw-ob"
-                    }
-                    
-                    response = requests.get(tts_url, params=params)
-                    
-                    if response.status_code == 200:
-                        # Create temp file for the audio
-                        with tempfile.NamedTemporaryFile(delete=False, suffix='.mp3') as f:
-                            f.write(response.content)
-                            audio_file = f.name
-                        
-                        # Play the audio
-                        playsound(audio_file)
-                        
-                        # Clean up the temp file
-                        try:
-                            os.remove(audio_file)
-                        except:
-                            pass
-                    
-                    if show_progress:
-                        progress.update(task, advance=1)
+                get_cloud_speech().speak_chunks(chunks)
             
             return True
         except Exception as e:
@@ -462,23 +599,7 @@ def speak_text(text, use_cloud=None, show_progress=True):
             console.print("[yellow]Using basic TTS...[/yellow]")
         
         try:
-            engine = pyttsx3.init()
-            
-            # Try to use a better voice if available
-            voices = engine.getProperty('voices')
-            if len(voices) > 1:  # If multiple voices are available
-                # Try to find a female voice which is often clearer
-                for voice in voices:
-                    if "female" in voice.name.lower():
-                        engine.setProperty('voice', voice.id)
-                        break
-            
-            # Adjust rate for better clarity
-            engine.setProperty('rate', TTS_RATE)
-            engine.setProperty('volume', TTS_VOLUME)
-            engine.say(text)
-            engine.runAndWait()
-            return True
+            return get_tts_worker().speak(text).result()
         except Exception as e:
             if show_progress:
                 console.print(f"[bold red]Error with basic TTS:[/bold red] {e}")
@@ -514,29 +635,12 @@ def save_to_txt(conversation_history, filename=None):
         
         console.print(f"[blue]Attempting to save to file:[/blue] {filename}")
         
-        with Progress(
-            SpinnerColumn(),
-            TextColumn("[bold blue]Saving text file..."),
-            BarColumn(),
-            TimeElapsedColumn()
-        ) as progress:
-            task = progress.add_task("[green]Writing...", total=100)
-            
-            # Start the task
-            progress.update(task, advance=10)
-            time.sleep(0.2)  # Simulate initial setup
-            
+        # The bar advances by messages written
+        with progress_reporter.task("Saving text file...", len(conversation_history[1:])) as task:
             with open(filename, 'w', encoding='utf-8') as file:
                 file.write("Music Theory AI Chat\n")
                 file.write("="*50 + "\n\n")
                 
-                progress.update(task, advance=20)
-                time.sleep(0.1)  # Simulate processing
-                
-                # Calculate message count for progress updates
-                message_count = len(conversation_history[1:])
-                progress_per_message = 60 / max(1, message_count)
-                
                 # Skip the system message
                 for message in conversation_history[1:]:
                     role = message["role"].capitalize()
@@ -553,13 +657,7 @@ def save_to_txt(conversation_history, filename=None):
                     else:
                         file.write(f"{role}: {content}\n\n")
                         
-                    progress.update(task, advance=progress_per_message)
-                    time.sleep(0.05)  # Small delay for visual effect
-            
-            # Finish up
-            progress.update(task, advance=10)
-            time.sleep(0.2)
-            progress.update(task, completed=100)
+                    task.advance()
         
         console.print(f"[bold green]Success:[/bold green] Text file saved to {filename}")
         return filename
@@ -585,24 +683,13 @@ def save_to_pdf(conversation_history, filename=None):
         
         console.print(f"[blue]Attempting to save PDF to:[/blue] {filename}")
         
-        with Progress(
-            SpinnerColumn(),
-            TextColumn("[bold blue]Creating PDF..."),
-            BarColumn(),
-            TimeElapsedColumn()
-        ) as progress:
-            task = progress.add_task("[green]Processing...", total=100)
-            
-            # Start the task
-            progress.update(task, advance=10)
-            time.sleep(0.3)  # PDF initialization takes a bit longer
-            
+        # The bar advances by messages laid out, plus one unit for writing the file
+        with progress_reporter.task("Creating PDF...", len(conversation_history[1:]) + 1) as task:
+            from fpdf import FPDF
             pdf = FPDF()
             pdf.add_page()
             pdf.set_font("Arial", size=12)
             
-            progress.update(task, advance=10)
-            
             # Add title
             pdf.set_font("Arial", 'B', 16)
             pdf.cell(200, 10, txt="Music Theory AI Chat", ln=True, align='C')
@@ -611,12 +698,6 @@ def save_to_pdf(conversation_history, filename=None):
             # Reset font
             pdf.set_font("Arial", size=12)
             
-            progress.update(task, advance=10)
-            
-            # Calculate message count for progress updates
-            message_count = len(conversation_history[1:])
-            progress_per_message = 60 / max(1, message_count)
-            
             # Skip the system message
             for message in conversation_history[1:]:
                 role = message["role"].capitalize()
@@ -633,18 +714,11 @@ def save_to_pdf(conversation_history, filename=None):
                 pdf.multi_cell(0, 10, txt=content)
                 pdf.ln(5)
                 
-                # Update progress
-                progress.update(task, advance=progress_per_message)
-                time.sleep(0.1)  # PDF processing is slower
+                task.advance()
             
             # Finalize PDF
-            progress.update(task, advance=5)
             pdf.output(filename)
-            
-            # Complete
-            progress.update(task, advance=5)
-            time.sleep(0.2)
-            progress.update(task, completed=100)
+            task.advance()
         
         console.print(f"[bold green]Success:[/bold green] PDF file saved to {filename}")
         return filename
@@ -669,26 +743,10 @@ def save_session(conversation_history, filename=None):
         
         console.print(f"[blue]Saving session to:[/blue] {filename}")
         
-        with Progress(
-            SpinnerColumn(),
-            TextColumn("[bold blue]Saving session..."),
-            BarColumn(),
-            TimeElapsedColumn()
-        ) as progress:
-            task = progress.add_task("[green]Writing...", total=100)
-            
-            # Start the task
-            progress.update(task, advance=30)
-            time.sleep(0.2)  # Simulate setup
-            
-            import json
-            with open(filename, 'w', encoding='utf-8') as f:
-                json.dump(conversation_history, f, ensure_ascii=False, indent=2)
-            
-            # Finish up
-            progress.update(task, advance=70)
-            time.sleep(0.2)
-            progress.update(task, completed=100)
+        # The bar advances by bytes flushed
+        progress_reporter.write_text(
+            filename, json.dumps(conversation_history, ensure_ascii=False, indent=2), "Saving session..."
+        )
         
         console.print(f"[bold green]Success:[/bold green] Session saved to {filename}")
         return filename
@@ -742,24 +800,8 @@ def load_session(filename=None):
         
         console.print(f"[blue]Loading session from:[/blue] {filename}")
         
-        with Progress(
-            SpinnerColumn(),
-            TextColumn("[bold blue]Loading session..."),
-            BarColumn(),
-            TimeElapsedColumn()
-        ) as progress:
-            task = progress.add_task("[green]Reading...", total=100)
-            
-            progress.update(task, advance=30)
-            time.sleep(0.2)  # Simulate reading delay
-            
-            import json
-            with open(filename, 'r', encoding='utf-8') as f:
-                loaded_conversation = json.load(f)
-            
-            progress.update(task, advance=70)
-            time.sleep(0.2)
-            progress.update(task, completed=100)
+        # The bar advances by bytes read
+        loaded_conversation = json.loads(progress_reporter.read_text(filename, "Loading session..."))
         
         console.print(f"[bold green]Success:[/bold green] Session loaded from {filename}")
         return loaded_conversation
@@ -784,27 +826,12 @@ def save_to_docx(conversation_history, filename=None):
         
         console.print(f"[blue]Attempting to save DOCX to:[/blue] {filename}")
         
-        with Progress(
-            SpinnerColumn(),
-            TextColumn("[bold blue]Creating Word document..."),
-            BarColumn(),
-            TimeElapsedColumn()
-        ) as progress:
-            task = progress.add_task("[green]Processing...", total=100)
-            
-            # Start the task
-            progress.update(task, advance=15)
-            time.sleep(0.2)  # Document initialization
-            
+        # The bar advances by messages added, plus one unit for writing the file
+        with progress_reporter.task("Creating Word document...", len(conversation_history[1:]) + 1) as task:
+            from docx import Document
             doc = Document()
             doc.add_heading('Music Theory AI Chat', 0)
             
-            progress.update(task, advance=15)
-            
-            # Calculate message count for progress updates
-            message_count = len(conversation_history[1:])
-            progress_per_message = 60 / max(1, message_count)
-            
             # Skip the system message
             for message in conversation_history[1:]:
                 role = message["role"].capitalize()
@@ -817,17 +844,11 @@ def save_to_docx(conversation_history, filename=None):
                 # Add space between messages
                 doc.add_paragraph()
                 
-                # Update progress
-                progress.update(task, advance=progress_per_message)
-                time.sleep(0.07)  # Small delay for visual effect
+                task.advance()
             
             # Save the document
-            progress.update(task, advance=10)
             doc.save(filename)
-            
-            # Complete
-            time.sleep(0.2)
-            progress.update(task, completed=100)
+            task.advance()
         
         console.print(f"[bold green]Success:[/bold green] Word document saved to {filename}")
         return filename
@@ -835,6 +856,194 @@ def save_to_docx(conversation_history, filename=None):
         console.print(f"[bold red]Error saving DOCX:[/bold red] {e}")
         return None
 
+# Function to run one chat turn on the engine loop
+async def chat_turn(history, user_message, model, temp):
+    """
+    Send a user message and stream the AI response.
+    
+    Args:
+        history (list): Conversation the turn belongs to
+        user_message (str): The user's message
+        model (str): Model id to use
+        temp (float): Sampling temperature
+    """
+    # Add user message to conversation
+    history.append({"role": "user", "content": user_message})
+    
+    # Get AI response
+    try:
+        console.print("\n[bold cyan]AI:[/bold cyan]")
+        
+        # Filled by the engine with the model that actually answered
+        details = {}
+        timer = TurnTimer(model, get_current_prompt_type())
+        
+        # In auto-speak mode, completed sentences are spoken while the answer streams
+        speech = SentenceStreamer(speech_queue.put) if AUTO_TTS_ENABLED and speech_queue else None
+        
+        # In auto-render mode, ABC blocks are rendered as soon as their closing fence or blank line arrives
+        renders = []
+        notation = AbcStreamDetector(lambda block: start_stream_render(block, renders)) if auto_render_active() else None
+        if notation:
+            # Tunes that need MuseScore must not wait for the worker processes to be forked
+            render_pool.start()
+        
+        # Answer deterministic lookups locally, without an API call
+        local_theory["total"] += 1
+        local_answer = answer_query(user_message) if local_theory["enabled"] else None
+        if local_answer is not None:
+            local_theory["local"] += 1
+            with LiveMarkdownRenderer(console, refresh_rate=MARKDOWN_REFRESH_RATE) as renderer:
+                timer.token(local_answer)
+                renderer.append(local_answer)
+                timer.end_stream()
+            if speech:
+                speech.feed(local_answer)
+                speech.flush()
+            if notation:
+                notation.feed(local_answer)
+            timer.model = LOCAL_THEORY_MODEL
+            turn_metrics.record(timer.finish(local_answer))
+            history.append({"role": "assistant", "content": local_answer})
+            if notation:
+                list_stream_renders(notation, renders)
+            return
+        
+        # Let simple questions go to a small, fast model
+        large_model = model
+        routed = False
+        if query_router.enabled:
+            model, decision = query_router.route(user_message, get_current_prompt_type(), model,
+                                                 chat_engine.health.is_healthy)
+            routed = decision["routed"]
+            timer.model = model
+            console.print(f"[dim]Routed to {model} ({decision['complexity']}: {', '.join(decision['reasons'])})[/dim]")
+        
+        # Answer repeated questions from the cache when the temperature allows it
+        cache_key = None
+        cached_response = None
+        if response_cache.is_cacheable(temp):
+            cache_key = make_cache_key(model, temp, get_current_prompt_type(), history)
+            cached_response = response_cache.get(cache_key)
+        elif response_cache.enabled:
+            response_cache.stats["skipped"] += 1
+        
+        # Render the answer once, as Markdown that is updated in place while it streams
+        with LiveMarkdownRenderer(console, refresh_rate=MARKDOWN_REFRESH_RATE) as renderer:
+            def show_token(content):
+                timer.token(content)
+                renderer.append(content)
+                if speech:
+                    speech.feed(content)
+                if notation:
+                    notation.feed(content)
+            
+            if cached_response is not None:
+                timer.cached = True
+                await replay_cached_response(cached_response, renderer, response_cache.simulate_streaming)
+                if speech:
+                    speech.feed(cached_response)
+                if notation:
+                    notation.feed(cached_response)
+            else:
+                await chat_engine.stream_completion(
+                    context_window.build_messages(history, get_context_budget(model)),
+                    model,
+                    temp,
+                    on_token=show_token,
+                    details=details
+                )
+            timer.end_stream()
+        full_response = renderer.text
+        if speech:
+            speech.flush()
+        
+        if details.get("model", model) != model:
+            console.print(f"[dim]Answered by {details['model']} instead of {model}[/dim]")
+        
+        if cache_key and cached_response is None:
+            response_cache.put(cache_key, full_response)
+        
+        # Process the full response to find and highlight clickable links
+        urls = extract_urls(full_response)
+        
+        if urls:
+            # If we found URLs, show them in a special colorized clickable section
+            console.print("\n[bold yellow]Links found in response:[/bold yellow]")
+            for i, url in enumerate(urls, 1):
+                console.print(f"  [bold blue][link={url}]{i}. {url}[/link][/bold blue]")
+
+        # Time spent after the stream: final Markdown frame and URL extraction
+        timer.add_postprocess(time.perf_counter() - timer.stream_end)
+        timer.model = details.get("model", model)
+        metrics = timer.finish(full_response)
+        if query_router.enabled:
+            metrics["routed"] = routed
+            metrics["large_model"] = large_model
+        turn_metrics.record(metrics)
+        
+        # Add AI response to conversation history
+        history.append({"role": "assistant", "content": full_response})
+        
+        if notation:
+            list_stream_renders(notation, renders)
+        
+    except Exception as e:
+        console.print(f"\n[bold red]Error:[/bold red] {e}")
+        console.print("[yellow]Something went wrong. Please try again.[/yellow]")
+
+# Function to answer a file of questions without the interactive chat
+def run_batch_mode(questions_file, concurrency, output_file=None):
+    """
+    Run batch mode and print a throughput report.
+    
+    Args:
+        questions_file (str): JSONL file with questions
+        concurrency (int): Number of requests in flight
+        output_file (str, optional): JSONL results file, resumed if it exists
+    """
+    if output_file is None:
+        output_file = os.path.splitext(questions_file)[0] + ".results.jsonl"
+    
+    try:
+        questions = load_questions(questions_file)
+        completed = load_completed_ids(output_file)
+    except (OSError, ValueError) as e:
+        console.print(f"[bold red]Cannot run batch:[/bold red] {e}")
+        return
+    remaining = [q for q in questions if q["id"] not in completed]
+    
+    console.print(f"[blue]Batch mode:[/blue] {len(questions)} questions, {len(completed)} already answered, "
+                  f"{len(remaining)} to go (concurrency {concurrency})")
+    console.print(f"[blue]Writing results to:[/blue] {output_file}")
+    
+    with progress_reporter.task("Answering questions...", len(remaining)) as task:
+        def report_result(result):
+            if result["status"] != "ok":
+                task.print(f"[red]Question {result['id']} failed:[/red] {result['error']}")
+            task.advance()
+        
+        report = chat_engine.submit(run_batch(
+            chat_engine, remaining, output_file, SYSTEM_PROMPTS, MODELS, current_model,
+            temperature, concurrency=concurrency, on_result=report_result
+        )).result()
+    
+    table = Table(title="Batch Results")
+    table.add_column("Metric", style="cyan")
+    table.add_column("Value", style="green", justify="right")
+    table.add_row("Answered", str(report["answered"]))
+    table.add_row("Failed", str(report["failed"]))
+    table.add_row("Elapsed", f"{report['elapsed_s']:.1f} s")
+    table.add_row("Questions / min", f"{report['questions_per_min']:.1f}")
+    table.add_row("Tokens / s", f"{report['tokens_per_s']:.1f}")
+    table.add_row("Mean latency", f"{report['mean_latency_s']:.2f} s")
+    console.print(table)
+
+if args.batch:
+    run_batch_mode(args.batch, args.concurrency, args.output)
+    chat_engine.shutdown()
+    sys.exit(0)
+
 from rich.panel import Panel
 from rich.table import Table
 from rich import box
@@ -859,12 +1068,47 @@ welcome_panel = Panel(
 
 console.print(welcome_panel)
 console.print("-" * 50)
+startup.mark("conversation state, welcome panel")
+if args.profile_startup:
+    startup.report(console)
+
+# Load music21 in the background once the prompt is up, so the first render doesn't wait for it
+if MUSIC_NOTATION_AVAILABLE and not args.no_prewarm:
+    start_prewarm()
+notation_announced = False
+
+def describe_notation_status():
+    """Describe the state of the notation renderer for display."""
+    state = prewarm_status["state"]
+    if state == "ready":
+        return f"[green]Notation renderer ready[/green] [dim](warmed up in {prewarm_status['seconds']:.1f}s)[/dim]"
+    if state == "warming":
+        return "[yellow]Notation renderer warming up in the background...[/yellow]"
+    if state == "failed":
+        return f"[red]Notation renderer warm-up failed:[/red] {prewarm_status['error']}"
+    return "[dim]Notation renderer not loaded yet (it loads with the first render)[/dim]"
+
+def wait_for_answers():
+    """Wait until queued chat turns have finished, so the conversation is up to date."""
+    if chat_engine.pending_turns:
+        console.print("[dim]Waiting for the current answer to finish...[/dim]")
+        chat_engine.wait_turns()
 
 while True:
+    # Announce once, between prompts, when the background warm-up has finished
+    if MUSIC_NOTATION_AVAILABLE and not notation_announced and prewarm_status["state"] in ("ready", "failed"):
+        console.print(describe_notation_status())
+        notation_announced = True
     user_message = input("\nYou: ")
     
     # Check for commands
     if user_message.lower() == 'exit':
+        if chat_engine.pending_jobs:
+            console.print(f"[yellow]Waiting for {chat_engine.pending_jobs} running task(s) to finish...[/yellow]")
+            chat_engine.wait_idle()
+        chat_engine.shutdown()
+        if render_pool:
+            render_pool.shutdown()
         console.print("[bold green]Goodbye! Chat ended.[/bold green]")
         break
     elif user_message.lower() == 'help':
@@ -885,24 +1129,54 @@ while True:
         table.add_row("clear", "Clear the conversation history")
         table.add_row("models", "List and select available AI models")
         table.add_row("temp <value>", "Set temperature (0.0-1.0)")
+        table.add_row("context", "Show token usage of the conversation window")
+        table.add_row("context budget <tokens>", "Set the token budget for the current model")
+        table.add_row("stats", "Show latency statistics (time to first token, tokens/s) per model and topic")
+        table.add_row("route on/off", "Send simple questions to a small, fast model automatically")
+        table.add_row("route", "Show routing decisions and the latency saved")
+        table.add_row("route topic <topic> <size>", "Always use the small or large model for a topic (or 'auto')")
+        table.add_row("local", "Show how many questions the offline theory engine answered")
+        table.add_row("local on/off", "Answer scale, chord, interval and key questions offline")
+        table.add_row("limits", "Show rate limit status for each model")
+        table.add_row("hedge <seconds>/off/status", "Send slow requests to a backup model after the given wait")
+        table.add_row("cache", "Show response cache statistics")
+        table.add_row("cache on/off", "Enable or disable the response cache")
+        table.add_row("cache any temp", "Toggle caching of answers at temperatures above 0.3")
+        table.add_row("cache stream", "Toggle simulated streaming when replaying cached answers")
+        table.add_row("cache clear", "Remove all cached responses")
+        table.add_row("cache clear audio", "Remove all cached speech audio")
+        if MUSIC_NOTATION_AVAILABLE:
+            table.add_row("cache clear notation", "Remove all cached notation images")
         table.add_row("save session", "Save current conversation to a file")
+        table.add_row("quiet on/off", "Hide or show progress bars")
         table.add_row("load session", "Load a previously saved conversation")
         table.add_row("topic", "Select a specialized music topic")
         if MUSIC_NOTATION_AVAILABLE:
             table.add_row("music example", "Show an example music notation")
             table.add_row("render notation", "Render ABC notation from the last AI response")
+            table.add_row("notation status", "Show whether the notation renderer has finished loading")
+            table.add_row("render workers <n>", "Set how many processes render notation blocks at the same time")
+            table.add_row("notation format svg/png", "Draw simple tunes as SVG in milliseconds, or render everything with MuseScore")
+            table.add_row("auto render on/off/topics", "Render ABC blocks while the answer streams (always, never, or for composition and harmony)")
         if VOICE_AVAILABLE:
-            table.add_row("voice input", "Use voice input for your message")
+            table.add_row("voice input", "Use voice input for your message (push-to-talk)")
+            table.add_row("voice listen on/off", "Listen continuously and send every spoken phrase as a message")
+            table.add_row("voice offline on/off", "Prefer offline (Sphinx) speech recognition over Google")
+            table.add_row("voice calibrate", "Measure background noise again and save the microphone threshold")
             table.add_row("voice output", "Read the last AI response aloud with voice options")
+            table.add_row("auto speak on/off", "Read answers aloud sentence by sentence while they stream")
             table.add_row("voice settings", "Configure voice output settings")
+            table.add_row("voice stop / voice skip", "Stop all speech, or skip the sentence being spoken (at once with ffplay or mpg123, otherwise after it)")
             table.add_row("install cloud tts", "Install packages required for high-quality voice")
         
         # Display the help panel with the table inside
         console.print(Panel(table, title="Music Theory AI Chat - Help Menu", border_style="blue"))
         continue
     elif user_message.lower() == 'clear':
-        # Keep system message but clear conversation history
-        conversation = [conversation[0]]
+        wait_for_answers()
+        # Keep system message but clear conversation history (in place, queued turns share the list)
+        del conversation[1:]
+        context_window.reset()
         console.print("[yellow]Conversation history cleared.[/yellow]")
         continue
     elif user_message.lower() == 'models':
@@ -913,11 +1187,13 @@ while True:
         table.add_column("Option", style="cyan", justify="center")
         table.add_column("Model", style="green")
         table.add_column("Description", style="yellow")
+        table.add_column("Status", style="magenta")
         
         # Add model rows
         for key, model in MODELS.items():
             marker = "→" if model["id"] == current_model else " "
-            table.add_row(f"{key} {marker}", model["name"], "Currently selected" if model["id"] == current_model else "")
+            table.add_row(f"{key} {marker}", model["name"], "Currently selected" if model["id"] == current_model else "",
+                          chat_engine.health.status(model["id"]))
         
         console.print(table)
         model_choice = input("Select model number (or press Enter to keep current): ")
@@ -936,7 +1212,242 @@ while True:
         except (IndexError, ValueError):
             console.print("[red]Invalid format. Use 'temp 0.7' (value between 0.0 and 1.0)[/red]")
         continue
+    elif user_message.lower() == 'context':
+        wait_for_answers()
+        usage = context_window.usage(conversation, get_context_budget(current_model))
+        
+        table = Table(title="Conversation Context")
+        table.add_column("Item", style="cyan")
+        table.add_column("Value", style="green", justify="right")
+        table.add_row("Model", current_model)
+        table.add_row("Token budget", str(usage["budget"]))
+        table.add_row("Tokens sent per request", f"{usage['window_tokens']} ({usage['window_tokens'] * 100 // max(1, usage['budget'])}%)")
+        table.add_row("System prompt tokens", str(usage["system_tokens"]))
+        table.add_row("Summary tokens", str(usage["summary_tokens"]))
+        table.add_row("Recent messages kept", str(usage["recent_messages"]))
+        table.add_row("Messages folded into summary", str(usage["folded_messages"]))
+        table.add_row("Full history tokens", str(usage["full_tokens"]))
+        console.print(table)
+        continue
+    elif user_message.lower().startswith('context budget'):
+        try:
+            budget = int(user_message.split(' ')[2])
+            if budget < 500:
+                raise ValueError
+            for model in MODELS.values():
+                if model["id"] == current_model:
+                    model["context_budget"] = budget
+            console.print(f"[green]Context budget for {current_model} set to:[/green] {budget} tokens")
+        except (IndexError, ValueError):
+            console.print("[red]Invalid format. Use 'context budget 6000' (at least 500 tokens)[/red]")
+        continue
+    elif user_message.lower() == 'stats':
+        if not turn_metrics.records:
+            console.print("[yellow]No turns recorded yet in this session.[/yellow]")
+            continue
+        
+        def format_seconds(value):
+            return f"{value:.2f}s" if value is not None else "-"
+        
+        for group_by in ("model", "topic"):
+            table = Table(title=f"Turn Latency by {group_by.capitalize()} (p50 / p90 / p99)")
+            table.add_column(group_by.capitalize(), style="cyan")
+            table.add_column("Turns", justify="right")
+            table.add_column("Time to first token", style="green", justify="right")
+            table.add_column("Tokens/s (p50)", style="green", justify="right")
+            table.add_column("Turn time", style="green", justify="right")
+            table.add_column("Post-processing (p50)", style="yellow", justify="right")
+            for name, entry in turn_metrics.summary(group_by).items():
+                tokens_per_s = entry["tokens_per_s"][50]
+                table.add_row(
+                    name,
+                    f"{entry['turns']} ({entry['cached']} cached)" if entry["cached"] else str(entry["turns"]),
+                    " / ".join(format_seconds(entry["ttft_s"][pct]) for pct in (50, 90, 99)),
+                    f"{tokens_per_s:.0f}" if tokens_per_s is not None else "-",
+                    " / ".join(format_seconds(entry["turn_s"][pct]) for pct in (50, 90, 99)),
+                    format_seconds(entry["postprocess_s"][50])
+                )
+            console.print(table)
+        if local_theory["total"]:
+            console.print(f"[blue]Answered locally:[/blue] {local_theory['local']} of {local_theory['total']} queries "
+                          f"({local_theory['local'] / local_theory['total']:.0%})")
+        console.print(f"[blue]Metrics are appended to:[/blue] {turn_metrics.metrics_path}")
+        continue
+    elif user_message.lower() == 'route':
+        status = "on" if query_router.enabled else "off"
+        console.print(f"[blue]Automatic model routing:[/blue] {status} "
+                      f"(small models: {', '.join(query_router.small_models()) or 'none'})")
+        for topic, override in query_router.topic_overrides.items():
+            console.print(f"[blue]Override for {topic}:[/blue] {override}")
+        decisions = query_router.decisions
+        if decisions:
+            routed_count = sum(1 for d in decisions if d["routed"])
+            console.print(f"[blue]Routed to a small model:[/blue] {routed_count} of {len(decisions)} questions")
+            savings = estimate_savings(turn_metrics.records, current_model,
+                                       load_metrics(turn_metrics.metrics_path) if turn_metrics.metrics_path else None)
+            if savings and savings["routed_turns"]:
+                large_models = sorted({r.get("large_model") or current_model for r in turn_metrics.records if r.get("routed")})
+                console.print(f"[blue]Latency saved vs. always {', '.join(large_models)}:[/blue] "
+                              f"{savings['saved_s']:.1f}s ({savings['actual_s']:.1f}s instead of an estimated "
+                              f"{savings['always_large_s']:.1f}s over {savings['routed_turns']} turns)")
+            else:
+                console.print("[yellow]Not enough turns on the large model yet to estimate the latency saved.[/yellow]")
+        console.print(f"[blue]Decisions are logged to:[/blue] {query_router.log_path}")
+        continue
+    elif user_message.lower() in ('route on', 'route off'):
+        query_router.enabled = user_message.lower() == 'route on'
+        console.print(f"[green]Automatic model routing {'enabled' if query_router.enabled else 'disabled'}[/green]")
+        continue
+    elif user_message.lower().startswith('route topic'):
+        parts = user_message.split()
+        topics = list(SYSTEM_PROMPTS.keys())
+        model_ids = {model["id"].lower(): model["id"] for model in MODELS.values()}
+        if len(parts) == 4 and parts[2] in topics:
+            setting = parts[3].lower()
+            if setting == 'auto':
+                query_router.topic_overrides.pop(parts[2], None)
+            elif setting in ('small', 'large'):
+                query_router.topic_overrides[parts[2]] = setting
+            elif setting in MODELS or setting in model_ids:
+                # Accept a model number from the 'models' list or a model id
+                setting = MODELS[setting]["id"] if setting in MODELS else model_ids[setting]
+                query_router.topic_overrides[parts[2]] = setting
+            else:
+                console.print(f"[red]Unknown model:[/red] {parts[3]} [yellow](use a number or id from 'models')[/yellow]")
+                continue
+            console.print(f"[green]Routing for {parts[2]} set to:[/green] {setting}")
+        else:
+            console.print(f"[red]Invalid format. Use 'route topic <{'|'.join(topics)}> <small|large|auto|model number or id>'[/red]")
+        continue
+    elif user_message.lower() == 'local':
+        status = "on" if local_theory["enabled"] else "off"
+        console.print(f"[blue]Offline theory engine:[/blue] {status}")
+        if local_theory["total"]:
+            console.print(f"[blue]Answered locally:[/blue] {local_theory['local']} of {local_theory['total']} queries "
+                          f"({local_theory['local'] / local_theory['total']:.0%})")
+        else:
+            console.print("[yellow]No queries asked yet in this session.[/yellow]")
+        continue
+    elif user_message.lower() in ('local on', 'local off'):
+        local_theory["enabled"] = user_message.lower() == 'local on'
+        console.print(f"[green]Offline theory engine {'enabled' if local_theory['enabled'] else 'disabled'}[/green]")
+        continue
+    elif user_message.lower() == 'limits':
+        scheduler = chat_engine.scheduler
+        
+        table = Table(title="Rate Limits")
+        table.add_column("Model", style="cyan")
+        table.add_column("Requests left", style="green", justify="right")
+        table.add_column("Tokens left", style="green", justify="right")
+        for model_id, buckets in list(scheduler.buckets.items()):
+            requests_bucket, tokens_bucket = buckets["requests"], buckets["tokens"]
+            requests_bucket.wait_time(0)
+            tokens_bucket.wait_time(0)
+            table.add_row(model_id,
+                          f"{max(0, int(requests_bucket.level))}/{int(requests_bucket.capacity)}",
+                          f"{max(0, int(tokens_bucket.level))}/{int(tokens_bucket.capacity)}")
+        console.print(table)
+        console.print(f"[cyan]Requests:[/cyan] {scheduler.stats['requests']}  "
+                      f"[cyan]Delayed:[/cyan] {scheduler.stats['delayed']} ({scheduler.stats['delay_seconds']:.1f}s)  "
+                      f"[cyan]Retries:[/cyan] {scheduler.stats['retries']}")
+        continue
+    elif re.fullmatch(r"hedge(\s+(off|status|\d+(\.\d*)?|\.\d+))?", user_message.lower().strip()):
+        setting = user_message.lower().strip()[len('hedge'):].strip()
+        if setting == 'off':
+            chat_engine.hedge_after = None
+            console.print("[green]Hedged requests disabled.[/green]")
+        elif setting in ('', 'status'):
+            state = f"after {chat_engine.hedge_after}s" if chat_engine.hedge_after is not None else "off"
+            console.print(f"[cyan]Hedging:[/cyan] {state}  [cyan]Hedged:[/cyan] {chat_engine.stats['hedged']}  "
+                          f"[cyan]Won by backup:[/cyan] {chat_engine.stats['hedge_wins']}  "
+                          f"[cyan]Fallbacks:[/cyan] {chat_engine.stats['fallbacks']}")
+        else:
+            try:
+                seconds = float(setting)
+                if seconds <= 0:
+                    raise ValueError
+                chat_engine.hedge_after = seconds
+                console.print(f"[green]Requests without a first token after {seconds}s will also go to a backup model.[/green]")
+            except ValueError:
+                console.print("[red]Invalid format. Use 'hedge 2.5' (seconds), 'hedge off' or 'hedge' for status[/red]")
+        continue
+    elif user_message.lower() == 'cache':
+        stats = response_cache.summary()
+        
+        table = Table(title="Response Cache")
+        table.add_column("Item", style="cyan")
+        table.add_column("Value", style="green", justify="right")
+        table.add_row("Enabled", "yes" if response_cache.enabled else "no")
+        table.add_row("Caching all temperatures", "yes" if response_cache.allow_any_temperature else "no (only ≤ 0.3)")
+        table.add_row("Simulated streaming", "yes" if response_cache.simulate_streaming else "no")
+        table.add_row("Hits (memory / disk)", f"{stats['hits']} ({stats['memory_hits']} / {stats['disk_hits']})")
+        table.add_row("Misses", str(stats["misses"]))
+        table.add_row("Hit rate", f"{stats['hit_rate']:.0%}")
+        table.add_row("Skipped (temperature too high)", str(stats["skipped"]))
+        table.add_row("Entries on disk", str(stats["disk_entries"]))
+        table.add_row("Disk usage", f"{stats['disk_bytes'] / 1024:.1f} KB")
+        console.print(table)
+        
+        audio_stats = audio_cache.summary()
+        table = Table(title="Speech Audio Cache")
+        table.add_column("Item", style="cyan")
+        table.add_column("Value", style="green", justify="right")
+        table.add_row("Hits / misses", f"{audio_stats['hits']} / {audio_stats['misses']}")
+        table.add_row("Stored / evicted", f"{audio_stats['stores']} / {audio_stats['evictions']}")
+        table.add_row("Files", str(audio_stats["files"]))
+        table.add_row("Disk usage", f"{audio_stats['disk_bytes'] / 1024 / 1024:.1f} MB "
+                                    f"(limit {audio_cache.max_bytes / 1024 / 1024:.0f} MB)")
+        console.print(table)
+        
+        if MUSIC_NOTATION_AVAILABLE:
+            render_cache = get_render_cache()
+            render_stats = render_cache.summary()
+            table = Table(title="Notation Render Cache")
+            table.add_column("Item", style="cyan")
+            table.add_column("Value", style="green", justify="right")
+            table.add_row("Hits / misses (this session)", f"{render_stats['hits']} / {render_stats['misses']}")
+            table.add_row("Render time saved (this session)", f"{render_stats['seconds_saved']:.1f}s")
+            table.add_row("Hits / render time saved (all sessions)",
+                          f"{render_stats['lifetime_hits']} / {render_stats['lifetime_seconds_saved']:.1f}s")
+            table.add_row("Stored / evicted", f"{render_stats['stores']} / {render_stats['evictions']}")
+            table.add_row("Images", str(render_stats["files"]))
+            table.add_row("Disk usage", f"{render_stats['disk_bytes'] / 1024 / 1024:.1f} MB "
+                                        f"(limit {render_cache.max_bytes / 1024 / 1024:.0f} MB)")
+            console.print(table)
+        continue
+    elif user_message.lower() in ('cache on', 'cache off'):
+        response_cache.enabled = user_message.lower() == 'cache on'
+        console.print(f"[green]Response cache {'enabled' if response_cache.enabled else 'disabled'}.[/green]")
+        continue
+    elif user_message.lower() == 'cache any temp':
+        response_cache.allow_any_temperature = not response_cache.allow_any_temperature
+        if response_cache.allow_any_temperature:
+            console.print("[green]Answers at any temperature will now be cached.[/green]")
+        else:
+            console.print("[green]Only answers at temperature 0.3 or lower will be cached.[/green]")
+        continue
+    elif user_message.lower() == 'cache stream':
+        response_cache.simulate_streaming = not response_cache.simulate_streaming
+        console.print(f"[green]Simulated streaming for cached answers {'on' if response_cache.simulate_streaming else 'off'}.[/green]")
+        continue
+    elif user_message.lower() == 'cache clear':
+        response_cache.clear()
+        console.print("[yellow]Response cache cleared.[/yellow]")
+        continue
+    elif user_message.lower() == 'cache clear audio':
+        audio_cache.clear()
+        console.print("[yellow]Speech audio cache cleared.[/yellow]")
+        continue
+    elif MUSIC_NOTATION_AVAILABLE and user_message.lower() == 'cache clear notation':
+        get_render_cache().clear()
+        console.print("[yellow]Notation render cache cleared.[/yellow]")
+        continue
+    elif user_message.lower() in ('quiet on', 'quiet off'):
+        progress_reporter.quiet = user_message.lower() == 'quiet on'
+        console.print(f"[green]Progress bars {'hidden' if progress_reporter.quiet else 'shown'}.[/green]")
+        continue
     elif user_message.lower() == 'save txt':
+        wait_for_answers()
         filename = save_to_txt(conversation)
         if filename:
             console.print(f"[green]Conversation saved to[/green] {filename}")
@@ -944,6 +1455,7 @@ while True:
             console.print("[bold red]Failed to save conversation to text file.[/bold red]")
         continue
     elif user_message.lower() == 'save pdf':
+        wait_for_answers()
         filename = save_to_pdf(conversation)
         if filename:
             console.print(f"[green]Conversation saved to[/green] {filename}")
@@ -951,6 +1463,7 @@ while True:
             console.print("[bold red]Failed to save conversation to PDF file.[/bold red]")
         continue
     elif user_message.lower() == 'save docx':
+        wait_for_answers()
         filename = save_to_docx(conversation)
         if filename:
             console.print(f"[green]Conversation saved to[/green] {filename}")
@@ -958,6 +1471,7 @@ while True:
             console.print("[bold red]Failed to save conversation to DOCX file.[/bold red]")
         continue
     elif user_message.lower() == 'save session':
+        wait_for_answers()
         filename = save_session(conversation)
         if filename:
             console.print(f"[green]Session saved to[/green] {filename}")
@@ -965,9 +1479,11 @@ while True:
             console.print("[bold red]Failed to save session.[/bold red]")
         continue
     elif user_message.lower() == 'load session':
+        wait_for_answers()
         loaded_conversation = load_session()
         if loaded_conversation:
-            conversation = loaded_conversation
+            conversation[:] = loaded_conversation
+            context_window.reset()
             console.print("[green]Session loaded successfully![/green]")
         continue
     elif MUSIC_NOTATION_AVAILABLE and user_message.lower() == 'music example':
@@ -988,31 +1504,26 @@ while True:
         abc_notation = get_abc_example(example_type)
         console.print(Panel(abc_notation, title=f"{example_type.capitalize()} Example (ABC Notation)", border_style="cyan"))
         
-        # Render the example
-        with Progress(
-            SpinnerColumn(),
-            TextColumn("[bold blue]Rendering music notation..."),
-            BarColumn(),
-            TimeElapsedColumn()
-        ) as progress:
-            task = progress.add_task("[green]Rendering...", total=100)
-            
-            progress.update(task, advance=30)
-            time.sleep(0.3)
-            
-            image_path = render_abc_notation(abc_notation)
-            
-            progress.update(task, advance=70)
-            time.sleep(0.2)
-            progress.update(task, completed=100)
+        # Render the example in the background
+        def report_example(image_path, seconds):
+            if image_path:
+                console.print(f"\n[green]Music notation rendered to:[/green] {image_path} [dim]({format_render_time(seconds)})[/dim]")
+                console.print("[yellow]You can view this image file to see the rendered notation.[/yellow]")
+            else:
+                console.print("\n[bold red]Failed to render music notation.[/bold red]")
         
-        if image_path:
-            console.print(f"[green]Music notation rendered to:[/green] {image_path}")
-            console.print("[yellow]You can view this image file to see the rendered notation.[/yellow]")
-        else:
-            console.print("[bold red]Failed to render music notation.[/bold red]")
+        # Tunes rendered before are shown at once
+        cached_path = find_cached_render(abc_notation)
+        if cached_path:
+            console.print(f"[green]Music notation rendered to:[/green] {cached_path} [dim](from render cache)[/dim]")
+            continue
+        if submit_render(abc_notation, report_example):
+            if prewarm_status["state"] == "warming":
+                console.print(describe_notation_status())
+            console.print("[blue]Rendering music notation in the background...[/blue]")
         continue
     elif MUSIC_NOTATION_AVAILABLE and user_message.lower() == 'render notation':
+        wait_for_answers()
         # Extract ABC notation from the last AI response
         if len(conversation) < 2 or conversation[-1]["role"] != "assistant":
             console.print("[yellow]No AI response available to extract notation from.[/yellow]")
@@ -1028,35 +1539,90 @@ while True:
         
         console.print(f"[green]Found {len(abc_blocks)} ABC notation blocks in the response.[/green]")
         
-        # Process each block
+        # Show each block; blocks rendered before are shown at once
+        to_render = []
         for i, abc_block in enumerate(abc_blocks, 1):
             console.print(f"\n[bold]Block {i}:[/bold]")
             console.print(Panel(abc_block, title=f"ABC Notation Block {i}", border_style="cyan"))
             
-            # Render the notation
-            with Progress(
-                SpinnerColumn(),
-                TextColumn(f"[bold blue]Rendering block {i}..."),
-                BarColumn(),
-                TimeElapsedColumn()
-            ) as progress:
-                task = progress.add_task("[green]Rendering...", total=100)
-                
-                progress.update(task, advance=30)
-                time.sleep(0.3)
-                
-                image_path = render_abc_notation(abc_block)
-                
-                progress.update(task, advance=70)
-                time.sleep(0.2)
-                progress.update(task, completed=100)
+            cached_path = find_cached_render(abc_block)
+            if cached_path:
+                console.print(f"[green]Block {i} rendered to:[/green] {cached_path} [dim](from render cache)[/dim]")
+                continue
+            # Broken blocks are repaired or rejected here instead of failing inside music21
+            check = check_abc(abc_block)
+            if not check["abc"]:
+                console.print(f"[red]Block {i} is not valid ABC notation:[/red] {'; '.join(check['errors'])}")
+                continue
+            if check["repairs"]:
+                console.print(f"[yellow]Block {i} repaired:[/yellow] {'; '.join(check['repairs'])}")
+            to_render.append((i, abc_block))
+        if not to_render:
+            continue
+        
+        # Simple blocks are drawn at once; the others render at the same time in the worker
+        # processes and each is reported as it finishes
+        render_progress = {"done": 0, "total": len(to_render)}
+        in_background = 0
+        for block_number, abc_block in to_render:
+            def report_block(image_path, seconds, block_number=block_number, progress=render_progress):
+                progress["done"] += 1
+                counter = f"[{progress['done']}/{progress['total']}]"
+                if image_path:
+                    console.print(f"\n[green]{counter} Block {block_number} rendered to:[/green] {image_path} [dim]({format_render_time(seconds)})[/dim]")
+                else:
+                    console.print(f"\n[bold red]{counter} Failed to render ABC notation block {block_number}.[/bold red]")
             
-            if image_path:
-                console.print(f"[green]Music notation rendered to:[/green] {image_path}")
-            else:
-                console.print("[bold red]Failed to render this ABC notation block.[/bold red]")
+            in_background += submit_render(abc_block, report_block)
+        if in_background:
+            if prewarm_status["state"] == "warming":
+                console.print(describe_notation_status())
+            console.print(f"[blue]Rendering {in_background} block(s) with {render_pool.max_workers} worker(s) in the background, "
+                          "you can keep chatting.[/blue]")
+        continue
+    elif MUSIC_NOTATION_AVAILABLE and user_message.lower().startswith('render workers'):
+        worker_count = user_message[len('render workers'):].strip()
+        if worker_count:
+            if not worker_count.isdigit() or int(worker_count) < 1:
+                console.print("[red]Usage: render workers <number of processes>[/red]")
+                continue
+            render_pool.set_workers(int(worker_count))
+        console.print(f"[green]Notation blocks are rendered by {render_pool.max_workers} "
+                      f"{'worker process(es)' if render_pool.uses_processes else 'worker thread(s)'}.[/green]")
+        continue
+    elif MUSIC_NOTATION_AVAILABLE and user_message.lower().startswith('notation format'):
+        image_format = user_message[len('notation format'):].strip().lower()
+        if image_format:
+            if image_format not in NOTATION_FORMATS:
+                console.print(f"[red]Usage: notation format {'|'.join(NOTATION_FORMATS)}[/red]")
+                continue
+            set_notation_format(image_format)
+        if RENDER_OPTIONS["format"] == "svg":
+            console.print("[green]Notation format svg: simple tunes are drawn as SVG in milliseconds, "
+                          "other tunes are rendered to PNG with MuseScore.[/green]")
+        else:
+            console.print("[green]Notation format png: every tune is rendered with MuseScore.[/green]")
+        continue
+    elif MUSIC_NOTATION_AVAILABLE and user_message.lower().startswith('auto render'):
+        mode = user_message[len('auto render'):].strip().lower()
+        if mode:
+            if mode not in ('on', 'off', 'topics'):
+                console.print("[red]Usage: auto render on|off|topics[/red]")
+                continue
+            AUTO_RENDER = mode
+        descriptions = {
+            "on": "ABC blocks in every answer are rendered while it streams",
+            "topics": f"ABC blocks are rendered while the answer streams in the {' and '.join(AUTO_RENDER_TOPICS)} topics",
+            "off": "notation is rendered only with 'render notation'"
+        }
+        console.print(f"[green]Auto render {AUTO_RENDER}: {descriptions[AUTO_RENDER]}.[/green]")
+        continue
+    elif MUSIC_NOTATION_AVAILABLE and user_message.lower() == 'notation status':
+        console.print(describe_notation_status())
+        notation_announced = True
         continue
     elif user_message.lower() == 'topic':
+        wait_for_answers()
         # Use the topic manager to change the current topic
         try:
             current_topic = get_current_prompt_type()
@@ -1090,115 +1656,153 @@ while True:
         
         console.print("[yellow]Voice Settings:[/yellow]")
         
-        engine = pyttsx3.init()
-        current_rate = engine.getProperty('rate')
-        current_volume = engine.getProperty('volume')
+        tts_worker = get_tts_worker()
+        settings = tts_worker.settings
         
-        # Display available voices
-        voices = engine.getProperty('voices')
+        # Display available voices (discovered once by the worker)
+        voices = tts_worker.list_voices()
         console.print("[cyan]Available Voices:[/cyan]")
-        for i, voice in enumerate(voices):
-            console.print(f"{i+1}. {voice.name}")
+        for i, (voice_id, name) in enumerate(voices):
+            marker = " (current)" if voice_id == settings["voice"] else ""
+            console.print(f"{i+1}. {name}{marker}")
         
         # Voice selection
         voice_choice = input("Select voice number (or Enter to skip): ")
         if voice_choice.isdigit() and 1 <= int(voice_choice) <= len(voices):
-            engine.setProperty('voice', voices[int(voice_choice)-1].id)
+            tts_worker.configure(voice=voices[int(voice_choice)-1][0])
         
         # Rate adjustment
-        console.print(f"[cyan]Current Rate:[/cyan] {current_rate} (normal is ~200, lower is slower)")
+        console.print(f"[cyan]Current Rate:[/cyan] {settings['rate']} (normal is ~200, lower is slower)")
         rate_choice = input("Enter new rate (or Enter to skip): ")
         if rate_choice.isdigit():
-            engine.setProperty('rate', int(rate_choice))
+            tts_worker.configure(rate=int(rate_choice))
         
         # Volume adjustment
-        console.print(f"[cyan]Current Volume:[/cyan] {current_volume} (0.0-1.0)")
+        console.print(f"[cyan]Current Volume:[/cyan] {settings['volume']} (0.0-1.0)")
         vol_choice = input("Enter new volume (or Enter to skip): ")
         try:
             vol = float(vol_choice)
             if 0.0 <= vol <= 1.0:
-                engine.setProperty('volume', vol)
+                tts_worker.configure(volume=vol)
         except:
             pass
         
         # Test the voice
         console.print("[green]Testing voice with new settings...[/green]")
-        engine.say("This is a test of the music theory AI voice with the current settings.")
-        engine.runAndWait()
+        tts_worker.speak("This is a test of the music theory AI voice with the current settings.")
+        continue
+    elif VOICE_AVAILABLE and user_message.lower() in ('voice stop', 'voice skip'):
+        # Nothing to stop if the speech worker was never started
+        tts_worker = voice_services.get("tts")
+        if user_message.lower() == 'voice stop':
+            if tts_worker:
+                tts_worker.cancel()
+            if speech_queue:
+                speech_queue.clear()
+            if voice_services.get("cloud"):
+                voice_services["cloud"].cancel()
+            audio_player.stop()
+            console.print("[yellow]Speech stopped.[/yellow]")
+        else:
+            if tts_worker:
+                tts_worker.skip()
+            # Ends the sentence that is playing; the next one follows
+            audio_player.stop()
+            if audio_player.players():
+                console.print("[yellow]Skipped to the next sentence.[/yellow]")
+            else:
+                console.print("[yellow]Skipping after the current sentence[/yellow] "
+                              "[dim](install ffplay or mpg123 to skip at once)[/dim]")
         continue
     elif VOICE_AVAILABLE and user_message.lower() == 'voice input':
-        console.print("[yellow]Listening... (speak now)[/yellow]")
-        recognizer = sr.Recognizer()
+        # Push-to-talk on the calibrated background listener; recognition runs on its worker thread
+        try:
+            voice_listener = get_voice_listener()
+            if not voice_listener.calibrated:
+                console.print("[yellow]Calibrating microphone for background noise (only needed once)...[/yellow]")
+                voice_listener.calibrate()
+            console.print("[yellow]Listening... (speak now)[/yellow]")
+            result = voice_listener.listen_once(timeout=10)
+        except Exception as e:
+            console.print(f"[red]Could not use the microphone: {str(e)}[/red]")
+            continue
+        if not result:
+            console.print("[red]No speech recognized. Please try again.[/red]")
+            console.print("[yellow]Tip: Speak clearly, or run 'voice calibrate' if the room got louder.[/yellow]")
+            continue
+        speech_text, engine, latency = result
+        console.print(f"[green]You said{' (offline recognition)' if engine == 'sphinx' else ''}:[/green] {speech_text} "
+                      f"[dim]({latency:.2f}s)[/dim]")
+        # Use the recognized text as the user message
+        user_message = speech_text
+    elif VOICE_AVAILABLE and user_message.lower() in ('voice listen on', 'voice listen off'):
+        voice_listener = get_voice_listener()
+        if user_message.lower() == 'voice listen off':
+            voice_listener.stop()
+            mean_latency = voice_listener.mean_latency()
+            console.print("[green]Continuous listening stopped.[/green]"
+                          + (f" [dim]Average recognition time: {mean_latency:.2f}s[/dim]" if mean_latency else ""))
+            continue
         
-        # Set up retry mechanism
-        max_retries = 2
-        retry_count = 0
+        def submit_spoken(text, engine, latency):
+            # Every recognized phrase becomes a message, submitted from the recognition thread
+            console.print(f"\n[green]You said{' (offline)' if engine == 'sphinx' else ''}:[/green] {text} [dim]({latency:.2f}s)[/dim]")
+            chat_engine.submit_turn(chat_turn, conversation, text, current_model, temperature)
         
-        while retry_count <= max_retries:
-            try:
-                with sr.Microphone() as source:
-                    # Adjust recognition parameters for better results
-                    recognizer.adjust_for_ambient_noise(source, duration=0.5)
-                    recognizer.energy_threshold = 300  # Increase energy threshold for better detection
-                    recognizer.dynamic_energy_threshold = True
-                    
-                    console.print("[yellow]Listening... (speak now)[/yellow]")
-                    audio = recognizer.listen(source, timeout=5, phrase_time_limit=10)
-                    
-                    console.print("[yellow]Processing speech...[/yellow]")
-                    # Try Google's service first as it's generally more accurate
-                    try:
-                        speech_text = recognizer.recognize_google(audio)
-                    except:
-                        # Fall back to local recognition if Google service fails
-                        speech_text = recognizer.recognize_sphinx(audio) if hasattr(recognizer, 'recognize_sphinx') else ""
-                        
-                    if speech_text:
-                        console.print(f"[green]You said:[/green] {speech_text}")
-                        # Use the recognized text as the user message
-                        user_message = speech_text
-                        # Continue with normal message processing (don't use continue here)
-                        break
-                    else:
-                        raise sr.UnknownValueError("Empty recognition result")
-                        
-            except sr.WaitTimeoutError:
-                retry_count += 1
-                if retry_count <= max_retries:
-                    console.print(f"[yellow]No speech detected. Retry {retry_count}/{max_retries}...[/yellow]")
-                else:
-                    console.print("[red]No speech detected after multiple tries. Please try again later.[/red]")
-                    continue
-            except sr.UnknownValueError:
-                retry_count += 1
-                if retry_count <= max_retries:
-                    console.print(f"[yellow]Could not understand audio. Retry {retry_count}/{max_retries}...[/yellow]")
-                else:
-                    console.print("[red]Could not understand audio after multiple tries.[/red]")
-                    console.print("[yellow]Tip: Speak clearly and ensure your microphone is working properly.[/yellow]")
-                    continue
-            except sr.RequestError as e:
-                console.print(f"[red]Could not request results from speech recognition service: {e}[/red]")
-                console.print("[yellow]Trying offline recognition if available...[/yellow]")
-                try:
-                    # Try offline recognition if possible
-                    if hasattr(recognizer, 'recognize_sphinx'):
-                        with sr.Microphone() as source:
-                            audio = recognizer.listen(source, timeout=5)
-                            speech_text = recognizer.recognize_sphinx(audio)
-                            console.print(f"[green]You said (offline recognition):[/green] {speech_text}")
-                            user_message = speech_text
-                            break
-                    else:
-                        console.print("[red]Offline recognition not available. Try again later.[/red]")
-                        continue
-                except Exception:
-                    console.print("[red]Offline recognition failed. Please try again.[/red]")
-                    continue
-            except Exception as e:
-                console.print(f"[red]An error occurred: {str(e)}[/red]")
-                continue
+        def report_listen_error(error):
+            console.print(f"\n[red]Speech recognition error: {str(error)}[/red]")
+        
+        try:
+            if not voice_listener.calibrated:
+                console.print("[yellow]Calibrating microphone for background noise (only needed once)...[/yellow]")
+            voice_listener.start(submit_spoken, report_listen_error)
+        except Exception as e:
+            console.print(f"[red]Could not use the microphone: {str(e)}[/red]")
+            continue
+        console.print("[green]Continuous listening on: every phrase you say is sent as a message. "
+                      "Type 'voice listen off' to stop.[/green]")
+        continue
+    elif VOICE_AVAILABLE and user_message.lower() in ('voice offline on', 'voice offline off'):
+        voice_listener = get_voice_listener()
+        voice_listener.set_offline_first(user_message.lower() == 'voice offline on')
+        console.print(f"[green]Speech recognition: {'offline (Sphinx) first, Google as fallback' if voice_listener.settings['offline_first'] else 'Google first, offline (Sphinx) as fallback'}[/green]")
+        continue
+    elif VOICE_AVAILABLE and user_message.lower() == 'voice calibrate':
+        if voice_services.get("listener") is not None and voice_services["listener"].listening:
+            console.print("[yellow]Continuous listening is using the microphone; type 'voice listen off' first.[/yellow]")
+            continue
+        console.print("[yellow]Calibrating microphone for background noise... (stay quiet)[/yellow]")
+        try:
+            threshold = get_voice_listener().calibrate(force=True)
+            console.print(f"[green]Energy threshold set to {threshold:.0f} and saved.[/green]")
+        except Exception as e:
+            console.print(f"[red]Could not use the microphone: {str(e)}[/red]")
+        continue
+    elif VOICE_AVAILABLE and user_message.lower() in ('auto speak on', 'auto speak off'):
+        AUTO_TTS_ENABLED = user_message.lower() == 'auto speak on'
+        if AUTO_TTS_ENABLED and speech_queue is None:
+            cloud_speech = get_cloud_speech()
+            
+            def speak_sentence(item):
+                # Cloud audio was already requested when the sentence was queued
+                if isinstance(item, tuple):
+                    if cloud_speech.play_prefetched(item):
+                        return
+                    item = item[0]
+                speak_text(item, use_cloud=False, show_progress=False)
+            
+            speech_queue = SpeechQueue(
+                speak_sentence,
+                prepare=cloud_speech.prefetch if USE_CLOUD_TTS and cloud_speech else None,
+                # Downloads run at most this many sentences ahead of the one playing
+                prepare_ahead=cloud_speech.prefetch_depth if cloud_speech else 0
+            )
+        elif not AUTO_TTS_ENABLED and speech_queue:
+            speech_queue.clear()
+        console.print(f"[green]Auto speak {'enabled: answers are read aloud while they stream' if AUTO_TTS_ENABLED else 'disabled'}[/green]")
+        continue
     elif VOICE_AVAILABLE and user_message.lower() == 'voice output':
+        wait_for_answers()
         if len(conversation) < 2 or conversation[-1]["role"] != "assistant":
             console.print("[yellow]No AI response available to read.[/yellow]")
             continue
@@ -1213,62 +1817,15 @@ while True:
         # Use the enhanced TTS function
         use_cloud = choice == "2" and CLOUD_TTS_AVAILABLE
         
-        # Get current settings or use defaults
-        rate = getattr(engine, "rate", 150) if "engine" in locals() else 150
-        volume = getattr(engine, "volume", 1.0) if "engine" in locals() else 1.0
+        def report_speech(success):
+            if not success:
+                console.print("[red]Failed to use text-to-speech. Please check your audio settings.[/red]")
         
-        success = enhanced_tts(last_response, use_cloud=use_cloud, rate=rate, volume=volume)
-        
-        if not success:
-            console.print("[red]Failed to use text-to-speech. Please check your audio settings.[/red]")
+        # Speak in the background so the prompt stays available
+        chat_engine.run_in_background(enhanced_tts, last_response, use_cloud=use_cloud, on_done=report_speech)
         continue
     
-    # Add user message to conversation
-    conversation.append({"role": "user", "content": user_message})
-    
-    # Get AI response
-    try:
-        console.print("\n[bold cyan]AI:[/bold cyan] ", end="")
-        
-        # Use streaming for more interactive responses
-        full_response = ""
-        for chunk in client.chat.completions.create(
-            messages=conversation,
-            model=current_model,
-            temperature=temperature,
-            stream=True
-        ):
-            content = chunk.choices[0].delta.content
-            if content:
-                # Print each chunk as it comes in
-                console.print(content, end="", highlight=False)
-                full_response += content
-        
-        console.print()  # Add a new line after response
-        
-        # Process the full response to find and highlight clickable links
-        urls = extract_urls(full_response)
-        
-        if urls:
-            # If we found URLs, show them in a special colorized clickable section
-            console.print("\n[bold yellow]Links found in response:[/bold yellow]")
-            for i, url in enumerate(urls, 1):
-                console.print(f"  [bold blue][link={url}]{i}. {url}[/link][/bold blue]")
-
-        # For better readability, render the response as markdown in a panel
-        console.print("\n[bold yellow]Rendered Markdown:[/bold yellow]")
-        try:
-            md = Markdown(full_response)
-            console.print(Panel(md, border_style="green", title="AI Response", subtitle="Markdown Rendering"))
-        except Exception as md_error:
-            # If markdown rendering fails, just continue without showing an error
-            pass
-        
-        # Add AI response to conversation history
-        conversation.append({"role": "assistant", "content": full_response})
-        
-    except Exception as e:
-        console.print(f"\n[bold red]Error:[/bold red] {e}")
-        console.print("[yellow]Something went wrong. Please try again.[/yellow]")
+    # Stream the AI response on the engine loop so the prompt stays responsive
+    chat_engine.submit_turn(chat_turn, conversation, user_message, current_model, temperature)
 # The above code creates a continuous chat with the Groq AI that maintains conversation history
 
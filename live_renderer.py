@@ -0,0 +1,81 @@
+"""
+Live Markdown renderer for Music Theory AI Chat.
+This module shows a streaming AI response as Markdown that is updated in place,
+re-rendering at a limited frame rate instead of printing every token.
+"""
+
+import time
+
+from rich.live import Live
+from rich.panel import Panel
+from rich.text import Text
+
+# Default maximum number of re-renders per second
+DEFAULT_REFRESH_RATE = 8
+
+class LiveMarkdownRenderer:
+    """
+    Collects response chunks and renders them as a Markdown panel.
+
+    Chunks are appended to a list (joined only when a frame is drawn), and the
+    panel is redrawn at most refresh_rate times per second. While streaming, the
+    live panel is cropped to the terminal height so that long answers are not
+    re-printed on every refresh; when the renderer is closed the live panel is
+    removed and the complete answer is printed once.
+    """
+
+    def __init__(self, console, refresh_rate=DEFAULT_REFRESH_RATE, title="AI Response"):
+        self.console = console
+        self.title = title
+        self.min_interval = 1.0 / max(1, refresh_rate)
+        self.frames = 0
+        self._parts = []
+        self._text = ""
+        self._joined_parts = 0
+        self._last_render = 0.0
+        self._live = Live(console=console, auto_refresh=False, transient=True,
+                          vertical_overflow="crop")
+
+    def __enter__(self):
+        self._live.start()
+        return self
+
+    def __exit__(self, *args):
+        self._live.stop()
+        self.console.print(self._panel())
+        self.frames += 1
+
+    @property
+    def text(self):
+        """The response received so far."""
+        if self._joined_parts != len(self._parts):
+            self._text = "".join(self._parts)
+            self._joined_parts = len(self._parts)
+        return self._text
+
+    def append(self, chunk):
+        """
+        Add a chunk of the response and redraw if the frame interval has passed.
+
+        Args:
+            chunk (str): New response text
+        """
+        self._parts.append(chunk)
+        if time.monotonic() - self._last_render >= self.min_interval:
+            self._render()
+
+    def _panel(self):
+        # Imported on the first frame: the Markdown parser and syntax highlighter load slowly
+        from rich.markdown import Markdown
+
+        try:
+            body = Markdown(self.text)
+        except Exception:
+            # If markdown parsing fails, show the plain text instead
+            body = Text(self.text)
+        return Panel(body, border_style="green", title=self.title)
+
+    def _render(self):
+        self._last_render = time.monotonic()
+        self._live.update(self._panel(), refresh=True)
+        self.frames += 1
@@ -0,0 +1,125 @@
+"""
+Model health tracking for Music Theory AI Chat.
+This module remembers which models recently failed (or were decommissioned),
+so requests can fall back to the next healthy model in the MODELS table.
+"""
+
+import json
+import os
+import threading
+import time
+
+# How long a model is skipped after a temporary failure
+FAILURE_COOLDOWN_SECONDS = 5 * 60
+# How long a model is skipped when the API says it does not exist
+MISSING_MODEL_COOLDOWN_SECONDS = 24 * 60 * 60
+
+def is_missing_model_error(error):
+    """Check whether an API error says the model is unknown or decommissioned."""
+    status = getattr(error, "status_code", None)
+    message = str(error).lower()
+    return status in (400, 404) and "model" in message and (
+        "decommissioned" in message or "not found" in message
+        or "does not exist" in message or "not supported" in message
+    )
+
+def is_model_error(error):
+    """
+    Check whether an error is specific to the model, so another model may succeed.
+
+    Authentication errors and invalid requests are not, they would fail everywhere.
+    """
+    if is_missing_model_error(error):
+        return True
+    status = getattr(error, "status_code", None)
+    if status is not None:
+        return status == 429 or status >= 500
+    return type(error).__name__ in ("APIConnectionError", "APITimeoutError")
+
+class ModelHealth:
+    """
+    Health state of every model, cached on disk between sessions.
+    """
+
+    def __init__(self, state_path=None):
+        self.state_path = state_path
+        self.state = {}
+        self._lock = threading.Lock()
+        if state_path and os.path.exists(state_path):
+            try:
+                with open(state_path, 'r', encoding='utf-8') as f:
+                    self.state = json.load(f)
+            except (json.JSONDecodeError, IOError):
+                self.state = {}
+
+    def _save(self):
+        if not self.state_path:
+            return
+        try:
+            with open(self.state_path, 'w', encoding='utf-8') as f:
+                json.dump(self.state, f, indent=2)
+        except IOError:
+            pass
+
+    def is_healthy(self, model):
+        """Check whether a model may be used right now."""
+        with self._lock:
+            entry = self.state.get(model)
+            return not entry or entry.get("unhealthy_until", 0) <= time.time()
+
+    def status(self, model):
+        """
+        Describe the state of a model for display.
+
+        Returns:
+            str: "healthy", or the reason and remaining cooldown
+        """
+        with self._lock:
+            entry = self.state.get(model)
+            if not entry or entry.get("unhealthy_until", 0) <= time.time():
+                return "healthy"
+            minutes = (entry["unhealthy_until"] - time.time()) / 60
+            return f"{entry.get('reason', 'failing')} (retry in {minutes:.0f} min)"
+
+    def mark_success(self, model):
+        """Record a successful request."""
+        with self._lock:
+            if model in self.state:
+                del self.state[model]
+                self._save()
+
+    def mark_failure(self, model, error):
+        """
+        Record a failed request and take the model out of rotation for a while.
+
+        Args:
+            model (str): Model id
+            error (Exception): The error returned by the API
+        """
+        if is_missing_model_error(error):
+            cooldown, reason = MISSING_MODEL_COOLDOWN_SECONDS, "unavailable"
+        else:
+            cooldown, reason = FAILURE_COOLDOWN_SECONDS, "failing"
+        with self._lock:
+            entry = self.state.setdefault(model, {"failures": 0})
+            entry["failures"] += 1
+            entry["reason"] = reason
+            entry["error"] = str(error)[:200]
+            entry["unhealthy_until"] = time.time() + cooldown
+            self._save()
+
+    def candidates(self, preferred, models):
+        """
+        Order the models to try for a request.
+
+        Args:
+            preferred (str): The model selected by the user
+            models (list): All model ids, in the order of the MODELS table
+
+        Returns:
+            list: The preferred model (if healthy) followed by the other healthy models
+        """
+        ordered = [preferred] + [m for m in models if m != preferred]
+        healthy = [m for m in ordered if self.is_healthy(m)]
+        # If everything is marked as failing, try the preferred model anyway
+        return healthy or [preferred]
@@ -4,63 +4,311 @@ This module provides functions to render music notation from ABC notation.
 """
 
 import os
-import tempfile
-from music21 import converter, environment
+import threading
+import time
 import base64
 from pathlib import Path
 
-# Configure music21 environment
-us = environment.UserSettings()
-try:
-    # Try to use MuseScore if available (better quality)
-    us['musicxmlPath'] = '/usr/bin/musescore'
-except:
-    # Otherwise fall back to internal renderer
-    pass
+from abc_tokenizer import check_abc
+from abc_svg import render_svg, UnsupportedTune, RENDERER_VERSION
+from render_cache import RenderCache, make_render_key
 
-def render_abc_notation(abc_notation, output_dir=None):
+# music21 converter, imported and configured by load_music21 on first use
+_converter = None
+_load_lock = threading.Lock()
+
+# State of the background warm-up: "cold", "warming", "ready" or "failed"
+prewarm_status = {"state": "cold", "seconds": None, "error": None}
+
+def load_music21():
+    """
+    Import music21 and configure its environment (done once, at the first render).
+
+    Returns:
+        module: The music21 converter module
+    """
+    global _converter
+    # A render started while the prewarm thread is importing waits for it instead of importing twice
+    with _load_lock:
+        if _converter is None:
+            from music21 import converter, environment
+
+            # Configure music21 environment
+            us = environment.UserSettings()
+            try:
+                # Try to use MuseScore if available (better quality)
+                us['musicxmlPath'] = '/usr/bin/musescore'
+            except:
+                # Otherwise fall back to internal renderer
+                pass
+            _converter = converter
+    return _converter
+
+def prewarm_renderer():
+    """
+    Load music21 and parse a tiny tune, so the first real render only pays for the render itself.
+
+    Updates prewarm_status; errors are recorded there instead of raised.
+    """
+    prewarm_status["state"] = "warming"
+    start = time.perf_counter()
+    try:
+        # Parsing once loads the ABC parser and the stream classes it builds
+        load_music21().parseData(get_abc_example("scale"), format="abc")
+        prewarm_status["state"] = "ready"
+    except Exception as e:
+        prewarm_status["error"] = str(e)
+        prewarm_status["state"] = "failed"
+    prewarm_status["seconds"] = time.perf_counter() - start
+
+def start_prewarm():
+    """
+    Warm up the renderer on a daemon thread.
+
+    Returns:
+        threading.Thread: The started thread, or None if music21 is already loaded or warming
+    """
+    if _converter is not None or prewarm_status["state"] != "cold":
+        return None
+    prewarm_status["state"] = "warming"
+    thread = threading.Thread(target=prewarm_renderer, name="notation-prewarm", daemon=True)
+    thread.start()
+    return thread
+
+# Output format passed to music21's score.write
+RENDER_FORMAT = 'musicxml.png'
+# Image formats: "svg" draws simple tunes natively (the rest with MuseScore), "png" always uses MuseScore
+NOTATION_FORMATS = ("svg", "png")
+# Options that change the rendered image; part of the render cache key
+RENDER_OPTIONS = {"format": "svg", "native_version": RENDERER_VERSION, "musicxml_path": '/usr/bin/musescore'}
+
+# One render cache per output directory
+_render_caches = {}
+
+def get_output_dir(output_dir=None):
+    """
+    Resolve the directory rendered images are saved to.
+
+    Args:
+        output_dir (str, optional): Explicit directory. If None, the saved chats directory is used.
+
+    Returns:
+        str: Existing output directory
+    """
+    if output_dir is None:
+        # Check if we have path_config available
+        try:
+            from path_config import get_directories
+            output_dir, _ = get_directories()
+        except ImportError:
+            # Fallback to local directory
+            current_dir = os.path.dirname(os.path.abspath(__file__))
+            output_dir = os.path.join(current_dir, "saved_chats")
+            os.makedirs(output_dir, exist_ok=True)
+    return output_dir
+
+def get_render_cache(output_dir=None):
+    """
+    Return the render cache kept in the output directory.
+
+    Args:
+        output_dir (str, optional): Output directory (default: the saved chats directory)
+
+    Returns:
+        RenderCache: Cache of rendered images
+    """
+    cache_dir = os.path.join(get_output_dir(output_dir), "notation_cache")
+    if cache_dir not in _render_caches:
+        _render_caches[cache_dir] = RenderCache(cache_dir)
+    return _render_caches[cache_dir]
+
+def find_cached_render(abc_notation, output_dir=None):
+    """
+    Look up an image of the tune without rendering it.
+
+    Args:
+        abc_notation (str): ABC notation string
+        output_dir (str, optional): Output directory (default: the saved chats directory)
+
+    Returns:
+        str: Path of the cached image, or None if the tune was not rendered before
+    """
+    # The render that follows a miss counts it
+    return get_render_cache(output_dir).get(make_render_key(abc_notation, RENDER_OPTIONS), count_miss=False)
+
+def set_notation_format(image_format):
+    """
+    Choose the image format of new renders.
+
+    Args:
+        image_format (str): One of NOTATION_FORMATS
+    """
+    if image_format not in NOTATION_FORMATS:
+        raise ValueError(f"Unknown notation format: {image_format}")
+    RENDER_OPTIONS["format"] = image_format
+
+def render_abc_notation(abc_notation, output_dir=None, use_cache=True, native=True, musescore=True):
     """
     Render ABC notation to an image file and return the path.
     
+    Tunes that were rendered before (with the same options) are served from
+    the render cache without parsing or rendering them again. In SVG format,
+    simple single-staff tunes are drawn by the native renderer in milliseconds;
+    other tunes are rendered to PNG by music21 and MuseScore.
+    
     Args:
         abc_notation (str): ABC notation string
-        output_dir (str, optional): Directory to save the image. If None, uses a temporary directory.
+        output_dir (str, optional): Directory to save the image. If None, uses the saved chats directory.
+        use_cache (bool): Look up and store the image in the render cache
+        native (bool): Try the native SVG renderer (in SVG format)
+        musescore (bool): Fall back to music21 and MuseScore
     
     Returns:
-        str: Path to the rendered image file, or None if rendering failed
+        str: Path to the rendered image file, or None if rendering failed (or needs MuseScore
+            when musescore is False)
     """
     try:
-        if output_dir is None:
-            # Check if we have path_config available
-            try:
-                from path_config import get_directories
-                output_dir, _ = get_directories()
-            except ImportError:
-                # Fallback to local directory
-                current_dir = os.path.dirname(os.path.abspath(__file__))
-                output_dir = os.path.join(current_dir, "saved_chats")
-                os.makedirs(output_dir, exist_ok=True)
+        output_dir = get_output_dir(output_dir)
+        cache = get_render_cache(output_dir) if use_cache else None
+        key = make_render_key(abc_notation, RENDER_OPTIONS)
+        if cache:
+            cached_path = cache.get(key)
+            if cached_path:
+                return cached_path
         
-        # Create a temporary file for the ABC notation
-        with tempfile.NamedTemporaryFile(mode='w', suffix='.abc', delete=False) as temp_abc:
-            temp_abc.write(abc_notation)
-            temp_abc_path = temp_abc.name
+        start = time.perf_counter()
+        # Check and repair the tune before paying for a music21 parse
+        check = check_abc(abc_notation)
+        if not check["abc"]:
+            print(f"Invalid ABC notation: {'; '.join(check['errors'])}")
+            return None
         
-        # Convert ABC to music21 object
-        score = converter.parse(temp_abc_path)
+        if native and RENDER_OPTIONS["format"] == "svg":
+            try:
+                svg = render_svg(check["abc"])
+            except UnsupportedTune:
+                svg = None
+            if svg:
+                image_path = os.path.join(output_dir, f"music_notation_{key[:16]}.svg")
+                with open(image_path, 'w', encoding='utf-8') as f:
+                    f.write(svg)
+                if cache:
+                    return cache.store(key, image_path, time.perf_counter() - start)
+                return image_path
+        if not musescore:
+            return None
         
-        # Generate a PNG file
-        image_path = os.path.join(output_dir, f"music_notation_{os.path.basename(temp_abc_path)}.png")
-        score.write('musicxml.png', fp=image_path)
+        # Convert ABC to music21 object, parsed from the string in memory
+        score = load_music21().parseData(check["abc"], format='abc')
         
-        # Clean up the temporary ABC file
-        os.unlink(temp_abc_path)
+        # Generate a PNG file (music21 may add a page suffix, so use the path it returns)
+        image_path = os.path.join(output_dir, f"music_notation_{key[:16]}.png")
+        image_path = str(score.write(RENDER_FORMAT, fp=image_path) or image_path)
         
+        if cache:
+            return cache.store(key, image_path, time.perf_counter() - start)
         return image_path
     except Exception as e:
         print(f"Error rendering ABC notation: {e}")
         return None
 
+def _split_tunes(lines):
+    """Split lines at every X: field, dropping text in front of the first tune."""
+    tunes = []
+    for line in lines:
+        if line.strip().startswith('X:'):
+            tunes.append([line])
+        elif tunes:
+            tunes[-1].append(line)
+    return ['\n'.join(tune).strip('\n') for tune in tunes]
+
+class AbcStreamDetector:
+    """
+    Finds ABC notation blocks in text that arrives in pieces, e.g. a streamed answer.
+    
+    Tunes are found inside ``` code fences (the format the system prompts ask
+    for; a fence marked ```abc counts even without an X: field) and as plain
+    text blocks that start with X: and end with a blank line. Every block is
+    passed on as soon as its closing fence or blank line arrives.
+    """
+    
+    def __init__(self, on_block=None):
+        """
+        Args:
+            on_block: Optional callback receiving every completed ABC block
+        """
+        self.on_block = on_block
+        self.blocks = []
+        self._pending = ""
+        self._in_abc_block = False
+        self._current_block = []
+        self._in_fence = False
+        self._fence_is_abc = False
+        self._fence_lines = []
+    
+    def _emit(self, block):
+        self.blocks.append(block)
+        if self.on_block:
+            self.on_block(block)
+    
+    def _close_fence(self):
+        tunes = _split_tunes(self._fence_lines)
+        if not tunes and self._fence_is_abc and any(line.strip() for line in self._fence_lines):
+            tunes = ['\n'.join(self._fence_lines).strip('\n')]
+        for tune in tunes:
+            self._emit(tune)
+    
+    def _line(self, line):
+        if line.strip().startswith('```'):
+            if self._in_fence:
+                self._close_fence()
+                self._in_fence = False
+            else:
+                # A fence also ends a plain block that had no trailing blank line
+                if self._in_abc_block:
+                    self._emit('\n'.join(self._current_block).strip('\n'))
+                    self._in_abc_block = False
+                self._in_fence = True
+                self._fence_is_abc = line.strip()[3:].strip().lower() == 'abc'
+                self._fence_lines = []
+        elif self._in_fence:
+            self._fence_lines.append(line)
+        # Look for blocks that start with X: and end with blank lines
+        elif line.strip().startswith('X:') and not self._in_abc_block:
+            self._in_abc_block = True
+            self._current_block = [line]
+        elif self._in_abc_block:
+            self._current_block.append(line)
+            if line.strip() == '':
+                self._in_abc_block = False
+                self._emit('\n'.join(self._current_block).strip('\n'))
+                self._current_block = []
+    
+    def feed(self, content):
+        """
+        Add streamed text and pass on the blocks it completes.
+        
+        Args:
+            content (str): Next piece of the text
+        """
+        self._pending += content
+        *lines, self._pending = self._pending.split('\n')
+        for line in lines:
+            self._line(line)
+    
+    def flush(self):
+        """Process the last line and pass on a block left open at the end of the text."""
+        self._line(self._pending)
+        self._pending = ""
+        # Don't forget the last block if there's no trailing blank line or closing fence
+        if self._in_fence:
+            self._close_fence()
+            self._in_fence = False
+        if self._in_abc_block and self._current_block:
+            self._emit('\n'.join(self._current_block).strip('\n'))
+        self._in_abc_block = False
+        self._current_block = []
+
 def extract_abc_notation(text):
     """
     Extract ABC notation blocks from text.
@@ -71,27 +319,10 @@ def extract_abc_notation(text):
     Returns:
         list: List of ABC notation blocks
     """
-    abc_blocks = []
-    in_abc_block = False
-    current_block = []
-    
-    # Look for blocks that start with X: and end with blank lines
-    for line in text.split('\n'):
-        if line.strip().startswith('X:') and not in_abc_block:
-            in_abc_block = True
-            current_block = [line]
-        elif in_abc_block:
-            current_block.append(line)
-            if line.strip() == '':
-                in_abc_block = False
-                abc_blocks.append('\n'.join(current_block))
-                current_block = []
-    
-    # Don't forget the last block if there's no trailing blank line
-    if in_abc_block and current_block:
-        abc_blocks.append('\n'.join(current_block))
-    
-    return abc_blocks
+    detector = AbcStreamDetector()
+    detector.feed(text)
+    detector.flush()
+    return detector.blocks
 
 def get_abc_example(tune_type="scale"):
     """
@@ -26,3 +26,16 @@ def get_directories():
     os.makedirs(saved_sessions_dir, exist_ok=True)
     
     return saved_chats_dir, saved_sessions_dir
+
+def get_cache_directory():
+    """
+    Returns the directory for caches (responses, audio, rendered notation),
+    next to the saved chats and sessions directories. The MUSIC_THEORY_AI_CACHE_DIR
+    environment variable overrides it (used by the benchmarks).
+    """
+    cache_dir = os.getenv("MUSIC_THEORY_AI_CACHE_DIR")
+    if not cache_dir:
+        saved_chats_dir, _ = get_directories()
+        cache_dir = os.path.join(os.path.dirname(saved_chats_dir), "cache")
+    os.makedirs(cache_dir, exist_ok=True)
+    return cache_dir
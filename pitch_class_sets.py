@@ -0,0 +1,223 @@
+"""
+Vectorized pitch-class sets for Music Theory AI Chat.
+This module represents note collections as 12-bit masks (bit 0 = C, bit 1 = C♯/D♭,
+... bit 11 = B) and classifies, transposes and compares whole arrays of them
+with single NumPy operations on precomputed lookup tables covering every chord
+and scale quality in every transposition.
+
+Example:
+    masks = masks_from_notes([["C", "E", "G"], ["D", "F", "A", "C"]])
+    roots, qualities = identify_chords(masks)
+    chord_names(roots, qualities)  # ['C', 'Dm7']
+"""
+
+import numpy as np
+
+from theory_engine import CHORDS, SCALES, parse_note
+
+PITCH_CLASS_NAMES = ["C", "C♯", "D", "E♭", "E", "F", "F♯", "G", "A♭", "A", "B♭", "B"]
+FULL_MASK = 0xFFF
+TABLE_SIZE = 1 << 12
+
+# Chord and scale qualities as (name/suffix, mask of the quality rooted on C)
+CHORD_QUALITIES = [(suffix, name, sum(1 << (semis % 12) for _, semis in intervals))
+                   for suffix, name, intervals in CHORDS]
+SCALE_QUALITIES = [(name, sum(1 << semis for semis in set(semitones)))
+                   for name, (_, semitones) in SCALES.items()]
+
+def _rotate(mask, semitones):
+    """Transpose a single mask (plain Python ints, used to build the tables)."""
+    semitones %= 12
+    return ((mask << semitones) | (mask >> (12 - semitones))) & FULL_MASK
+
+def _build_identity_tables(qualities):
+    """
+    Map every one of the 4096 masks to (root, quality index).
+
+    Returns:
+        tuple: (roots, quality_indices, rooted) arrays of length 4096, -1 where the
+        mask is not a known quality. roots and quality_indices identify the mask in
+        any transposition. For symmetric sets (augmented triad, diminished seventh,
+        whole tone) the lowest root wins; earlier qualities win over later ones with
+        the same pitch classes. rooted holds the quality index only for masks already
+        transposed to root 0, i.e. masks measured from the bass note, so a lookup
+        there tells whether the bass note is the root of a known quality.
+    """
+    roots = np.full(TABLE_SIZE, -1, dtype=np.int8)
+    quality_indices = np.full(TABLE_SIZE, -1, dtype=np.int16)
+    rooted = np.full(TABLE_SIZE, -1, dtype=np.int16)
+    for index, template in enumerate(qualities):
+        if rooted[template] < 0:
+            rooted[template] = index
+        for root in range(12):
+            mask = _rotate(template, root)
+            if quality_indices[mask] < 0:
+                roots[mask] = root
+                quality_indices[mask] = index
+    return roots, quality_indices, rooted
+
+CHORD_ROOTS, CHORD_TABLE, CHORD_ROOTED_TABLE = _build_identity_tables([mask for _, _, mask in CHORD_QUALITIES])
+SCALE_ROOTS, SCALE_TABLE, _ = _build_identity_tables([mask for _, mask in SCALE_QUALITIES])
+
+# Every scale in every transposition, in the order (quality, root)
+ALL_SCALE_MASKS = np.array([_rotate(mask, root) for _, mask in SCALE_QUALITIES for root in range(12)],
+                           dtype=np.uint16)
+
+_ALL_MASKS = np.arange(TABLE_SIZE, dtype=np.uint32)
+_BITS = (_ALL_MASKS[:, np.newaxis] >> np.arange(12, dtype=np.uint32)) & 1
+
+POPCOUNT = _BITS.sum(axis=1).astype(np.uint8)
+
+# Smallest rotation of every mask: equal for sets that are transpositions of each other
+TRANSPOSITION_CLASS = np.min(
+    ((_ALL_MASKS[:, np.newaxis] << np.arange(12, dtype=np.uint32))
+     | (_ALL_MASKS[:, np.newaxis] >> (12 - np.arange(12, dtype=np.uint32)))) & FULL_MASK,
+    axis=1).astype(np.uint16)
+
+def _interval_vectors():
+    """Interval-class vectors of all 4096 masks: pairs of pitch classes counted per interval class."""
+    vectors = np.zeros((TABLE_SIZE, 6), dtype=np.uint8)
+    for low in range(12):
+        for high in range(low + 1, 12):
+            interval_class = min(high - low, 12 - (high - low))
+            vectors[:, interval_class - 1] += (_BITS[:, low] & _BITS[:, high]).astype(np.uint8)
+    return vectors
+
+INTERVAL_VECTORS = _interval_vectors()
+
+def masks_from_pitch_classes(pitch_classes):
+    """
+    Build masks from pitch-class numbers.
+
+    Args:
+        pitch_classes: 2-D array (sets x notes) of pitch classes or MIDI numbers;
+            -1 marks padding in sets with fewer notes
+
+    Returns:
+        np.ndarray: uint16 masks, one per row
+    """
+    pcs = np.asarray(pitch_classes, dtype=np.int64)
+    if pcs.ndim == 1:
+        pcs = pcs[np.newaxis, :]
+    bits = np.where(pcs >= 0, np.left_shift(1, pcs % 12), 0)
+    return np.bitwise_or.reduce(bits, axis=1).astype(np.uint16)
+
+def pad_pitch_classes(note_sets):
+    """
+    Turn lists of pitch classes of different lengths into a padded 2-D array.
+
+    Args:
+        note_sets (list): Lists of pitch classes
+
+    Returns:
+        np.ndarray: Array of shape (sets, longest set) padded with -1
+    """
+    width = max((len(notes) for notes in note_sets), default=0)
+    padded = np.full((len(note_sets), max(width, 1)), -1, dtype=np.int64)
+    for row, notes in enumerate(note_sets):
+        padded[row, :len(notes)] = notes
+    return padded
+
+def masks_from_notes(note_sets):
+    """
+    Build masks from note names such as [["C", "E♭", "G"], ...].
+
+    Returns:
+        np.ndarray: uint16 masks
+    """
+    return masks_from_pitch_classes(pad_pitch_classes(
+        [[parse_note(name).pitch_class for name in notes] for notes in note_sets]))
+
+def popcount(masks):
+    """Number of distinct pitch classes in every mask."""
+    return POPCOUNT[np.asarray(masks, dtype=np.uint16)]
+
+def transpose(masks, semitones):
+    """
+    Transpose masks by a number of semitones (a scalar or one value per mask).
+
+    Returns:
+        np.ndarray: Transposed uint16 masks
+    """
+    masks = np.asarray(masks, dtype=np.uint32)
+    shift = np.asarray(semitones, dtype=np.int64) % 12
+    rotated = (masks << shift) | (masks >> (12 - shift))
+    return (rotated & FULL_MASK).astype(np.uint16)
+
+def identify_chords(masks, bass=None):
+    """
+    Identify chords.
+
+    Args:
+        masks: uint16 masks
+        bass: Optional pitch class of the lowest note of every chord; when the chord
+            can be read with the bass as its root, that reading wins (C6 instead of Am7)
+
+    Returns:
+        tuple: (roots, quality indices into CHORD_QUALITIES), -1 where unknown
+    """
+    masks = np.asarray(masks, dtype=np.uint16)
+    roots = CHORD_ROOTS[masks].astype(np.int64)
+    qualities = CHORD_TABLE[masks].astype(np.int64)
+    if bass is not None:
+        bass = np.broadcast_to(np.asarray(bass, dtype=np.int64) % 12, masks.shape)
+        bass_rooted = CHORD_ROOTED_TABLE[transpose(masks, -bass)]
+        use_bass = bass_rooted >= 0
+        roots = np.where(use_bass, bass, roots)
+        qualities = np.where(use_bass, bass_rooted, qualities)
+    return roots, qualities
+
+def identify_scales(masks):
+    """
+    Identify scales that use exactly the pitch classes of every mask.
+
+    Returns:
+        tuple: (tonics, quality indices into SCALE_QUALITIES), -1 where unknown.
+        Modes of the same collection share a mask; the first quality in SCALES wins.
+    """
+    masks = np.asarray(masks, dtype=np.uint16)
+    return SCALE_ROOTS[masks].astype(np.int64), SCALE_TABLE[masks].astype(np.int64)
+
+def scales_containing(masks):
+    """
+    Find every scale (in every transposition) that contains each set.
+
+    Returns:
+        np.ndarray: Boolean matrix (sets x len(ALL_SCALE_MASKS))
+    """
+    masks = np.asarray(masks, dtype=np.uint16)
+    return (masks[:, np.newaxis] & ~ALL_SCALE_MASKS[np.newaxis, :]) == 0
+
+def interval_vectors(masks):
+    """Interval-class vectors (counts of interval classes 1-6) of every mask."""
+    return INTERVAL_VECTORS[np.asarray(masks, dtype=np.uint16)]
+
+def compare(masks_a, masks_b):
+    """
+    Compare two arrays of sets element by element.
+
+    Returns:
+        dict: "common" (shared pitch classes), "similarity" (shared / union),
+        "same_transposition_class" (one set is a transposition of the other) and
+        "subset" (every pitch class of a is in b)
+    """
+    a = np.asarray(masks_a, dtype=np.uint16)
+    b = np.asarray(masks_b, dtype=np.uint16)
+    common = POPCOUNT[a & b]
+    union = POPCOUNT[a | b]
+    return {
+        "common": common,
+        "similarity": np.divide(common, union, out=np.zeros(common.shape), where=union > 0),
+        "same_transposition_class": TRANSPOSITION_CLASS[a] == TRANSPOSITION_CLASS[b],
+        "subset": (a & ~b) == 0,
+    }
+
+def chord_names(roots, qualities):
+    """Format identification results as chord symbols (None where unknown)."""
+    return [f"{PITCH_CLASS_NAMES[root]}{CHORD_QUALITIES[quality][0]}" if quality >= 0 else None
+            for root, quality in zip(np.asarray(roots).tolist(), np.asarray(qualities).tolist())]
+
+def scale_names(tonics, qualities):
+    """Format identification results as scale names (None where unknown)."""
+    return [f"{PITCH_CLASS_NAMES[tonic]} {SCALE_QUALITIES[quality][0]}" if quality >= 0 else None
+            for tonic, quality in zip(np.asarray(tonics).tolist(), np.asarray(qualities).tolist())]
@@ -0,0 +1,120 @@
+"""
+Progress reporting for Music Theory AI Chat.
+This module provides one progress layer for exports, sessions, speech and
+batch mode. Bars advance by real work units (messages written, bytes
+flushed, chunks spoken, questions answered) and are left out entirely in
+quiet mode, for scripted and headless use.
+"""
+
+import os
+from contextlib import contextmanager
+
+# Size of the pieces files are written and read in, so byte progress is real
+CHUNK_BYTES = 64 * 1024
+
+class ProgressTask:
+    """
+    A running progress bar.
+    """
+
+    def __init__(self, console, progress=None, task_id=None):
+        self.console = console
+        self._progress = progress
+        self._task_id = task_id
+
+    def advance(self, units=1):
+        """Record finished work units."""
+        if self._progress is not None:
+            self._progress.update(self._task_id, advance=units)
+
+    def set_total(self, total):
+        """Change the number of work units, once it is known."""
+        if self._progress is not None:
+            self._progress.update(self._task_id, total=total)
+
+    def print(self, *objects):
+        """Print a message without breaking the bar."""
+        (self._progress.console if self._progress is not None else self.console).print(*objects)
+
+class ProgressReporter:
+    """
+    Creates progress bars, or nothing at all in quiet mode.
+    """
+
+    def __init__(self, console, quiet=False):
+        """
+        Args:
+            console: Rich console to draw on
+            quiet (bool): Suppress all progress bars
+        """
+        self.console = console
+        self.quiet = quiet
+
+    @contextmanager
+    def task(self, description, total, unit=None):
+        """
+        Show a progress bar while the block runs.
+
+        Args:
+            description (str): Text shown in front of the bar
+            total (int): Number of work units
+            unit (str, optional): "bytes" to show sizes, otherwise units are counted
+
+        Yields:
+            ProgressTask: Task to advance as work is done
+        """
+        if self.quiet:
+            yield ProgressTask(self.console)
+            return
+
+        from rich.progress import (Progress, SpinnerColumn, TextColumn, BarColumn, DownloadColumn,
+                                   MofNCompleteColumn, TimeElapsedColumn)
+
+        count_column = DownloadColumn() if unit == "bytes" else MofNCompleteColumn()
+        with Progress(
+            SpinnerColumn(),
+            TextColumn(f"[bold blue]{description}"),
+            BarColumn(),
+            count_column,
+            TimeElapsedColumn(),
+            console=self.console
+        ) as progress:
+            yield ProgressTask(self.console, progress, progress.add_task(description, total=total))
+
+    def write_text(self, filename, text, description):
+        """
+        Write a text file in chunks, advancing a bar by the bytes flushed.
+
+        Args:
+            filename (str): File to write
+            text (str): Content
+            description (str): Text shown in front of the bar
+        """
+        data = text.encode("utf-8")
+        with self.task(description, len(data), unit="bytes") as task:
+            with open(filename, 'wb') as f:
+                for start in range(0, len(data), CHUNK_BYTES):
+                    f.write(data[start:start + CHUNK_BYTES])
+                    task.advance(len(data[start:start + CHUNK_BYTES]))
+
+    def read_text(self, filename, description):
+        """
+        Read a text file in chunks, advancing a bar by the bytes read.
+
+        Args:
+            filename (str): File to read
+            description (str): Text shown in front of the bar
+
+        Returns:
+            str: File content
+        """
+        parts = []
+        with self.task(description, os.path.getsize(filename), unit="bytes") as task:
+            with open(filename, 'rb') as f:
+                while True:
+                    chunk = f.read(CHUNK_BYTES)
+                    if not chunk:
+                        break
+                    parts.append(chunk)
+                    task.advance(len(chunk))
+        return b"".join(parts).decode("utf-8")
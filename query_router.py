@@ -0,0 +1,197 @@
+"""
+Complexity-based model routing for Music Theory AI Chat.
+This module classifies questions with fast local heuristics (keywords,
+question length, topic) and sends simple ones to a small, fast model while
+composition and analysis requests keep the large model. Decisions are logged
+and the latency saved is estimated from the per-turn metrics.
+"""
+
+import json
+import re
+import time
+
+from turn_metrics import percentile
+
+# Requests that need the large model: writing, analysis, multi-step reasoning
+COMPLEX_PATTERNS = [
+    (r"\b(?:compose|write|create|generate|arrange|orchestrat\w*)\b", "writing music"),
+    (r"\b(?:analy[sz]e|analysis|reharmoni[sz]\w*|harmoni[sz]e)\b", "analysis"),
+    (r"\b(?:compare|contrast|difference between|differences)\b", "comparison"),
+    (r"\b(?:why|how does|how do|how can|how should|explain how)\b", "explanation"),
+    (r"\b(?:voice[- ]leading|counterpoint|fugue|modulat\w*|improvis\w*)\b", "advanced technique"),
+    (r"\b(?:abc|notation|score|melody|exercise|example|step by step)\b", "examples or notation"),
+    (r"```|\n", "multi-line input"),
+    # Follow-ups depend on the earlier answer, which the small model may handle worse
+    (r"^(?:and |but |so )?(?:more|another|again|continue|go on)\b|\b(?:it|that|this|those|these|them)\b", "follow-up"),
+]
+
+# Requests a small model answers as well: definitions and short facts
+SIMPLE_PATTERNS = [
+    (r"^(?:what|whats|what's) (?:does|do) .{1,40} mean\b", "definition"),
+    (r"^(?:what|whats|what's) (?:is|are) (?:a |an |the )?[\w' -]{1,30}$", "definition"),
+    (r"^(?:define|meaning of|translate)\b", "definition"),
+    (r"^(?:who|when|where) (?:is|was|were|did|wrote|composed)\b", "short fact"),
+    (r"^how many\b", "short fact"),
+    (r"^(?:is|are|does|do|can) .{1,60}$", "yes/no question"),
+]
+
+# Topics whose questions usually need the large model
+COMPLEX_TOPICS = {"composition": "composition topic", "harmony": "harmony topic"}
+
+SHORT_QUESTION_WORDS = 12
+LONG_QUESTION_WORDS = 40
+
+def classify_query(question, topic="general"):
+    """
+    Decide whether a question is simple enough for a small model.
+
+    Args:
+        question (str): The user's message
+        topic (str): Current topic from prompt_manager
+
+    Returns:
+        tuple: (complexity "simple" or "complex", score, list of reasons)
+    """
+    text = " ".join(question.strip().lower().split())
+    text = re.sub(r"[?!.]+$", "", text)
+    words = len(text.split())
+    score = 0
+    reasons = []
+
+    for pattern, reason in COMPLEX_PATTERNS:
+        if re.search(pattern, question.lower()):
+            score += 2
+            reasons.append(reason)
+    for pattern, reason in SIMPLE_PATTERNS:
+        if re.search(pattern, text):
+            score -= 2
+            reasons.append(reason)
+            break
+
+    if words > LONG_QUESTION_WORDS:
+        score += 2
+        reasons.append(f"long question ({words} words)")
+    elif words <= SHORT_QUESTION_WORDS:
+        score -= 1
+        reasons.append(f"short question ({words} words)")
+
+    if topic in COMPLEX_TOPICS:
+        score += 1
+        reasons.append(COMPLEX_TOPICS[topic])
+
+    return ("complex" if score > 0 else "simple"), score, reasons
+
+class QueryRouter:
+    """
+    Picks a model per question and keeps a log of the decisions.
+    """
+
+    def __init__(self, models, log_path=None):
+        """
+        Args:
+            models (dict): The MODELS table; entries with "tier": "small" are routing targets
+            log_path (str, optional): JSONL file every decision is appended to
+        """
+        self.models = models
+        self.log_path = log_path
+        self.enabled = False
+        # Per-topic overrides: "small", "large" or a model id
+        self.topic_overrides = {}
+        self.decisions = []
+
+    def small_models(self):
+        """Model ids of the small tier, in the order of the MODELS table."""
+        return [model["id"] for model in self.models.values() if model.get("tier") == "small"]
+
+    def route(self, question, topic, large_model, is_healthy=None):
+        """
+        Choose the model for a question.
+
+        Args:
+            question (str): The user's message
+            topic (str): Current topic
+            large_model (str): Model selected by the user, used for complex questions
+            is_healthy: Optional callable telling whether a model may be used
+
+        Returns:
+            tuple: (model id, decision dict)
+        """
+        override = self.topic_overrides.get(topic)
+        if override in ("small", "large"):
+            complexity, score, reasons = ("simple" if override == "small" else "complex"), 0, [f"override for {topic}"]
+        elif override:
+            complexity, score, reasons = "override", 0, [f"override for {topic}"]
+        else:
+            complexity, score, reasons = classify_query(question, topic)
+
+        model = large_model
+        if override and override not in ("small", "large"):
+            model = override
+        elif complexity == "simple":
+            candidates = [m for m in self.small_models() if is_healthy is None or is_healthy(m)]
+            if candidates:
+                model = candidates[0]
+
+        decision = {
+            "timestamp": time.time(),
+            "topic": topic,
+            "complexity": complexity,
+            "score": score,
+            "reasons": reasons,
+            "model": model,
+            "routed": model != large_model,
+            "words": len(question.split()),
+        }
+        self.decisions.append(decision)
+        if self.log_path:
+            try:
+                with open(self.log_path, 'a', encoding='utf-8') as f:
+                    f.write(json.dumps(decision) + "\n")
+            except IOError:
+                pass
+        return model, decision
+
+def estimate_savings(records, large_model, baseline_records=None):
+    """
+    Estimate the latency saved by routing compared to always using the large model.
+
+    Each routed turn is compared with the model it was routed away from (its
+    "large_model" field), whose time for the turn is estimated from that model's
+    median time to first token and median tokens/s. Routed turns whose large model
+    has no measurements yet are left out.
+
+    Args:
+        records (list): Turn metrics records (routed turns have "routed": True)
+        large_model (str): Large model for records that do not name one
+        baseline_records (list, optional): Records to measure the large models on,
+            e.g. the whole metrics file (default: records)
+
+    Returns:
+        dict: Routed turns, their actual time, the estimated always-large time
+        and the seconds saved, or None without enough data for the large models
+    """
+    baseline = {}
+    actual = estimated = 0.0
+    routed_turns = 0
+    for record in records:
+        if not record.get("routed") or record["cached"]:
+            continue
+        model = record.get("large_model") or large_model
+        if model not in baseline:
+            large = [r for r in (baseline_records or records) if r["model"] == model and not r["cached"]]
+            baseline[model] = (percentile([r["ttft_s"] for r in large], 50),
+                               percentile([r["tokens_per_s"] for r in large if r["tokens_per_s"]], 50))
+        ttft, speed = baseline[model]
+        if ttft is None or not speed:
+            continue
+        routed_turns += 1
+        actual += record["turn_s"]
+        estimated += ttft + record["tokens"] / speed + record["postprocess_s"]
+    if not routed_turns:
+        return None
+    return {
+        "routed_turns": routed_turns,
+        "actual_s": actual,
+        "always_large_s": estimated,
+        "saved_s": estimated - actual,
+    }
@@ -0,0 +1,248 @@
+"""
+Rate-limit-aware request scheduler for Music Theory AI Chat.
+This module keeps request and token buckets for every model, delays calls that
+would be rejected by the Groq rate limits, and retries 429/5xx errors with
+jittered exponential backoff. Interactive turns are served before batch requests.
+"""
+
+import asyncio
+import heapq
+import itertools
+import random
+import re
+import time
+
+# Request priorities, lower is served first
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BATCH = 1
+
+# Limits assumed until the API reports the real ones
+DEFAULT_REQUESTS_PER_MINUTE = 30
+DEFAULT_TOKENS_PER_MINUTE = 6000
+# Completion tokens reserved for a request on top of the prompt
+EXPECTED_COMPLETION_TOKENS = 800
+
+# Retry settings
+MAX_RETRIES = 5
+BACKOFF_BASE_SECONDS = 1.0
+BACKOFF_MAX_SECONDS = 60.0
+
+def parse_reset_time(value):
+    """
+    Parse a rate limit reset value such as "2m59.56s", "7.66s", "120ms" or "30".
+
+    Args:
+        value (str): Header value
+
+    Returns:
+        float: Seconds until the limit resets, or None if it can't be parsed
+    """
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    units = {"h": 3600.0, "m": 60.0, "s": 1.0, "ms": 0.001}
+    parts = re.findall(r'([\d.]+)(ms|h|m|s)', value)
+    if not parts:
+        return None
+    return sum(float(number) * units[unit] for number, unit in parts)
+
+def is_retryable(error):
+    """Check whether an API error is worth retrying (rate limit, server or connection error)."""
+    status = getattr(error, "status_code", None)
+    if status is not None:
+        return status == 429 or status >= 500
+    return type(error).__name__ in ("APIConnectionError", "APITimeoutError")
+
+def retry_after(error):
+    """Return the Retry-After delay sent with an error response, if any."""
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None)
+    if not headers:
+        return None
+    return parse_reset_time(headers.get("retry-after"))
+
+class TokenBucket:
+    """
+    Token bucket that refills continuously up to its capacity.
+    """
+
+    def __init__(self, capacity, refill_per_second):
+        self.capacity = float(capacity)
+        self.refill_per_second = float(refill_per_second)
+        self.level = float(capacity)
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.refill_per_second)
+        self.updated = now
+
+    def wait_time(self, amount):
+        """Seconds until the bucket holds the given amount (0 if it already does)."""
+        self._refill()
+        # A single request larger than the whole bucket only waits for a full bucket
+        amount = min(amount, self.capacity)
+        if self.level >= amount:
+            return 0.0
+        return (amount - self.level) / self.refill_per_second
+
+    def consume(self, amount):
+        """Take the given amount out of the bucket."""
+        self._refill()
+        self.level -= min(amount, self.capacity)
+
+    def pause(self, seconds):
+        """Empty the bucket so that it only has capacity again after the given time."""
+        self._refill()
+        self.level = min(self.level, -seconds * self.refill_per_second)
+
+    def update(self, limit, remaining, reset_seconds):
+        """
+        Align the bucket with the limits reported by the API.
+
+        Args:
+            limit (float): Capacity reported by the API
+            remaining (float): Remaining capacity reported by the API
+            reset_seconds (float): Time until the capacity is fully restored
+        """
+        self._refill()
+        if limit:
+            self.capacity = float(limit)
+        if remaining is not None:
+            self.level = min(self.capacity, float(remaining))
+            if reset_seconds and remaining < self.capacity:
+                self.refill_per_second = (self.capacity - remaining) / reset_seconds
+
+class RequestScheduler:
+    """
+    Schedules API calls so they stay inside the per-model rate limits.
+
+    Every model has a request bucket and a token bucket. Callers wait in a
+    priority queue per model; interactive turns overtake batch requests.
+    """
+
+    def __init__(self, requests_per_minute=DEFAULT_REQUESTS_PER_MINUTE,
+                 tokens_per_minute=DEFAULT_TOKENS_PER_MINUTE):
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.buckets = {}
+        self.stats = {"requests": 0, "delayed": 0, "delay_seconds": 0.0, "retries": 0}
+        self._queues = {}
+        self._counter = itertools.count()
+        self._condition = None
+
+    def _buckets_for(self, model):
+        if model not in self.buckets:
+            self.buckets[model] = {
+                "requests": TokenBucket(self.requests_per_minute, self.requests_per_minute / 60.0),
+                "tokens": TokenBucket(self.tokens_per_minute, self.tokens_per_minute / 60.0),
+            }
+        return self.buckets[model]
+
+    def update_from_headers(self, model, headers):
+        """
+        Update the buckets of a model from x-ratelimit-* response headers.
+
+        Args:
+            model (str): Model id
+            headers: Response headers (any mapping with a get method)
+        """
+        buckets = self._buckets_for(model)
+        for kind in ("requests", "tokens"):
+            try:
+                limit = headers.get(f"x-ratelimit-limit-{kind}")
+                remaining = headers.get(f"x-ratelimit-remaining-{kind}")
+                if limit is None or remaining is None:
+                    continue
+                buckets[kind].update(float(limit), float(remaining),
+                                     parse_reset_time(headers.get(f"x-ratelimit-reset-{kind}")))
+            except (TypeError, ValueError):
+                continue
+
+    async def acquire(self, model, tokens, priority=PRIORITY_INTERACTIVE):
+        """
+        Wait until a request for the model fits into its buckets.
+
+        Args:
+            model (str): Model id
+            tokens (int): Estimated tokens of the request
+            priority (int): PRIORITY_INTERACTIVE or PRIORITY_BATCH
+        """
+        if self._condition is None:
+            self._condition = asyncio.Condition()
+        queue = self._queues.setdefault(model, [])
+        entry = (priority, next(self._counter))
+        buckets = self._buckets_for(model)
+        started = time.monotonic()
+
+        async with self._condition:
+            heapq.heappush(queue, entry)
+            try:
+                while True:
+                    if queue[0] == entry:
+                        wait = max(buckets["requests"].wait_time(1), buckets["tokens"].wait_time(tokens))
+                        if wait <= 0:
+                            break
+                    else:
+                        # Someone with a higher priority (or who came first) is ahead of us
+                        wait = None
+                    try:
+                        await asyncio.wait_for(self._condition.wait(), timeout=wait)
+                    except asyncio.TimeoutError:
+                        pass
+                heapq.heappop(queue)
+                buckets["requests"].consume(1)
+                buckets["tokens"].consume(tokens)
+            except BaseException:
+                # Leave the queue if the caller was cancelled while waiting
+                if entry in queue:
+                    queue.remove(entry)
+                    heapq.heapify(queue)
+                raise
+            finally:
+                self._condition.notify_all()
+
+        waited = time.monotonic() - started
+        self.stats["requests"] += 1
+        if waited > 0.05:
+            self.stats["delayed"] += 1
+            self.stats["delay_seconds"] += waited
+
+    async def call(self, model, tokens, request, priority=PRIORITY_INTERACTIVE, on_retry=None):
+        """
+        Run an API request inside the rate limits, retrying transient errors.
+
+        Args:
+            model (str): Model id
+            tokens (int): Estimated tokens of the request
+            request: Coroutine function performing the request
+            priority (int): PRIORITY_INTERACTIVE or PRIORITY_BATCH
+            on_retry: Optional callback receiving (attempt, delay, error) before a retry
+
+        Returns:
+            The result of the request
+        """
+        attempt = 0
+        while True:
+            await self.acquire(model, tokens, priority)
+            try:
+                return await request()
+            except Exception as e:
+                attempt += 1
+                if attempt > MAX_RETRIES or not is_retryable(e):
+                    raise
+                # Full jitter: a random delay up to the exponential backoff
+                delay = random.uniform(0, min(BACKOFF_MAX_SECONDS, BACKOFF_BASE_SECONDS * 2 ** attempt))
+                server_delay = retry_after(e)
+                if server_delay is not None:
+                    delay = max(delay, server_delay)
+                if getattr(e, "status_code", None) == 429:
+                    # Hold back every other request for this model as well
+                    self._buckets_for(model)["requests"].pause(delay)
+                self.stats["retries"] += 1
+                if on_retry:
+                    on_retry(attempt, delay, e)
+                await asyncio.sleep(delay)
@@ -0,0 +1,192 @@
+"""
+Notation render cache for Music Theory AI Chat.
+This module keeps rendered notation images on disk, keyed by a hash of the
+normalized ABC text and the render options, so the same tune is rendered
+only once. An index file records the size, last use, render time and hits
+of every image; the cache is trimmed to a size limit, least recently used
+images first.
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+
+# Size limit of the render cache
+MAX_RENDER_BYTES = 200 * 1024 * 1024
+# Name of the index file inside the cache directory
+INDEX_FILE = "index.json"
+
+def normalize_abc(abc_notation):
+    """
+    Normalize ABC text so that formatting differences don't miss the cache.
+
+    Line endings and surrounding whitespace are unified, blank lines and
+    plain comments (% but not %% directives) are dropped. Spaces inside a
+    line are kept, since they change how notes are beamed.
+
+    Args:
+        abc_notation (str): ABC notation string
+
+    Returns:
+        str: Normalized ABC text
+    """
+    lines = []
+    for line in abc_notation.replace('\r\n', '\n').replace('\r', '\n').split('\n'):
+        line = line.strip()
+        if not line or (line.startswith('%') and not line.startswith('%%')):
+            continue
+        lines.append(line)
+    return '\n'.join(lines)
+
+def make_render_key(abc_notation, options=None):
+    """
+    Build the cache key of a rendered tune.
+
+    Args:
+        abc_notation (str): ABC notation string
+        options (dict, optional): Render options that change the image (format, renderer, ...)
+
+    Returns:
+        str: Hex digest identifying the image
+    """
+    payload = json.dumps([normalize_abc(abc_notation), options or {}], sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+class RenderCache:
+    """
+    Rendered notation images with a persistent index and LRU eviction.
+    """
+
+    def __init__(self, directory, max_bytes=MAX_RENDER_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.index_path = os.path.join(directory, INDEX_FILE)
+        # Session statistics; lifetime hits are kept per entry in the index
+        self.stats = {"hits": 0, "misses": 0, "stores": 0, "evictions": 0, "seconds_saved": 0.0}
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        # Key -> {"file", "bytes", "last_used", "render_seconds", "hits"}
+        self._index = {}
+        if os.path.exists(self.index_path):
+            try:
+                with open(self.index_path, 'r', encoding='utf-8') as f:
+                    self._index = json.load(f)
+            except (json.JSONDecodeError, IOError):
+                self._index = {}
+        # Drop entries whose image was deleted by hand
+        for key in [key for key, entry in self._index.items()
+                    if not os.path.exists(os.path.join(directory, entry["file"]))]:
+            del self._index[key]
+
+    def _save_index(self):
+        temp_path = f"{self.index_path}.tmp-{threading.get_ident()}"
+        try:
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                json.dump(self._index, f)
+            os.replace(temp_path, self.index_path)
+        except IOError:
+            pass
+
+    def get(self, key, count_miss=True):
+        """
+        Look up a rendered image.
+
+        Args:
+            key (str): Key from make_render_key
+            count_miss (bool): Count a miss in the statistics (False for a quick
+                check that is followed by a render, which counts it)
+
+        Returns:
+            str: Path of the image, or None on a miss
+        """
+        with self._lock:
+            entry = self._index.get(key)
+            path = os.path.join(self.directory, entry["file"]) if entry else None
+            if not entry or not os.path.exists(path):
+                self._index.pop(key, None)
+                if count_miss:
+                    self.stats["misses"] += 1
+                return None
+            entry["last_used"] = time.time()
+            entry["hits"] = entry.get("hits", 0) + 1
+            self.stats["hits"] += 1
+            self.stats["seconds_saved"] += entry.get("render_seconds", 0.0)
+            self._save_index()
+        return path
+
+    def store(self, key, rendered_path, render_seconds=0.0):
+        """
+        Move a freshly rendered image into the cache.
+
+        Args:
+            key (str): Key from make_render_key
+            rendered_path (str): Image written by the renderer
+            render_seconds (float): How long the render took (counted as saved on every hit)
+
+        Returns:
+            str: Path of the cached image
+        """
+        extension = os.path.splitext(rendered_path)[1]
+        name = key + extension
+        path = os.path.join(self.directory, name)
+        os.replace(rendered_path, path)
+        with self._lock:
+            self._index[key] = {
+                "file": name,
+                "bytes": os.path.getsize(path),
+                "last_used": time.time(),
+                "render_seconds": render_seconds,
+                "hits": 0
+            }
+            self.stats["stores"] += 1
+            self._evict(keep=key)
+            self._save_index()
+        return path
+
+    def _evict(self, keep=None):
+        total = sum(entry["bytes"] for entry in self._index.values())
+        if total <= self.max_bytes:
+            return
+        for key, entry in sorted(self._index.items(), key=lambda item: item[1]["last_used"]):
+            if total <= self.max_bytes:
+                break
+            if key == keep:
+                continue
+            try:
+                os.remove(os.path.join(self.directory, entry["file"]))
+            except OSError:
+                pass
+            del self._index[key]
+            total -= entry["bytes"]
+            self.stats["evictions"] += 1
+
+    def clear(self):
+        """Remove all cached images."""
+        with self._lock:
+            for entry in self._index.values():
+                try:
+                    os.remove(os.path.join(self.directory, entry["file"]))
+                except OSError:
+                    pass
+            self._index.clear()
+            self._save_index()
+
+    def summary(self):
+        """
+        Describe the cache for display.
+
+        Returns:
+            dict: Session statistics plus the number of images, their total size
+                and the hits and render time saved over the lifetime of the cache
+        """
+        with self._lock:
+            entries = list(self._index.values())
+        return dict(
+            self.stats,
+            files=len(entries),
+            disk_bytes=sum(entry["bytes"] for entry in entries),
+            lifetime_hits=sum(entry.get("hits", 0) for entry in entries),
+            lifetime_seconds_saved=sum(entry.get("hits", 0) * entry.get("render_seconds", 0.0) for entry in entries)
+        )
@@ -0,0 +1,155 @@
+"""
+Parallel notation rendering for Music Theory AI Chat.
+This module renders ABC blocks in a pool of worker processes, since music21
+parsing is CPU-bound and holds the GIL. Workers are forked on a background
+thread after music21 has been loaded, so they start with the parser already
+imported and neither the prompt nor the engine loop waits for them; until
+they are ready, renders run in threads. Finished images are stored in the
+render cache by the main process, which owns its index.
+"""
+
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from music_notation import render_abc_notation, get_render_cache, load_music21, RENDER_OPTIONS
+from render_cache import make_render_key
+
+# Default number of worker processes
+DEFAULT_RENDER_WORKERS = min(4, os.cpu_count() or 1)
+
+def render_job(abc_notation, output_dir=None):
+    """
+    Render one tune with MuseScore, without the render cache (runs in a worker process).
+
+    Tunes the native SVG renderer can draw are rendered in the main process
+    before they reach the pool.
+
+    Args:
+        abc_notation (str): ABC notation string
+        output_dir (str, optional): Directory to save the image
+
+    Returns:
+        tuple: (image path or None, seconds the render took)
+    """
+    start = time.perf_counter()
+    image_path = render_abc_notation(abc_notation, output_dir, use_cache=False, native=False)
+    return image_path, time.perf_counter() - start
+
+class RenderPool:
+    """
+    Worker processes for rendering several ABC blocks at the same time.
+    """
+
+    def __init__(self, max_workers=DEFAULT_RENDER_WORKERS):
+        """
+        Args:
+            max_workers (int): Number of worker processes
+        """
+        self.max_workers = max(1, max_workers)
+        self._executor = None
+        # Renders run here while the worker processes are being started
+        self._threads = None
+        self._starting = False
+        self._closed = False
+        self._lock = threading.Lock()
+        # The REPL re-runs when a spawned child imports the main script, so workers are forked
+        self.uses_processes = "fork" in multiprocessing.get_all_start_methods()
+
+    @property
+    def ready(self):
+        """Whether the worker processes are running."""
+        return self._executor is not None
+
+    def start(self):
+        """Start the worker processes on a background thread."""
+        with self._lock:
+            if self._executor is not None or self._starting or self._closed or not self.uses_processes:
+                return
+            self._starting = True
+        threading.Thread(target=self._start_processes, args=(self.max_workers,),
+                         name="render-pool-start", daemon=True).start()
+
+    def _start_processes(self, max_workers):
+        try:
+            # Forked workers inherit the loaded music21 instead of importing it each
+            load_music21()
+            executor = ProcessPoolExecutor(max_workers, mp_context=multiprocessing.get_context("fork"))
+            # Fork pools start all workers at the first submit; make that happen here
+            executor.submit(int).result()
+        except Exception:
+            with self._lock:
+                self._starting = False
+                # Without processes, renders keep running in threads
+                self.uses_processes = False
+            return
+        with self._lock:
+            self._starting = False
+            if self._closed:
+                executor.shutdown(wait=False, cancel_futures=True)
+                return
+            if max_workers != self.max_workers:
+                # The worker count changed while starting
+                executor.shutdown(wait=False)
+                restart = True
+            else:
+                self._executor = executor
+                restart = False
+        if restart:
+            self.start()
+
+    @property
+    def executor(self):
+        """The process pool, or a thread pool until the processes have been started."""
+        with self._lock:
+            if self._executor is not None:
+                return self._executor
+        self.start()
+        with self._lock:
+            if self._threads is None:
+                self._threads = ThreadPoolExecutor(self.max_workers, thread_name_prefix="notation-render")
+            return self._threads
+
+    def set_workers(self, max_workers):
+        """
+        Change the number of workers; running renders finish in the old pool.
+
+        Args:
+            max_workers (int): Number of worker processes
+        """
+        with self._lock:
+            self.max_workers = max(1, max_workers)
+            old = [executor for executor in (self._executor, self._threads) if executor is not None]
+            self._executor = None
+            self._threads = None
+        for executor in old:
+            executor.shutdown(wait=False)
+
+    def store(self, abc_notation, result, output_dir=None):
+        """
+        Put a worker's image into the render cache.
+
+        Args:
+            abc_notation (str): The rendered ABC notation
+            result (tuple): (image path, seconds) from render_job
+            output_dir (str, optional): Output directory the cache lives in
+
+        Returns:
+            str: Path of the cached image, or None if the render failed
+        """
+        image_path, seconds = result
+        if not image_path:
+            return None
+        return get_render_cache(output_dir).store(make_render_key(abc_notation, RENDER_OPTIONS), image_path, seconds)
+
+    def shutdown(self):
+        """Stop the workers without waiting for running renders."""
+        with self._lock:
+            old = [executor for executor in (self._executor, self._threads) if executor is not None]
+            self._executor = None
+            self._threads = None
+            self._closed = True
+        for executor in old:
+            executor.shutdown(wait=False, cancel_futures=True)
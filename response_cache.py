@@ -0,0 +1,186 @@
+"""
+Response cache for Music Theory AI Chat.
+This module provides a two-tier cache (in-memory LRU plus an on-disk SQLite
+store) for AI responses, so repeated questions are answered without an API call.
+"""
+
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+# Only answers generated at or below this temperature are cached by default
+CACHEABLE_MAX_TEMPERATURE = 0.3
+# Number of trailing (non-system) messages that identify a request
+TAIL_MESSAGES = 3
+# Entries kept in memory
+MEMORY_ENTRIES = 128
+# Size limit of the on-disk store
+MAX_DISK_BYTES = 20 * 1024 * 1024
+
+def normalize_message(content):
+    """
+    Normalize message text so trivial differences don't cause cache misses.
+
+    Args:
+        content (str): Message text
+
+    Returns:
+        str: Lowercased text with collapsed whitespace and no trailing punctuation
+    """
+    content = ' '.join(content.lower().split())
+    return re.sub(r'[\s?!.]+$', '', content)
+
+def make_cache_key(model, temperature, topic, conversation, tail=TAIL_MESSAGES):
+    """
+    Build the cache key for a request.
+
+    Args:
+        model (str): Model id
+        temperature (float): Sampling temperature
+        topic (str): Current prompt type from the prompt manager
+        conversation (list): Full conversation including the new user message
+        tail (int): Number of trailing messages to include in the key
+
+    Returns:
+        str: Hex digest identifying the request
+    """
+    messages = [m for m in conversation if m["role"] != "system"][-tail:]
+    payload = json.dumps({
+        "model": model,
+        "temperature": round(float(temperature), 2),
+        "topic": topic,
+        "tail": [[m["role"], normalize_message(m["content"])] for m in messages],
+    }, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+class ResponseCache:
+    """
+    Two-tier response cache.
+
+    Lookups go to an in-memory LRU first and then to a SQLite database. The
+    database is trimmed to a maximum size, evicting the least recently used
+    entries first.
+    """
+
+    def __init__(self, db_path, max_bytes=MAX_DISK_BYTES, memory_entries=MEMORY_ENTRIES):
+        self.db_path = db_path
+        self.max_bytes = max_bytes
+        self.memory_entries = memory_entries
+        self.enabled = True
+        self.allow_any_temperature = False
+        self.simulate_streaming = False
+        self.stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "stores": 0, "skipped": 0}
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        self._db = sqlite3.connect(db_path, check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT PRIMARY KEY, response TEXT NOT NULL, size INTEGER NOT NULL, "
+            "created REAL NOT NULL, last_used REAL NOT NULL, hits INTEGER NOT NULL DEFAULT 0)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS responses_last_used ON responses (last_used)")
+        self._db.commit()
+
+    def is_cacheable(self, temperature):
+        """Check whether requests at this temperature may use the cache."""
+        if not self.enabled:
+            return False
+        return self.allow_any_temperature or temperature <= CACHEABLE_MAX_TEMPERATURE
+
+    def _remember(self, key, response):
+        self._memory[key] = response
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def get(self, key):
+        """
+        Look up a cached response.
+
+        Args:
+            key (str): Key from make_cache_key
+
+        Returns:
+            str: The cached response, or None on a miss
+        """
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                self.stats["memory_hits"] += 1
+                return self._memory[key]
+
+            row = self._db.execute("SELECT response FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.stats["misses"] += 1
+                return None
+
+            self._db.execute(
+                "UPDATE responses SET last_used = ?, hits = hits + 1 WHERE key = ?", (time.time(), key)
+            )
+            self._db.commit()
+            self._remember(key, row[0])
+            self.stats["disk_hits"] += 1
+            return row[0]
+
+    def put(self, key, response):
+        """
+        Store a response in both tiers and evict old entries if needed.
+
+        Args:
+            key (str): Key from make_cache_key
+            response (str): Complete AI response
+        """
+        if not response:
+            return
+        now = time.time()
+        with self._lock:
+            self._remember(key, response)
+            self._db.execute(
+                "INSERT OR REPLACE INTO responses (key, response, size, created, last_used, hits) "
+                "VALUES (?, ?, ?, ?, ?, 0)",
+                (key, response, len(response.encode("utf-8")), now, now)
+            )
+            self._evict()
+            self._db.commit()
+            self.stats["stores"] += 1
+
+    def _evict(self):
+        total = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for key, size in self._db.execute("SELECT key, size FROM responses ORDER BY last_used").fetchall():
+            self._db.execute("DELETE FROM responses WHERE key = ?", (key,))
+            self._memory.pop(key, None)
+            total -= size
+            if total <= self.max_bytes:
+                break
+
+    def clear(self):
+        """Remove all cached responses."""
+        with self._lock:
+            self._memory.clear()
+            self._db.execute("DELETE FROM responses")
+            self._db.commit()
+
+    def summary(self):
+        """
+        Report cache counters and disk usage.
+
+        Returns:
+            dict: Hit/miss counters, hit rate and stored entries
+        """
+        with self._lock:
+            entries, size = self._db.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses"
+            ).fetchone()
+        hits = self.stats["memory_hits"] + self.stats["disk_hits"]
+        lookups = hits + self.stats["misses"]
+        return dict(self.stats, hits=hits, hit_rate=hits / lookups if lookups else 0.0,
+                    disk_entries=entries, disk_bytes=size, memory_entries=len(self._memory))
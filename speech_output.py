@@ -0,0 +1,426 @@
+"""
+Speech output helpers for Music Theory AI Chat.
+This module holds the text cleaning and sentence chunking rules used for
+text-to-speech, a sentence-level pipeline that speaks an answer while it
+is still streaming, a cloud TTS client that downloads the next chunks
+over a pooled connection while the current one plays, and an audio player
+whose current sentence can be stopped.
+"""
+
+import os
+import re
+import shutil
+import subprocess
+import tempfile
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+
+# Maximum length of a single speech request
+MAX_CHUNK_LENGTH = 200
+
+# Google Translate TTS API - no API key required
+CLOUD_TTS_URL = "https://translate.google.com/translate_tts"
+# Chunks downloaded ahead of the one that is playing
+DEFAULT_PREFETCH = 3
+# Command-line players that can be stopped mid-sentence, with the file types they play
+AUDIO_PLAYERS = [
+    (["ffplay", "-nodisp", "-autoexit", "-loglevel", "quiet"], (".mp3", ".wav")),
+    (["afplay"], (".mp3", ".wav")),
+    (["mpg123", "-q"], (".mp3",)),
+    (["paplay"], (".wav",)),
+    (["aplay", "-q"], (".wav",)),
+]
+
+def clean_text_for_speech(text):
+    """
+    Remove Markdown formatting that should not be read aloud.
+
+    Code blocks are replaced by the words "code block", inline code is
+    dropped and bold/italic markers are removed.
+
+    Args:
+        text (str): Markdown text
+
+    Returns:
+        str: Text suitable for speech synthesis
+    """
+    clean_text = re.sub(r'```.*?```', 'code block', text, flags=re.DOTALL)
+    clean_text = re.sub(r'`.*?`', '', clean_text)
+    clean_text = re.sub(r'\*\*(.*?)\*\*', r'\1', clean_text)
+    clean_text = re.sub(r'\*(.*?)\*', r'\1', clean_text)
+    return clean_text
+
+def split_sentences(text):
+    """Split text at sentence ends (., ! or ? followed by whitespace)."""
+    return [sentence for sentence in re.split(r'(?<=[.!?])\s+', text) if sentence.strip()]
+
+def chunk_sentences(text, max_length=MAX_CHUNK_LENGTH):
+    """
+    Group sentences into chunks of at most max_length characters.
+
+    Sentences longer than max_length are split at word boundaries, so words are
+    never cut in the middle of a request.
+
+    Args:
+        text (str): Text to split
+        max_length (int): Maximum chunk length
+
+    Returns:
+        list: Text chunks
+    """
+    chunks = []
+    current_chunk = ""
+
+    for sentence in split_sentences(text):
+        pieces = [sentence]
+        if len(sentence) > max_length:
+            pieces = []
+            piece = ""
+            for word in sentence.split():
+                if piece and len(piece) + len(word) + 1 > max_length:
+                    pieces.append(piece)
+                    piece = word
+                else:
+                    piece = f"{piece} {word}" if piece else word
+            if piece:
+                pieces.append(piece)
+
+        for piece in pieces:
+            if len(current_chunk) + len(piece) <= max_length:
+                current_chunk += piece + " "
+            else:
+                if current_chunk:
+                    chunks.append(current_chunk.strip())
+                current_chunk = piece + " "
+
+    if current_chunk.strip():
+        chunks.append(current_chunk.strip())
+    return chunks
+
+class SentenceStreamer:
+    """
+    Turns a token stream into cleaned, speakable sentences as soon as they are complete.
+
+    Code blocks are held back until their closing fence arrives and then spoken
+    as "code block", like clean_text_for_speech does for a whole text.
+    """
+
+    def __init__(self, on_sentence, max_length=MAX_CHUNK_LENGTH):
+        """
+        Args:
+            on_sentence: Callback receiving every sentence to speak
+            max_length (int): Sentences longer than this are split at word boundaries
+        """
+        self.on_sentence = on_sentence
+        self.max_length = max_length
+        self.buffer = ""
+        self.sentences = 0
+
+    def _emit(self, text):
+        for chunk in chunk_sentences(clean_text_for_speech(text), self.max_length):
+            # Headings, list markers and table pipes carry no words
+            chunk = " ".join(re.sub(r'^[#>\-*+|\s]+|\|', ' ', chunk).split())
+            if re.search(r'\w', chunk):
+                self.sentences += 1
+                self.on_sentence(chunk)
+
+    def _split_point(self):
+        """Position up to which the buffer holds complete sentences, or 0."""
+        # Inside an unclosed code block nothing can be spoken yet
+        if self.buffer.count("```") % 2 == 1:
+            start = self.buffer.find("```")
+            return self._last_boundary(self.buffer[:start])
+        return self._last_boundary(self.buffer)
+
+    @staticmethod
+    def _last_boundary(text):
+        boundary = 0
+        # A sentence end followed by whitespace, or a line break (headings, list items)
+        for match in re.finditer(r'[.!?](?=\s)|\n', text):
+            boundary = match.end()
+        # Keep inline code and emphasis markers balanced
+        while boundary and (text[:boundary].count("`") % 2 or text[:boundary].count("**") % 2):
+            boundary = max((m.end() for m in re.finditer(r'[.!?](?=\s)|\n', text[:boundary - 1])), default=0)
+        return boundary
+
+    def feed(self, content):
+        """
+        Add streamed content and emit the sentences it completes.
+
+        Args:
+            content (str): A chunk of the streamed response
+        """
+        self.buffer += content
+        split = self._split_point()
+        if split:
+            complete, self.buffer = self.buffer[:split], self.buffer[split:]
+            self._emit(complete)
+
+    def flush(self):
+        """Emit whatever is left at the end of the stream."""
+        if self.buffer.strip():
+            self._emit(self.buffer)
+        self.buffer = ""
+
+class SpeechQueue:
+    """
+    Speaks queued sentences one after another on a background thread.
+
+    Only the next few sentences are prepared (e.g. their audio downloaded)
+    ahead of the one that is speaking, so a long answer does not start a
+    download for every sentence at once.
+    """
+
+    def __init__(self, speak, prepare=None, prepare_ahead=DEFAULT_PREFETCH):
+        """
+        Args:
+            speak: Blocking function that speaks one queued item
+            prepare: Optional function applied to a sentence before it is its turn to
+                play, e.g. to start downloading its audio
+            prepare_ahead (int): Queued sentences prepared ahead of the one speaking
+        """
+        self.speak = speak
+        self.prepare = prepare
+        self.prepare_ahead = max(0, prepare_ahead)
+        # Queued sentences as [text, prepared item or None]
+        self._items = deque()
+        self._condition = threading.Condition()
+        self.spoken = 0
+        self.thread = threading.Thread(target=self._run, name="speech-queue", daemon=True)
+        self.thread.start()
+
+    def _prepare(self, entry):
+        if entry[1] is None:
+            entry[1] = self.prepare(entry[0]) if self.prepare else entry[0]
+        return entry[1]
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._items:
+                    self._condition.wait()
+                item = self._prepare(self._items.popleft())
+                for entry in islice(self._items, self.prepare_ahead):
+                    self._prepare(entry)
+            try:
+                self.speak(item)
+                self.spoken += 1
+            except Exception:
+                # A failed sentence must not stop the rest of the answer
+                pass
+
+    def put(self, text):
+        """Queue a sentence for speaking; it is prepared once it is among the next ones."""
+        with self._condition:
+            entry = [text, None]
+            # The speaking sentence plus prepare_ahead queued ones are prepared at most
+            if len(self._items) < self.prepare_ahead:
+                self._prepare(entry)
+            self._items.append(entry)
+            self._condition.notify()
+
+    def clear(self):
+        """Drop all sentences that were not spoken yet."""
+        with self._condition:
+            self._items.clear()
+
+    def pending(self):
+        """Number of sentences waiting to be spoken."""
+        with self._condition:
+            return len(self._items)
+
+class AudioPlayer:
+    """
+    Plays audio files in a player process, so the sentence that is playing can be stopped.
+
+    Files no installed player can handle are played with the blocking fallback
+    (e.g. playsound), which cannot be interrupted.
+    """
+
+    def __init__(self, fallback=None):
+        """
+        Args:
+            fallback: Blocking function that plays an audio file when no player process can
+        """
+        self.fallback = fallback
+        self._installed = None
+        self._process = None
+        self._lock = threading.Lock()
+
+    def players(self):
+        """Installed player commands with the file types they play (looked up once)."""
+        if self._installed is None:
+            self._installed = [(command, types) for command, types in AUDIO_PLAYERS if shutil.which(command[0])]
+        return self._installed
+
+    def can_stop(self, suffix):
+        """Whether playback of files with this suffix (e.g. ".mp3") can be stopped."""
+        return any(suffix in types for _, types in self.players())
+
+    def __call__(self, path):
+        """
+        Play an audio file and wait until it ends or is stopped.
+
+        Args:
+            path (str): Audio file
+        """
+        suffix = os.path.splitext(path)[1].lower()
+        command = next((command for command, types in self.players() if suffix in types), None)
+        if command is None:
+            if self.fallback:
+                self.fallback(path)
+            return
+        process = subprocess.Popen(command + [path], stdin=subprocess.DEVNULL,
+                                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        with self._lock:
+            self._process = process
+        try:
+            process.wait()
+        finally:
+            with self._lock:
+                if self._process is process:
+                    self._process = None
+
+    def stop(self):
+        """Stop the file that is playing; the caller continues with its next one."""
+        with self._lock:
+            process = self._process
+        if process and process.poll() is None:
+            process.terminate()
+
+class CloudSpeech:
+    """
+    Cloud text-to-speech with a shared HTTP session and prefetch-ahead playback.
+
+    Chunks are downloaded by a small thread pool over one pooled connection,
+    while playback stays strictly in order.
+    """
+
+    def __init__(self, play_file, max_workers=DEFAULT_PREFETCH, prefetch=DEFAULT_PREFETCH, language="en",
+                 audio_cache=None):
+        """
+        Args:
+            play_file: Blocking function that plays an audio file (e.g. playsound)
+            max_workers (int): Number of download threads
+            prefetch (int): Chunks downloaded ahead of the one that is playing
+            language (str): Speech language
+            audio_cache (AudioCache, optional): Cache for downloaded chunks
+        """
+        import requests
+        from requests.adapters import HTTPAdapter
+
+        self.play_file = play_file
+        # Incremented by cancel; speak_chunks stops when the generation changes
+        self._generation = 0
+        self.prefetch_depth = max(1, prefetch)
+        self.language = language
+        self.audio_cache = audio_cache
+        self.session = requests.Session()
+        self.session.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=max_workers))
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="tts-fetch")
+
+    def download(self, text):
+        """
+        Download the audio for one chunk.
+
+        Returns:
+            bytes: MP3 audio, or None if the service refused the request
+        """
+        params = {"ie": "UTF-8", "q": text, "tl": self.language, "client": "tw-ob"}
+        response = self.session.get(CLOUD_TTS_URL, params=params, timeout=10)
+        if response.status_code != 200:
+            return None
+        return response.content
+
+    def fetch(self, text):
+        """
+        Get an audio file for one chunk, from the cache when possible.
+
+        Returns:
+            tuple: (path, is_temporary), or None if no audio could be fetched
+        """
+        if self.audio_cache:
+            from audio_cache import make_audio_key
+
+            def produce(path):
+                audio = self.download(text)
+                if audio:
+                    with open(path, 'wb') as f:
+                        f.write(audio)
+
+            path = self.audio_cache.fetch(make_audio_key("cloud", self.language, 1, 1.0, text), ".mp3", produce)
+            return (path, False) if path else None
+
+        audio = self.download(text)
+        if not audio:
+            return None
+        with tempfile.NamedTemporaryFile(delete=False, suffix='.mp3') as f:
+            f.write(audio)
+        return f.name, True
+
+    def play(self, fetched):
+        """Play a fetched chunk and remove it if it was a temporary file."""
+        path, is_temporary = fetched
+        try:
+            self.play_file(path)
+        finally:
+            if is_temporary:
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+
+    def prefetch(self, text):
+        """
+        Start fetching a chunk in the background.
+
+        Returns:
+            tuple: (text, future of the audio), to be passed to play_prefetched
+        """
+        return text, self.executor.submit(self.fetch, text)
+
+    def play_prefetched(self, item):
+        """
+        Wait for a prefetched chunk and play it.
+
+        Returns:
+            bool: True if the chunk was played, False if no audio could be fetched
+        """
+        _, future = item
+        try:
+            fetched = future.result()
+        except Exception:
+            return False
+        if fetched:
+            self.play(fetched)
+        return bool(fetched)
+
+    def speak_chunks(self, chunks, on_chunk=None):
+        """
+        Speak chunks in order, fetching up to the prefetch depth ahead.
+
+        Download errors are raised, so callers can fall back to local speech.
+
+        Args:
+            chunks (list): Text chunks from chunk_sentences
+            on_chunk: Optional callback after every chunk (for progress bars)
+        """
+        generation = self._generation
+        pending = [self.executor.submit(self.fetch, chunk) for chunk in chunks[:self.prefetch_depth + 1]]
+        for i in range(len(chunks)):
+            if generation != self._generation:
+                return
+            fetched = pending[i].result()
+            next_index = i + self.prefetch_depth + 1
+            if next_index < len(chunks):
+                pending.append(self.executor.submit(self.fetch, chunks[next_index]))
+            if fetched:
+                self.play(fetched)
+            if on_chunk:
+                on_chunk()
+
+    def cancel(self):
+        """Stop speak_chunks calls that are running before their next chunk."""
+        self._generation += 1
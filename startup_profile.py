@@ -0,0 +1,63 @@
+"""
+Startup profiling for Music Theory AI Chat.
+This module records how long each stage of the program start takes and how
+many modules it imported, for the --profile-startup breakdown.
+"""
+
+import sys
+import time
+
+class StartupProfile:
+    """
+    Checkpoints between program start and the first prompt.
+    """
+
+    def __init__(self, enabled=False):
+        """
+        Args:
+            enabled (bool): Record checkpoints; when False, mark() does nothing
+        """
+        self.enabled = enabled
+        self.start = time.perf_counter()
+        self.sections = []
+        self._last_time = self.start
+        self._last_modules = len(sys.modules)
+
+    def mark(self, name):
+        """
+        Close the current section.
+
+        Args:
+            name (str): What was loaded since the previous mark
+        """
+        if not self.enabled:
+            return
+        now = time.perf_counter()
+        modules = len(sys.modules)
+        self.sections.append((name, now - self._last_time, modules - self._last_modules))
+        self._last_time = now
+        self._last_modules = modules
+
+    def total(self):
+        """Seconds from the start of the profile to the last mark."""
+        return self._last_time - self.start
+
+    def report(self, console):
+        """
+        Print the breakdown, slowest sections first.
+
+        Args:
+            console: Rich console to print to
+        """
+        from rich.table import Table
+
+        total = self.total() or 1e-9
+        table = Table(title="Startup Time")
+        table.add_column("Section", style="cyan")
+        table.add_column("Time", justify="right", style="green")
+        table.add_column("Share", justify="right")
+        table.add_column("Modules", justify="right")
+        for name, seconds, modules in sorted(self.sections, key=lambda section: -section[1]):
+            table.add_row(name, f"{seconds * 1000:.1f} ms", f"{seconds / total:.0%}", str(modules))
+        table.add_row("[bold]Total[/bold]", f"[bold]{total * 1000:.1f} ms[/bold]", "", str(len(sys.modules)))
+        console.print(table)
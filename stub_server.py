@@ -0,0 +1,286 @@
+#!/usr/bin/env python3
+"""
+Local Groq-compatible stub server for Music Theory AI Chat.
+This module speaks the OpenAI/Groq chat completions protocol (including
+server-sent event streaming) and replays recorded answers with configurable
+token timing, so the chat loop can be benchmarked without the live API.
+
+Answers come from two sources:
+- recordings made with --record, which keep the original token timing
+- assistant replies in saved sessions, streamed with synthetic timing
+
+Usage:
+    python3 stub_server.py --port 8765 --ttft 0.3 --tokens-per-second 250
+    GROQ_BASE_URL=http://127.0.0.1:8765 python3 first_ai.py
+"""
+
+import argparse
+import glob
+import hashlib
+import itertools
+import json
+import os
+import random
+import re
+import threading
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+UPSTREAM_URL = "https://api.groq.com"
+
+def normalize(text):
+    """Normalize a user message for matching against recordings."""
+    return ' '.join(text.lower().split())
+
+def request_key(messages):
+    """Key of a request: the normalized last user message."""
+    for message in reversed(messages):
+        if message.get("role") == "user":
+            return hashlib.sha256(normalize(message.get("content", "")).encode("utf-8")).hexdigest()
+    return ""
+
+def split_into_chunks(text):
+    """Split text into token-sized chunks (words with their trailing whitespace)."""
+    return re.findall(r'\S+\s*|\s+', text)
+
+def load_session_answers(sessions_dir):
+    """
+    Collect (user message, assistant reply) pairs from saved sessions.
+
+    Args:
+        sessions_dir (str): Directory with session_*.json files
+
+    Returns:
+        dict: Answers by request key, plus a list of all answers under None
+    """
+    answers = {None: []}
+    for path in sorted(glob.glob(os.path.join(sessions_dir, "*.json"))):
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                conversation = json.load(f)
+        except (json.JSONDecodeError, IOError):
+            continue
+        for previous, message in zip(conversation, conversation[1:]):
+            if message.get("role") == "assistant" and previous.get("role") == "user":
+                answers[request_key([previous])] = message["content"]
+                answers[None].append(message["content"])
+    return answers
+
+def load_recordings(recordings_path):
+    """
+    Read recorded streams.
+
+    Args:
+        recordings_path (str): JSONL file written in --record mode
+
+    Returns:
+        dict: Recorded chunks ([delay, content] pairs) by request key
+    """
+    recordings = {}
+    if recordings_path and os.path.exists(recordings_path):
+        with open(recordings_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                recordings[entry["key"]] = entry["chunks"]
+    return recordings
+
+class StubState:
+    """Answers, recordings and timing settings shared by all request handlers."""
+
+    def __init__(self, options):
+        self.options = options
+        self.answers = load_session_answers(options.sessions_dir)
+        self.recordings = load_recordings(options.recordings)
+        self.fallback_answers = itertools.cycle(self.answers[None] or [
+            "This is a stub answer from the local benchmark server. "
+            "A C major triad consists of the notes C, E and G."
+        ])
+        self.lock = threading.Lock()
+        self.requests = 0
+
+    def planned_chunks(self, messages):
+        """
+        Decide what to stream for a request.
+
+        Returns:
+            list: [delay before chunk, chunk content] pairs
+        """
+        key = request_key(messages)
+        options = self.options
+        if key in self.recordings:
+            return [[delay / options.speed, content] for delay, content in self.recordings[key]]
+
+        with self.lock:
+            text = self.answers.get(key) or next(self.fallback_answers)
+        interval = 1.0 / options.tokens_per_second if options.tokens_per_second > 0 else 0.0
+        chunks = []
+        for i, content in enumerate(split_into_chunks(text)):
+            delay = options.ttft if i == 0 else interval
+            if options.jitter:
+                delay *= random.uniform(1 - options.jitter, 1 + options.jitter)
+            chunks.append([delay, content])
+        return chunks
+
+def make_chunk(model, content=None, finish_reason=None):
+    delta = {"content": content} if content is not None else {}
+    return {
+        "id": "chatcmpl-stub",
+        "object": "chat.completion.chunk",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+    }
+
+class StubHandler(BaseHTTPRequestHandler):
+    """Handles chat completion requests."""
+
+    state = None
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        if self.state.options.verbose:
+            super().log_message(format, *args)
+
+    def _send_json(self, status, payload):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            self._send_json(404, {"error": {"message": f"Unknown path {self.path}"}})
+            return
+        request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        with self.state.lock:
+            self.state.requests += 1
+
+        if self.state.options.record:
+            self._proxy_and_record(request)
+            return
+
+        model = request.get("model", "stub")
+        chunks = self.state.planned_chunks(request.get("messages", []))
+        if not request.get("stream"):
+            time.sleep(sum(delay for delay, _ in chunks))
+            text = "".join(content for _, content in chunks)
+            self._send_json(200, {
+                "id": "chatcmpl-stub", "object": "chat.completion", "created": int(time.time()), "model": model,
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}],
+            })
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+        try:
+            for delay, content in chunks:
+                if delay > 0:
+                    time.sleep(delay)
+                self.wfile.write(f"data: {json.dumps(make_chunk(model, content))}\n\n".encode("utf-8"))
+                self.wfile.flush()
+            self.wfile.write(f"data: {json.dumps(make_chunk(model, finish_reason='stop'))}\n\n".encode("utf-8"))
+            self.wfile.write(b"data: [DONE]\n\n")
+        except (BrokenPipeError, ConnectionResetError):
+            # The client cancelled the stream (e.g. a hedged request that lost)
+            pass
+
+    def _proxy_and_record(self, request):
+        """Forward the request to the real API and record the stream with its timing."""
+        import requests
+
+        last = time.perf_counter()
+        upstream = requests.post(
+            self.state.options.upstream.rstrip("/") + self.path,
+            json=request,
+            headers={"Authorization": self.headers.get("Authorization", ""), "Content-Type": "application/json"},
+            stream=True
+        )
+        self.send_response(upstream.status_code)
+        for header in ("Content-Type",) + tuple(h for h in upstream.headers if h.lower().startswith("x-ratelimit")):
+            if header in upstream.headers:
+                self.send_header(header, upstream.headers[header])
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+
+        chunks = []
+        for line in upstream.iter_lines():
+            self.wfile.write(line + b"\n")
+            self.wfile.flush()
+            if not line.startswith(b"data: ") or line == b"data: [DONE]":
+                continue
+            try:
+                content = json.loads(line[6:])["choices"][0]["delta"].get("content")
+            except (ValueError, KeyError, IndexError):
+                continue
+            if content:
+                now = time.perf_counter()
+                chunks.append([round(now - last, 4), content])
+                last = now
+
+        if chunks and upstream.status_code == 200:
+            with self.state.lock:
+                with open(self.state.options.recordings, 'a', encoding='utf-8') as f:
+                    f.write(json.dumps({"key": request_key(request.get("messages", [])), "chunks": chunks}) + "\n")
+
+def parse_arguments(argv=None):
+    default_sessions = os.path.join(os.path.dirname(os.path.abspath(__file__)), "saved_sessions")
+    try:
+        from path_config import get_directories
+        default_sessions = get_directories()[1]
+    except ImportError:
+        pass
+
+    parser = argparse.ArgumentParser(description="Local Groq-compatible stub server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--sessions-dir", default=default_sessions,
+                        help="Saved sessions whose assistant replies are replayed")
+    parser.add_argument("--recordings", default="stub_recordings.jsonl",
+                        help="JSONL file with recorded streams (read, or written with --record)")
+    parser.add_argument("--record", action="store_true",
+                        help="Forward requests to the real API and record the streams")
+    parser.add_argument("--upstream", default=UPSTREAM_URL, help="API used in --record mode")
+    parser.add_argument("--ttft", type=float, default=0.3, help="Seconds before the first token")
+    parser.add_argument("--tokens-per-second", type=float, default=250.0, help="Streaming speed after the first token")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Random timing variation, e.g. 0.2 for +/-20%%")
+    parser.add_argument("--speed", type=float, default=1.0, help="Playback speed factor for recorded streams")
+    parser.add_argument("--verbose", action="store_true", help="Log every request")
+    return parser.parse_args(argv)
+
+def create_server(options):
+    """
+    Create the stub server (not started yet).
+
+    Args:
+        options: Parsed command line options
+
+    Returns:
+        ThreadingHTTPServer: The server
+    """
+    handler = type("BoundStubHandler", (StubHandler,), {"state": StubState(options)})
+    server = ThreadingHTTPServer((options.host, options.port), handler)
+    server.daemon_threads = True
+    return server
+
+if __name__ == "__main__":
+    options = parse_arguments()
+    server = create_server(options)
+    state = server.RequestHandlerClass.state
+    mode = "recording" if options.record else "replaying"
+    print(f"Stub server {mode} on http://{options.host}:{server.server_address[1]} "
+          f"({len(state.answers[None])} session answers, {len(state.recordings)} recordings)")
+    print(f"Point the app at it with: GROQ_BASE_URL=http://{options.host}:{server.server_address[1]}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
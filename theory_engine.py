@@ -0,0 +1,734 @@
+"""
+Offline music theory engine for Music Theory AI Chat.
+This module answers deterministic lookup questions (scales, modes, chords,
+intervals, key signatures, diatonic chords and progressions, transposition)
+locally and instantly, in the same Markdown/ABC style as the AI responses.
+Anything it does not recognize is left to the AI model.
+"""
+
+import re
+
+LETTERS = "CDEFGAB"
+NATURAL_PITCHES = {"C": 0, "D": 2, "E": 4, "F": 5, "G": 7, "A": 9, "B": 11}
+
+ACCIDENTALS = {
+    "": 0, "#": 1, "♯": 1, "b": -1, "♭": -1, "##": 2, "x": 2, "♯♯": 2, "𝄪": 2,
+    "bb": -2, "♭♭": -2, "𝄫": -2, "-sharp": 1, "-flat": -1, " sharp": 1, " flat": -1,
+    "-double-sharp": 2, "-double-flat": -2, " double sharp": 2, " double flat": -2,
+}
+
+# Scales as (degree numbers, semitones above the tonic)
+SCALES = {
+    "major": ([1, 2, 3, 4, 5, 6, 7], [0, 2, 4, 5, 7, 9, 11]),
+    "natural minor": ([1, 2, 3, 4, 5, 6, 7], [0, 2, 3, 5, 7, 8, 10]),
+    "harmonic minor": ([1, 2, 3, 4, 5, 6, 7], [0, 2, 3, 5, 7, 8, 11]),
+    "melodic minor": ([1, 2, 3, 4, 5, 6, 7], [0, 2, 3, 5, 7, 9, 11]),
+    "dorian": ([1, 2, 3, 4, 5, 6, 7], [0, 2, 3, 5, 7, 9, 10]),
+    "phrygian": ([1, 2, 3, 4, 5, 6, 7], [0, 1, 3, 5, 7, 8, 10]),
+    "lydian": ([1, 2, 3, 4, 5, 6, 7], [0, 2, 4, 6, 7, 9, 11]),
+    "mixolydian": ([1, 2, 3, 4, 5, 6, 7], [0, 2, 4, 5, 7, 9, 10]),
+    "locrian": ([1, 2, 3, 4, 5, 6, 7], [0, 1, 3, 5, 6, 8, 10]),
+    "major pentatonic": ([1, 2, 3, 5, 6], [0, 2, 4, 7, 9]),
+    "minor pentatonic": ([1, 3, 4, 5, 7], [0, 3, 5, 7, 10]),
+    "blues": ([1, 3, 4, 5, 5, 7], [0, 3, 5, 6, 7, 10]),
+    "whole tone": ([1, 2, 3, 4, 5, 6], [0, 2, 4, 6, 8, 10]),
+}
+
+SCALE_ALIASES = {
+    "ionian": "major", "minor": "natural minor", "aeolian": "natural minor",
+    "pentatonic": "major pentatonic", "pentatonic major": "major pentatonic",
+    "pentatonic minor": "minor pentatonic", "minor blues": "blues", "wholetone": "whole tone",
+    "whole-tone": "whole tone", "jazz minor": "melodic minor",
+}
+
+# Chords as (symbol suffix, name, [(interval number, semitones), ...])
+CHORDS = [
+    ("", "major triad", [(1, 0), (3, 4), (5, 7)]),
+    ("m", "minor triad", [(1, 0), (3, 3), (5, 7)]),
+    ("°", "diminished triad", [(1, 0), (3, 3), (5, 6)]),
+    ("+", "augmented triad", [(1, 0), (3, 4), (5, 8)]),
+    ("sus2", "suspended second", [(1, 0), (2, 2), (5, 7)]),
+    ("sus4", "suspended fourth", [(1, 0), (4, 5), (5, 7)]),
+    ("7", "dominant seventh", [(1, 0), (3, 4), (5, 7), (7, 10)]),
+    ("maj7", "major seventh", [(1, 0), (3, 4), (5, 7), (7, 11)]),
+    ("m7", "minor seventh", [(1, 0), (3, 3), (5, 7), (7, 10)]),
+    ("ø7", "half-diminished seventh", [(1, 0), (3, 3), (5, 6), (7, 10)]),
+    ("°7", "diminished seventh", [(1, 0), (3, 3), (5, 6), (7, 9)]),
+    ("m(maj7)", "minor-major seventh", [(1, 0), (3, 3), (5, 7), (7, 11)]),
+    ("+7", "augmented seventh", [(1, 0), (3, 4), (5, 8), (7, 10)]),
+    ("+maj7", "augmented major seventh", [(1, 0), (3, 4), (5, 8), (7, 11)]),
+    ("6", "major sixth", [(1, 0), (3, 4), (5, 7), (6, 9)]),
+    ("m6", "minor sixth", [(1, 0), (3, 3), (5, 7), (6, 9)]),
+    ("add9", "added ninth", [(1, 0), (3, 4), (5, 7), (9, 14)]),
+    ("9", "dominant ninth", [(1, 0), (3, 4), (5, 7), (7, 10), (9, 14)]),
+    ("maj9", "major ninth", [(1, 0), (3, 4), (5, 7), (7, 11), (9, 14)]),
+    ("m9", "minor ninth", [(1, 0), (3, 3), (5, 7), (7, 10), (9, 14)]),
+]
+
+CHORD_SUFFIX_ALIASES = {
+    "": "", "maj": "", "M": "", "major": "", "major triad": "",
+    "m": "m", "min": "m", "-": "m", "minor": "m", "minor triad": "m",
+    "°": "°", "o": "°", "dim": "°", "diminished": "°", "diminished triad": "°",
+    "+": "+", "aug": "+", "augmented": "+", "augmented triad": "+",
+    "sus2": "sus2", "sus4": "sus4", "sus": "sus4",
+    "7": "7", "dom7": "7", "dominant seventh": "7", "dominant 7th": "7",
+    "maj7": "maj7", "M7": "maj7", "Δ7": "maj7", "Δ": "maj7", "major seventh": "maj7", "major 7th": "maj7",
+    "m7": "m7", "min7": "m7", "-7": "m7", "minor seventh": "m7", "minor 7th": "m7",
+    "m7b5": "ø7", "m7♭5": "ø7", "ø": "ø7", "ø7": "ø7", "half-diminished": "ø7",
+    "half-diminished seventh": "ø7", "half diminished": "ø7",
+    "dim7": "°7", "°7": "°7", "o7": "°7", "diminished seventh": "°7", "diminished 7th": "°7",
+    "mmaj7": "m(maj7)", "m(maj7)": "m(maj7)", "minmaj7": "m(maj7)", "mM7": "m(maj7)",
+    "+7": "+7", "aug7": "+7", "7#5": "+7", "7♯5": "+7", "+maj7": "+maj7", "maj7#5": "+maj7", "maj7♯5": "+maj7",
+    "6": "6", "m6": "m6", "add9": "add9", "9": "9", "maj9": "maj9", "m9": "m9",
+}
+
+INTERVAL_NAMES = {
+    1: "unison", 2: "second", 3: "third", 4: "fourth", 5: "fifth", 6: "sixth", 7: "seventh", 8: "octave",
+}
+QUALITY_NAMES = {"P": "perfect", "M": "major", "m": "minor", "A": "augmented", "d": "diminished",
+                 "AA": "doubly augmented", "dd": "doubly diminished"}
+
+# Interval used for an interval given only in semitones
+SEMITONE_INTERVALS = {0: (1, 0), 1: (2, 1), 2: (2, 2), 3: (3, 3), 4: (3, 4), 5: (4, 5), 6: (4, 6),
+                      7: (5, 7), 8: (6, 8), 9: (6, 9), 10: (7, 10), 11: (7, 11)}
+
+SHARP_KEYS = ["C", "G", "D", "A", "E", "B", "F♯", "C♯"]
+FLAT_KEYS = ["C", "F", "B♭", "E♭", "A♭", "D♭", "G♭", "C♭"]
+ORDER_OF_SHARPS = ["F♯", "C♯", "G♯", "D♯", "A♯", "E♯", "B♯"]
+ORDER_OF_FLATS = ["B♭", "E♭", "A♭", "D♭", "G♭", "C♭", "F♭"]
+
+ROMAN_NUMERALS = ["I", "II", "III", "IV", "V", "VI", "VII"]
+
+LOCAL_ANSWER_FOOTER = "*Answered instantly by the offline theory engine.*"
+
+NOTE_PATTERN = r"[A-Ga-g](?:-double-sharp|-double-flat| double sharp| double flat|-sharp|-flat| sharp| flat|##|bb|♯♯|♭♭|[#♯b♭x𝄪𝄫])?"
+
+class Note:
+    """A spelled note: letter plus accidental (e.g. E♭ is different from D♯)."""
+
+    def __init__(self, letter, accidental=0):
+        self.letter = letter.upper()
+        self.accidental = accidental
+
+    @property
+    def pitch_class(self):
+        return (NATURAL_PITCHES[self.letter] + self.accidental) % 12
+
+    @property
+    def letter_index(self):
+        return LETTERS.index(self.letter)
+
+    def __eq__(self, other):
+        return isinstance(other, Note) and (self.letter, self.accidental) == (other.letter, other.accidental)
+
+    def __hash__(self):
+        return hash((self.letter, self.accidental))
+
+    def __str__(self):
+        if self.accidental > 0:
+            return self.letter + "♯" * self.accidental
+        return self.letter + "♭" * -self.accidental
+
+    __repr__ = __str__
+
+def parse_note(text):
+    """
+    Parse a note name such as "E", "Eb", "E♭", "F#", "Bbb" or "F sharp".
+
+    Args:
+        text (str): Note name
+
+    Returns:
+        Note: The parsed note, or None if the text is not a note
+    """
+    text = text.strip()
+    match = re.fullmatch(r"([A-Ga-g])(.*)", text)
+    if not match:
+        return None
+    accidental = match.group(2).lower() if match.group(2).strip() in ("sharp", "flat") or "-" in match.group(2) \
+        or " " in match.group(2) else match.group(2)
+    if accidental not in ACCIDENTALS:
+        return None
+    return Note(match.group(1), ACCIDENTALS[accidental])
+
+def note_from_interval(root, number, semitones):
+    """
+    Spell the note a given interval above a root.
+
+    Args:
+        root (Note): Starting note
+        number (int): Interval number (3 for a third, 9 for a ninth)
+        semitones (int): Size of the interval in semitones
+
+    Returns:
+        Note: The correctly spelled note
+    """
+    letter = LETTERS[(root.letter_index + number - 1) % 7]
+    target = (root.pitch_class + semitones) % 12
+    accidental = ((target - NATURAL_PITCHES[letter] + 6) % 12) - 6
+    return Note(letter, accidental)
+
+def interval_between(lower, upper):
+    """
+    Name the ascending interval between two spelled notes.
+
+    Args:
+        lower (Note): Lower note
+        upper (Note): Upper note
+
+    Returns:
+        tuple: (quality abbreviation, interval number, semitones), e.g. ("A", 4, 6); semitones
+            are negative for intervals narrower than a unison, such as the doubly diminished
+            second E♯-F♭ (-1)
+    """
+    number = (upper.letter_index - lower.letter_index) % 7 + 1
+    semitones = (upper.pitch_class - lower.pitch_class) % 12
+    if number in (1, 4, 5):
+        base = {1: 0, 4: 5, 5: 7}[number]
+        qualities = {0: "P", 1: "A", 2: "AA", -1: "d", -2: "dd"}
+    else:
+        base = {2: 2, 3: 4, 6: 9, 7: 11}[number]
+        qualities = {0: "M", -1: "m", 1: "A", 2: "AA", -2: "d", -3: "dd"}
+    difference = ((semitones - base + 6) % 12) - 6
+    return qualities.get(difference, "?"), number, base + difference
+
+def describe_interval(quality, number):
+    """Return a readable interval name such as "augmented fourth"."""
+    return f"{QUALITY_NAMES.get(quality, quality)} {INTERVAL_NAMES.get(number, str(number) + 'th')}"
+
+def build_scale(tonic, scale_name):
+    """
+    Spell a scale.
+
+    Args:
+        tonic (Note): Tonic of the scale
+        scale_name (str): Name from SCALES (or an alias)
+
+    Returns:
+        list: Notes of the scale
+    """
+    scale_name = SCALE_ALIASES.get(scale_name, scale_name)
+    degrees, semitones = SCALES[scale_name]
+    return [note_from_interval(tonic, degree, semis) for degree, semis in zip(degrees, semitones)]
+
+def build_chord(root, suffix):
+    """
+    Spell a chord.
+
+    Args:
+        root (Note): Root of the chord
+        suffix (str): Chord symbol suffix from CHORDS (e.g. "m7")
+
+    Returns:
+        tuple: (list of notes, chord name)
+    """
+    for chord_suffix, name, intervals in CHORDS:
+        if chord_suffix == suffix:
+            return [note_from_interval(root, number, semis) for number, semis in intervals], name
+    raise KeyError(suffix)
+
+def identify_chord(notes):
+    """
+    Identify a chord from its notes.
+
+    Every note is tried as the root. Roots whose spelled intervals match a chord
+    exactly are preferred over matches by pitch class only, and root position
+    is preferred over inversions.
+
+    Args:
+        notes (list): Notes of the chord, lowest first
+
+    Returns:
+        dict: Root, symbol suffix, chord name and bass note, or None if unknown
+    """
+    pitch_classes = {note.pitch_class for note in notes}
+    best = None
+    for position, root in enumerate(notes):
+        spelled = {(interval_between(root, note)[1], interval_between(root, note)[2] % 12) for note in notes}
+        intervals_pc = {(note.pitch_class - root.pitch_class) % 12 for note in notes}
+        for suffix, name, intervals in CHORDS:
+            template_pc = {semis % 12 for _, semis in intervals}
+            if template_pc != intervals_pc or len(template_pc) != len(pitch_classes):
+                continue
+            template_spelled = {((number - 1) % 7 + 1, semis % 12) for number, semis in intervals}
+            score = (2 if spelled == template_spelled else 1, -position)
+            if best is None or score > best[0]:
+                best = (score, root, suffix, name)
+    if best is None:
+        return None
+    _, root, suffix, name = best
+    return {"root": root, "suffix": suffix, "name": name, "bass": notes[0]}
+
+def key_signature(tonic, mode="major"):
+    """
+    Return the accidentals of a key.
+
+    Args:
+        tonic (Note): Tonic of the key
+        mode (str): "major" or "minor"
+
+    Returns:
+        list: Accidental notes in the order they appear in the key signature, or None for
+            theoretical keys (more than 7 accidentals, e.g. F♭ major or D♯ major)
+    """
+    scale = build_scale(tonic, "major" if mode == "major" else "natural minor")
+    if any(abs(note.accidental) > 1 for note in scale):
+        return None
+    altered = {str(note) for note in scale if note.accidental}
+    order = ORDER_OF_SHARPS if any(note.accidental > 0 for note in scale) else ORDER_OF_FLATS
+    return [note for note in order if note in altered]
+
+def abc_sequence(notes, group=None, chord=False):
+    """
+    Write notes as ABC, ascending, with explicit accidentals.
+
+    Args:
+        notes (list): Notes to write
+        group (int, optional): Put a bar line after this many notes
+        chord (bool): Write all notes as one chord
+
+    Returns:
+        str: ABC note sequence
+    """
+    octave = 4
+    previous_pitch = None
+    bar_state = {}
+    written = []
+    for note in notes:
+        # Every note goes above the previous one, even when the letter repeats (F♭ – F)
+        while previous_pitch is not None and octave * 12 + NATURAL_PITCHES[note.letter] + note.accidental <= previous_pitch:
+            octave += 1
+        previous_pitch = octave * 12 + NATURAL_PITCHES[note.letter] + note.accidental
+        key = (note.letter, octave)
+        prefix = ""
+        if note.accidental != bar_state.get(key, 0):
+            prefix = "^" * note.accidental if note.accidental > 0 else "_" * -note.accidental if note.accidental else "="
+        bar_state[key] = note.accidental
+        if octave <= 4:
+            name = note.letter + "," * (4 - octave)
+        else:
+            name = note.letter.lower() + "'" * (octave - 5)
+        written.append(prefix + name)
+        if group and not chord and len(written) % (group + 1) == group:
+            written.append("|")
+            bar_state = {}
+    if chord:
+        return "[" + "".join(written) + "]"
+    return " ".join(written).rstrip(" |")
+
+def abc_block(title, body, length="1/4"):
+    """Wrap an ABC body in a fenced tune with headers."""
+    return f"```\nX:1\nT:{title}\nM:4/4\nL:{length}\nK:C\n{body}|]\n```"
+
+def join_notes(notes):
+    return " – ".join(str(note) for note in notes)
+
+def chord_symbol(root, suffix):
+    return f"{root}{suffix}"
+
+# ---------------------------------------------------------------------------
+# Answers
+# ---------------------------------------------------------------------------
+
+def answer_scale(tonic, scale_name):
+    scale_name = SCALE_ALIASES.get(scale_name, scale_name)
+    notes = build_scale(tonic, scale_name)
+    title = f"{tonic} {scale_name.title()}"
+    degrees = SCALES[scale_name][0]
+    rows = "\n".join(
+        f"| {degree} | {note} | {describe_interval(*interval_between(tonic, note)[:2]) if i else 'tonic'} |"
+        for i, (degree, note) in enumerate(zip(degrees, notes))
+    )
+    abc = abc_sequence(notes + [tonic], group=4)
+    return (f"## {title} Scale\n\n**Notes:** {join_notes(notes)}\n\n"
+            f"| Degree | Note | Interval from {tonic} |\n|---|---|---|\n{rows}\n\n"
+            f"{abc_block(title + ' Scale', abc)}")
+
+def answer_chord_notes(root, suffix):
+    notes, name = build_chord(root, suffix)
+    symbol = chord_symbol(root, suffix)
+    rows = "\n".join(
+        f"| {describe_interval(*interval_between(root, note)[:2]) if i else 'root'} | {note} |"
+        for i, note in enumerate(notes)
+    )
+    return (f"## {symbol} ({root} {name})\n\n**Notes:** {join_notes(notes)}\n\n"
+            f"| Chord tone | Note |\n|---|---|\n{rows}\n\n"
+            f"{abc_block(symbol, abc_sequence(notes, chord=True) + '4', length='1/4')}")
+
+def answer_chord_identification(notes):
+    chord = identify_chord(notes)
+    if chord is None:
+        return None
+    symbol = chord_symbol(chord["root"], chord["suffix"])
+    position = "root position"
+    if chord["bass"] != chord["root"]:
+        chord_tones, _ = build_chord(chord["root"], chord["suffix"])
+        inversions = {1: "first inversion", 2: "second inversion", 3: "third inversion"}
+        index = next((i for i, n in enumerate(chord_tones) if n.pitch_class == chord["bass"].pitch_class), None)
+        position = inversions.get(index, "inversion")
+        symbol += f"/{chord['bass']}"
+    return (f"## {symbol}\n\n**{join_notes(notes)}** is a **{chord['root']} {chord['name']}** "
+            f"({position}).\n\n"
+            f"{abc_block(symbol, abc_sequence(notes, chord=True) + '4')}")
+
+def _article(name):
+    return "an" if name[0] in "aeiou" else "a"
+
+def answer_interval(lower, upper):
+    quality, number, semitones = interval_between(lower, upper)
+    name = describe_interval(quality, number)
+    extra = " (a tritone)" if semitones == 6 else ""
+    # Intervals narrower than a unison (E♯ up to F♭) end lower than they start
+    size = f"{abs(semitones)} semitone{'s' if abs(semitones) != 1 else ''}{' down in pitch' if semitones < 0 else ''}"
+    inversion_quality = {"P": "P", "M": "m", "m": "M", "A": "d", "d": "A", "AA": "dd", "dd": "AA"}.get(quality, quality)
+    inversion = describe_interval(inversion_quality, 9 - number if number > 1 else 8)
+    return (f"## Interval from {lower} to {upper}\n\n"
+            f"Ascending from **{lower}** to **{upper}** is {_article(name)} **{name}**{extra}: "
+            f"{size} ({quality}{number}).\n\n"
+            f"Inverted ({upper} up to {lower}) it becomes {_article(inversion)} {inversion}.\n\n"
+            f"{abc_block(f'{lower} to {upper}', abc_sequence([lower, upper]) + ' ' + abc_sequence([lower, upper], chord=True) + '2')}")
+
+def answer_key_signature(tonic, mode):
+    accidentals = key_signature(tonic, mode)
+    if accidentals is None:
+        # Theoretical keys are left to the model
+        return None
+    if not accidentals:
+        summary = "no sharps or flats"
+    else:
+        kind = "sharp" if "♯" in accidentals[0] else "flat"
+        summary = f"{len(accidentals)} {kind}{'s' if len(accidentals) > 1 else ''}: {', '.join(accidentals)}"
+    relative_tonic = note_from_interval(tonic, 6, 9) if mode == "major" else note_from_interval(tonic, 3, 3)
+    relative_mode = "minor" if mode == "major" else "major"
+    return (f"## Key Signature of {tonic} {mode.title()}\n\n**{tonic} {mode}** has {summary}.\n\n"
+            f"Relative {relative_mode}: **{relative_tonic} {relative_mode}**.")
+
+def answer_key_from_signature(count, kind, mode):
+    if count > 7:
+        return None
+    major = SHARP_KEYS[count] if kind == "sharp" else FLAT_KEYS[count]
+    minor = note_from_interval(parse_note(major), 6, 9)
+    accidentals = (ORDER_OF_SHARPS if kind == "sharp" else ORDER_OF_FLATS)[:count]
+    listed = f" ({', '.join(accidentals)})" if accidentals else ""
+    if mode == "minor":
+        lead = f"**{minor} minor** has {count} {kind}{'s' if count != 1 else ''}{listed}."
+    else:
+        lead = f"**{major} major** has {count} {kind}{'s' if count != 1 else ''}{listed}."
+    return f"## {count} {kind.title()}{'s' if count != 1 else ''}\n\n{lead}\n\nRelative keys: **{major} major** and **{minor} minor**."
+
+def diatonic_chords(tonic, mode="major", sevenths=False):
+    """
+    Build the chords on every degree of a key.
+
+    Args:
+        tonic (Note): Tonic of the key
+        mode (str): "major", "minor" (natural) or "harmonic minor"
+        sevenths (bool): Build seventh chords instead of triads
+
+    Returns:
+        list: (roman numeral, root, suffix, notes) for every degree
+    """
+    scale_name = {"major": "major", "minor": "natural minor"}.get(mode, mode)
+    scale = build_scale(tonic, scale_name)
+    chords = []
+    for degree in range(7):
+        size = 4 if sevenths else 3
+        notes = [scale[(degree + 2 * i) % 7] for i in range(size)]
+        chord = identify_chord(notes)
+        suffix = chord["suffix"] if chord else "?"
+        numeral = ROMAN_NUMERALS[degree]
+        if suffix in ("m", "°", "m7", "ø7", "°7", "m(maj7)", "m6", "m9"):
+            numeral = numeral.lower()
+        if suffix in ("°", "+") and not sevenths:
+            numeral += suffix
+        elif sevenths:
+            numeral += {"maj7": "maj7", "7": "7", "m7": "7", "ø7": "ø7", "°7": "°7",
+                        "m(maj7)": "(maj7)", "+7": "+7", "+maj7": "+maj7"}.get(suffix, "")
+        chords.append((numeral, notes[0], suffix, notes))
+    return chords
+
+def answer_diatonic(tonic, mode, sevenths):
+    chords = diatonic_chords(tonic, mode, sevenths)
+    kind = "Seventh Chords" if sevenths else "Triads"
+    rows = "\n".join(f"| {numeral} | {chord_symbol(root, suffix)} | {join_notes(notes)} |"
+                     for numeral, root, suffix, notes in chords)
+    abc = " | ".join(abc_sequence(notes, chord=True) + "4" for _, _, _, notes in chords)
+    return (f"## Diatonic {kind} in {tonic} {mode.title()}\n\n"
+            f"| Degree | Chord | Notes |\n|---|---|---|\n{rows}\n\n"
+            f"{abc_block(f'Diatonic {kind} in {tonic} {mode}', abc)}")
+
+def parse_roman_numeral(numeral):
+    """
+    Parse a roman numeral such as "V7", "ii", "bVII", "vii°" or "IVmaj7".
+
+    Returns:
+        tuple: (degree index, accidental, is_minor, quality suffix) or None
+    """
+    match = re.fullmatch(r"([b♭#♯]?)(VII|VI|V|IV|III|II|I|vii|vi|v|iv|iii|ii|i)(°7|ø7|°|ø|\+|maj7|7)?", numeral)
+    if not match:
+        return None
+    accidental = {"": 0, "b": -1, "♭": -1, "#": 1, "♯": 1}[match.group(1)]
+    roman = match.group(2)
+    return ROMAN_NUMERALS.index(roman.upper()), accidental, roman.islower(), match.group(3) or ""
+
+def answer_progression(numerals, tonic, mode):
+    scale = build_scale(tonic, "major" if mode == "major" else "natural minor")
+    rows = []
+    chords = []
+    for numeral in numerals:
+        parsed = parse_roman_numeral(numeral)
+        if parsed is None:
+            return None
+        degree, accidental, is_minor, quality = parsed
+        root = Note(scale[degree].letter, scale[degree].accidental + accidental)
+        if quality in ("°", "°7", "ø", "ø7"):
+            suffix = {"°": "°", "°7": "°7", "ø": "ø7", "ø7": "ø7"}[quality]
+        elif quality == "+":
+            suffix = "+"
+        elif quality == "maj7":
+            suffix = "m(maj7)" if is_minor else "maj7"
+        elif quality == "7":
+            suffix = "m7" if is_minor else "7"
+        else:
+            suffix = "m" if is_minor else ""
+        notes, _ = build_chord(root, suffix)
+        rows.append(f"| {numeral} | {chord_symbol(root, suffix)} | {join_notes(notes)} |")
+        chords.append(notes)
+    abc = " | ".join(abc_sequence(notes, chord=True) + "4" for notes in chords)
+    title = f"{'–'.join(numerals)} in {tonic} {mode}"
+    return (f"## {title}\n\n| Numeral | Chord | Notes |\n|---|---|---|\n" + "\n".join(rows) +
+            f"\n\n{abc_block(title, abc)}")
+
+def parse_interval_name(text):
+    """
+    Parse an interval such as "major third", "P5", "m3", "tritone", "octave" or "3 semitones".
+
+    Returns:
+        tuple: (interval number, semitones) or None
+    """
+    text = text.strip().lower()
+    match = re.fullmatch(r"(\d+) (?:semitones?|half[- ]steps?)", text)
+    if match:
+        semitones = int(match.group(1))
+        number, semis = SEMITONE_INTERVALS[semitones % 12]
+        return number + 7 * (semitones // 12), semis + 12 * (semitones // 12)
+    if text in ("tritone",):
+        return 4, 6
+    if text in ("octave", "perfect octave", "p8"):
+        return 8, 12
+    if text in ("whole step", "whole tone", "tone"):
+        return 2, 2
+    if text in ("half step", "semitone"):
+        return 2, 1
+    abbreviations = {"p": "perfect", "m": "minor", "maj": "major", "min": "minor", "aug": "augmented",
+                     "dim": "diminished", "a": "augmented", "d": "diminished"}
+    match = re.fullmatch(r"(perfect|major|minor|augmented|diminished|p|maj|min|aug|dim|a|d|m)\s*"
+                         r"(unison|second|third|fourth|fifth|sixth|seventh|octave|\d)(?:st|nd|rd|th)?", text)
+    if not match:
+        return None
+    quality = abbreviations.get(match.group(1), match.group(1))
+    word = match.group(2)
+    number = int(word) if word.isdigit() else {v: k for k, v in INTERVAL_NAMES.items()}[word]
+    perfect = number in (1, 4, 5, 8)
+    base = {1: 0, 2: 2, 3: 4, 4: 5, 5: 7, 6: 9, 7: 11, 8: 12}.get(number)
+    if base is None:
+        return None
+    offsets = {"perfect": 0, "augmented": 1, "diminished": -1} if perfect else \
+        {"major": 0, "minor": -1, "augmented": 1, "diminished": -2}
+    if quality not in offsets:
+        return None
+    return number, base + offsets[quality]
+
+def parse_items(text):
+    """
+    Parse a list of notes or chord symbols separated by spaces, commas or dashes.
+
+    Returns:
+        list: (root Note, chord suffix or None) pairs, or None if anything is unrecognized
+    """
+    items = []
+    for token in re.split(r"\s*[,–—/|]\s*|\s+-\s+|\s+|(?<=[A-Ga-g#♯b♭])-(?=[A-G])", text.strip()):
+        if not token:
+            continue
+        match = re.fullmatch(r"([A-G](?:##|bb|♯♯|♭♭|[#♯b♭x])?)(.*)", token)
+        if not match:
+            return None
+        root = parse_note(match.group(1))
+        suffix = match.group(2)
+        if suffix == "":
+            items.append((root, None))
+        elif suffix in CHORD_SUFFIX_ALIASES:
+            items.append((root, CHORD_SUFFIX_ALIASES[suffix]))
+        else:
+            return None
+    return items or None
+
+def transpose_note(note, number, semitones, down=False):
+    if down:
+        # Going down by an interval lands on the same pitch class as going up by its inversion
+        number, semitones = (9 - ((number - 1) % 7 + 1)) if (number - 1) % 7 else 1, (-semitones) % 12
+    return note_from_interval(note, number, semitones)
+
+def answer_transposition(items, number, semitones, down, description):
+    transposed = [(transpose_note(root, number, semitones, down), suffix) for root, suffix in items]
+
+    def show(entries):
+        return " – ".join(chord_symbol(root, suffix) if suffix is not None else str(root) for root, suffix in entries)
+
+    all_notes = all(suffix is None for _, suffix in items)
+    abc = ""
+    if all_notes:
+        abc = "\n\n" + abc_block("Transposed", abc_sequence([root for root, _ in transposed]))
+    return (f"## Transposition {description}\n\n"
+            f"| Original | Transposed |\n|---|---|\n| {show(items)} | {show(transposed)} |{abc}")
+
+# ---------------------------------------------------------------------------
+# Query router
+# ---------------------------------------------------------------------------
+
+SCALE_NAME_PATTERN = "|".join(sorted((re.escape(n) for n in list(SCALES) + list(SCALE_ALIASES)), key=len, reverse=True))
+CHORD_WORD_PATTERN = "|".join(sorted((re.escape(n) for n in CHORD_SUFFIX_ALIASES if " " in n or n.isalpha() and len(n) > 3),
+                                     key=len, reverse=True))
+LEAD_IN = r"(?:(?:please|hey|ok|okay)\s*,?\s*)?(?:(?:can|could) you (?:tell me|show me|give me|list|spell)\s+|tell me\s+|show me\s+|give me\s+|list\s+|spell(?: out)?\s+|name\s+)?"
+WHAT = r"(?:what(?:'s| is| are)\s+|which\s+(?:are\s+)?)?"
+
+def normalize_query(text):
+    text = text.strip().replace("’", "'").replace("‘", "'")
+    text = re.sub(r"[?.!]+$", "", text).strip()
+    return text
+
+def answer_query(question):
+    """
+    Answer a lookup-style music theory question locally.
+
+    Args:
+        question (str): The user's message
+
+    Returns:
+        str: Markdown answer (with ABC notation where useful), or None if the
+        question should go to the AI model
+    """
+    text = normalize_query(question)
+    if not text or len(text) > 160:
+        return None
+    try:
+        answer = _route(text)
+    except (KeyError, ValueError, IndexError):
+        return None
+    if answer:
+        return f"{answer}\n\n{LOCAL_ANSWER_FOOTER}"
+    return None
+
+def _route(text):
+    flags = re.IGNORECASE
+
+    # Scales and modes: "notes of E harmonic minor", "D dorian scale", "spell the Bb blues scale"
+    match = re.fullmatch(LEAD_IN + WHAT + r"(?:the\s+)?(?:notes?\s+(?:of|in)\s+)?(?:the\s+|an?\s+)?"
+                         rf"({NOTE_PATTERN})\s+({SCALE_NAME_PATTERN})(?:\s+(?:scale|mode))?(?:\s+notes)?", text, flags)
+    if match and not re.search(r"\b(?:chord|triad)\b", text, flags):
+        tonic = parse_note(match.group(1))
+        scale_name = match.group(2).lower()
+        if tonic:
+            return answer_scale(tonic, scale_name)
+
+    # Chord identification: "what chord is C–E♭–G♭–B♭♭", "identify C E G"
+    match = re.fullmatch(r"(?:what|which)\s+chord\s+(?:is|are|do|does)\s+(?:this|that|it)?\s*:?\s*(.+?)"
+                         r"(?:\s+(?:form|make|spell|build))?", text, flags) or \
+        re.fullmatch(r"(?:identify|name)\s+(?:the\s+)?(?:chord\s+)?:?\s*(.+)", text, flags)
+    if match:
+        items = parse_items(match.group(1))
+        if items and len(items) >= 3 and all(suffix is None for _, suffix in items):
+            return answer_chord_identification([root for root, _ in items])
+
+    # Chord spelling: "notes of F#m7b5", "spell a D half-diminished seventh chord"
+    match = re.fullmatch(LEAD_IN + WHAT + r"(?:the\s+)?(?:notes?\s+(?:of|in)\s+)?(?:the\s+|an?\s+)?"
+                         rf"([A-G](?:##|bb|♯♯|♭♭|[#♯b♭])?)\s*({CHORD_WORD_PATTERN}|[^\s]*)"
+                         r"(?:\s+(?:chord|triad))?(?:\s+notes)?", text, flags)
+    if match and re.fullmatch(r"[A-G]", match.group(1)[0]):
+        root = parse_note(match.group(1))
+        suffix_text = match.group(2)
+        has_chord_word = re.search(r"\b(?:chord|triad)\b", text, flags)
+        suffix = CHORD_SUFFIX_ALIASES.get(suffix_text, CHORD_SUFFIX_ALIASES.get(suffix_text.lower()))
+        # A bare "C major" is a key, only treat it as a chord with a symbol or the word "chord"
+        if root and suffix is not None and (has_chord_word or (suffix_text and not suffix_text.isalpha())
+                                            or suffix_text in ("m", "maj7", "m7", "dim", "aug", "sus2", "sus4",
+                                                               "dim7", "maj9", "m9", "add9", "m6", "min7", "sus")):
+            return answer_chord_notes(root, suffix)
+
+    # Intervals: "interval between F and B", "what interval is C to G"
+    match = re.fullmatch(WHAT + rf"(?:the\s+)?interval\s+(?:between|from|is)\s+({NOTE_PATTERN})\s+(?:and|to|up to)\s+({NOTE_PATTERN})",
+                         text, flags)
+    if match:
+        lower, upper = parse_note(match.group(1)), parse_note(match.group(2))
+        if lower and upper:
+            return answer_interval(lower, upper)
+
+    # Key signatures: "key signature of Eb major", "how many sharps in A major"
+    match = re.fullmatch(WHAT + rf"(?:the\s+)?key\s+signature\s+(?:of|for)\s+({NOTE_PATTERN})\s+(major|minor)", text, flags) or \
+        re.fullmatch(rf"how\s+many\s+(?:sharps|flats|sharps\s+or\s+flats|accidentals)\s+(?:are\s+)?(?:in|does)\s+({NOTE_PATTERN})\s+(major|minor)(?:\s+have)?",
+                     text, flags)
+    if match:
+        tonic = parse_note(match.group(1))
+        if tonic:
+            return answer_key_signature(tonic, match.group(2).lower())
+
+    match = re.fullmatch(r"(?:what|which)\s+(major\s+|minor\s+)?key\s+has\s+(\d|one|two|three|four|five|six|seven|no)\s+(sharp|flat)s?", text, flags)
+    if match:
+        words = {"no": 0, "one": 1, "two": 2, "three": 3, "four": 4, "five": 5, "six": 6, "seven": 7}
+        count_text = match.group(2).lower()
+        count = int(count_text) if count_text.isdigit() else words[count_text]
+        return answer_key_from_signature(count, match.group(3).lower(), (match.group(1) or "major").strip().lower())
+
+    # Diatonic chords: "diatonic chords in D major", "seventh chords of A harmonic minor"
+    match = re.fullmatch(LEAD_IN + WHAT + r"(?:the\s+)?(?:diatonic\s+)?(chords|triads|seventh\s+chords|7th\s+chords)\s+(?:in|of)\s+"
+                         rf"(?:the\s+key\s+of\s+)?({NOTE_PATTERN})\s+(major|minor|harmonic\s+minor)", text, flags)
+    if match:
+        tonic = parse_note(match.group(2))
+        if tonic:
+            sevenths = "seventh" in match.group(1).lower() or "7th" in match.group(1).lower()
+            return answer_diatonic(tonic, " ".join(match.group(3).lower().split()), sevenths)
+
+    # Roman numeral progressions: "ii-V-I in C", "I vi IV V in G major"
+    match = re.fullmatch(r"(?:(?:the\s+)?(?:chords\s+(?:of|for)\s+)?(?:a\s+)?)?([b♭#♯]?[IViv]+[°ø+]?(?:maj7|7)?(?:[\s–—-]+[b♭#♯]?[IViv]+[°ø+]?(?:maj7|7)?)+)"
+                         rf"(?:\s+progression)?\s+in\s+({NOTE_PATTERN})(?:\s+(major|minor))?", text)
+    if match:
+        numerals = [n for n in re.split(r"[\s–—-]+", match.group(1)) if n]
+        tonic = parse_note(match.group(2))
+        if tonic:
+            return answer_progression(numerals, tonic, (match.group(3) or "major").lower())
+
+    # Transposition: "transpose C E G up a major third", "transpose Dm7 G7 Cmaj7 from C to Eb"
+    match = re.fullmatch(r"transpose\s+(.+?)\s+(up|down)\s+(?:by\s+)?(?:an?\s+)?(.+)", text, flags)
+    if match:
+        items = parse_items(match.group(1))
+        interval_name = _expand_interval_abbreviation(match.group(3))
+        interval = parse_interval_name(interval_name)
+        if items and interval:
+            number, semitones = interval
+            down = match.group(2).lower() == "down"
+            interval_name = interval_name.strip().lower()
+            # "up a major third", but "up 3 semitones"
+            if not interval_name[0].isdigit():
+                interval_name = f"{_article(interval_name)} {interval_name}"
+            return answer_transposition(items, number, semitones, down, f"{match.group(2).lower()} {interval_name}")
+
+    match = re.fullmatch(rf"transpose\s+(.+?)\s+(?:from\s+({NOTE_PATTERN})\s+)?to\s+({NOTE_PATTERN})(?:\s+(?:major|minor))?", text, flags)
+    if match:
+        items = parse_items(match.group(1))
+        if items:
+            source = parse_note(match.group(2)) if match.group(2) else items[0][0]
+            target = parse_note(match.group(3))
+            if source and target:
+                quality, number, semitones = interval_between(source, target)
+                return answer_transposition(items, number, semitones, False, f"from {source} to {target}")
+
+    return None
+
+def _expand_interval_abbreviation(text):
+    """Expand case-sensitive abbreviations such as "M3" (major third) and "m6" (minor sixth)."""
+    match = re.fullmatch(r"([PMmAd])(\d)", text.strip())
+    if not match:
+        return text
+    quality = {"P": "perfect", "M": "major", "m": "minor", "A": "augmented", "d": "diminished"}[match.group(1)]
+    number = int(match.group(2))
+    return f"{quality} {INTERVAL_NAMES.get(number, match.group(2))}"
@@ -0,0 +1,215 @@
+"""
+Text-to-speech worker for Music Theory AI Chat.
+This module owns a single pyttsx3 engine on a long-lived thread. Voices are
+discovered once, the selected voice, rate and volume persist between calls
+(and sessions), and utterances are queued so they can be skipped or cancelled.
+"""
+
+import json
+import os
+import queue
+import threading
+from concurrent.futures import Future
+
+from audio_cache import make_audio_key
+from speech_output import chunk_sentences
+
+DEFAULT_SETTINGS = {"voice": None, "rate": 150, "volume": 1.0}
+
+class TTSWorker:
+    """
+    Speaks queued text with one pyttsx3 engine on a background thread.
+    """
+
+    def __init__(self, settings_path=None, audio_cache=None, play_file=None):
+        """
+        Args:
+            settings_path (str, optional): JSON file the voice settings are kept in
+            audio_cache (AudioCache, optional): Cache for synthesized chunks
+            play_file: Function that plays an audio file; cached audio is only used with it
+        """
+        self.settings_path = settings_path
+        self.audio_cache = audio_cache
+        self.play_file = play_file
+        self.settings = dict(DEFAULT_SETTINGS)
+        if settings_path and os.path.exists(settings_path):
+            try:
+                with open(settings_path, 'r', encoding='utf-8') as f:
+                    self.settings.update(json.load(f))
+            except (json.JSONDecodeError, IOError):
+                pass
+
+        self.voices = []
+        self.available = False
+        self.error = None
+        self.ready = threading.Event()
+        self.queue = queue.Queue()
+        # Incremented by cancel/skip; an utterance stops when the generation changes
+        self._generation = 0
+        self._lock = threading.Lock()
+        self.engine = None
+        self.thread = threading.Thread(target=self._run, name="tts-worker", daemon=True)
+        self.thread.start()
+
+    def _save_settings(self):
+        if not self.settings_path:
+            return
+        try:
+            with open(self.settings_path, 'w', encoding='utf-8') as f:
+                json.dump(self.settings, f, indent=2)
+        except IOError:
+            pass
+
+    def _start_engine(self):
+        import pyttsx3
+
+        self.engine = pyttsx3.init()
+        # Voice discovery is slow on some drivers (espeak), so it happens once
+        self.voices = [(voice.id, voice.name) for voice in self.engine.getProperty('voices') or []]
+        if not self.settings["voice"] or self.settings["voice"] not in [v[0] for v in self.voices]:
+            self.settings["voice"] = None
+            if len(self.voices) > 1:  # If multiple voices are available
+                # Try to find a female voice which is often clearer
+                for voice_id, name in self.voices:
+                    if "female" in name.lower():
+                        self.settings["voice"] = voice_id
+                        break
+        if self.settings["voice"]:
+            self.engine.setProperty('voice', self.settings["voice"])
+        else:
+            self.settings["voice"] = self.engine.getProperty('voice')
+
+    def _run(self):
+        try:
+            self._start_engine()
+            self.available = True
+        except Exception as e:
+            self.error = e
+        finally:
+            self.ready.set()
+
+        while True:
+            text, rate, volume, generation, future = self.queue.get()
+            if text is None:
+                return
+            try:
+                if not self.available:
+                    future.set_result(False)
+                elif generation != self._generation:
+                    # Cancelled while waiting in the queue
+                    future.set_result(False)
+                else:
+                    future.set_result(self._speak(text, rate, volume, generation))
+            except Exception as e:
+                future.set_exception(e)
+
+    def _speak(self, text, rate, volume, generation):
+        rate = rate if rate is not None else self.settings["rate"]
+        volume = volume if volume is not None else self.settings["volume"]
+        voice = self.settings["voice"]
+        self.engine.setProperty('voice', voice)
+        self.engine.setProperty('rate', rate)
+        self.engine.setProperty('volume', volume)
+
+        # Sentence-aware chunks, so skip and cancel take effect at the next chunk
+        for chunk in chunk_sentences(text) or [text]:
+            if generation != self._generation:
+                return False
+            if self.audio_cache and self.play_file:
+                def synthesize(path):
+                    self.engine.save_to_file(chunk, path)
+                    self.engine.runAndWait()
+
+                key = make_audio_key("pyttsx3", voice, rate, volume, chunk)
+                audio_file = self.audio_cache.fetch(key, ".wav", synthesize)
+                if audio_file:
+                    self.play_file(audio_file)
+                    continue
+            self.engine.say(chunk)
+            self.engine.runAndWait()
+        return generation == self._generation
+
+    def wait_ready(self, timeout=10):
+        """
+        Wait until the engine is initialized.
+
+        Returns:
+            bool: True if the engine is available
+        """
+        self.ready.wait(timeout)
+        return self.available
+
+    def speak(self, text, rate=None, volume=None):
+        """
+        Queue text for speaking.
+
+        Args:
+            text (str): Text to speak
+            rate (int, optional): Rate for this utterance only (default: saved setting)
+            volume (float, optional): Volume for this utterance only (default: saved setting)
+
+        Returns:
+            Future: Resolves to True when spoken completely, False if skipped or unavailable
+        """
+        future = Future()
+        with self._lock:
+            self.queue.put((text, rate, volume, self._generation, future))
+        return future
+
+    def list_voices(self):
+        """Return the discovered voices as (id, name) pairs."""
+        self.wait_ready()
+        return list(self.voices)
+
+    def configure(self, voice=None, rate=None, volume=None):
+        """
+        Change and persist the voice settings.
+
+        Args:
+            voice (str, optional): Voice id
+            rate (int, optional): Speech rate
+            volume (float, optional): Volume level (0.0 to 1.0)
+        """
+        if voice is not None:
+            self.settings["voice"] = voice
+        if rate is not None:
+            self.settings["rate"] = rate
+        if volume is not None:
+            self.settings["volume"] = volume
+        self._save_settings()
+
+    def _stop_engine(self):
+        if self.engine is not None:
+            try:
+                self.engine.stop()
+            except Exception:
+                pass
+
+    def skip(self):
+        """Stop the current utterance; queued ones continue."""
+        with self._lock:
+            self._generation += 1
+            # Utterances queued before the skip move to the new generation and still play
+            pending = []
+            while True:
+                try:
+                    pending.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            for text, rate, volume, _, future in pending:
+                self.queue.put((text, rate, volume, self._generation, future))
+        self._stop_engine()
+
+    def cancel(self):
+        """Stop the current utterance and drop everything queued."""
+        with self._lock:
+            self._generation += 1
+        self._stop_engine()
+
+    def pending(self):
+        """Number of utterances waiting to be spoken."""
+        return self.queue.qsize()
+
+    def shutdown(self):
+        """Stop the worker thread after the queued utterances."""
+        self.queue.put((None, None, None, None, None))
@@ -0,0 +1,173 @@
+"""
+Per-turn latency metrics for Music Theory AI Chat.
+This module measures where the time of a chat turn goes (time to first token,
+streaming, post-processing), keeps the results for the 'stats' command and
+appends them to a JSONL metrics file that can be graphed.
+"""
+
+import json
+import os
+import threading
+import time
+
+from context_window import estimate_tokens
+
+def percentile(values, pct):
+    """
+    Compute a percentile with linear interpolation.
+
+    Args:
+        values (list): Numbers
+        pct (float): Percentile between 0 and 100
+
+    Returns:
+        float: The percentile, or None for an empty list
+    """
+    if not values:
+        return None
+    ordered = sorted(values)
+    position = (len(ordered) - 1) * pct / 100.0
+    lower = int(position)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+class TurnTimer:
+    """
+    Collects timestamps for a single chat turn.
+    """
+
+    def __init__(self, model, topic):
+        self.model = model
+        self.topic = topic
+        self.cached = False
+        self.start = time.perf_counter()
+        self.first_token = None
+        self.last_token = None
+        self.stream_end = None
+        self.chunks = 0
+        self.characters = 0
+        self.gaps = []
+        self.postprocess = 0.0
+
+    def token(self, content):
+        """Record the arrival of a content chunk."""
+        now = time.perf_counter()
+        if self.first_token is None:
+            self.first_token = now
+        else:
+            self.gaps.append(now - self.last_token)
+        self.last_token = now
+        self.chunks += 1
+        self.characters += len(content)
+
+    def end_stream(self):
+        """Record the end of the stream."""
+        self.stream_end = time.perf_counter()
+
+    def add_postprocess(self, seconds):
+        """Add time spent after the stream (Markdown rendering, URL extraction)."""
+        self.postprocess += seconds
+
+    def finish(self, response=""):
+        """
+        Build the metrics record for the turn.
+
+        Args:
+            response (str): The complete response, used for the token count
+
+        Returns:
+            dict: Metrics of the turn
+        """
+        end = time.perf_counter()
+        stream_end = self.stream_end or end
+        first_token = self.first_token or stream_end
+        tokens = estimate_tokens(response)
+        generation_time = stream_end - first_token
+        return {
+            "timestamp": time.time(),
+            "model": self.model,
+            "topic": self.topic,
+            "cached": self.cached,
+            "ttft_s": round(first_token - self.start, 4),
+            "stream_s": round(stream_end - self.start, 4),
+            "chunks": self.chunks,
+            "tokens": tokens,
+            "tokens_per_s": round(tokens / generation_time, 2) if generation_time > 0 else None,
+            "gap_mean_s": round(sum(self.gaps) / len(self.gaps), 4) if self.gaps else None,
+            "gap_p90_s": round(percentile(self.gaps, 90), 4) if self.gaps else None,
+            "gap_max_s": round(max(self.gaps), 4) if self.gaps else None,
+            "postprocess_s": round(self.postprocess, 4),
+            "turn_s": round(end - self.start, 4),
+        }
+
+class MetricsStore:
+    """
+    Keeps the metrics of this session and appends them to a JSONL file.
+    """
+
+    def __init__(self, metrics_path=None):
+        self.metrics_path = metrics_path
+        self.records = []
+        self._lock = threading.Lock()
+
+    def record(self, metrics):
+        """
+        Store the metrics of a turn.
+
+        Args:
+            metrics (dict): Record from TurnTimer.finish
+        """
+        with self._lock:
+            self.records.append(metrics)
+            if self.metrics_path:
+                try:
+                    with open(self.metrics_path, 'a', encoding='utf-8') as f:
+                        f.write(json.dumps(metrics) + "\n")
+                except IOError:
+                    pass
+
+    def summary(self, group_by):
+        """
+        Summarize the session's turns by model or topic.
+
+        Args:
+            group_by (str): "model" or "topic"
+
+        Returns:
+            dict: Per group: number of turns and p50/p90/p99 of the main timings
+        """
+        with self._lock:
+            records = list(self.records)
+        groups = {}
+        for record in records:
+            groups.setdefault(record[group_by], []).append(record)
+
+        summary = {}
+        for name, group in groups.items():
+            entry = {"turns": len(group), "cached": sum(1 for r in group if r["cached"])}
+            for field in ("ttft_s", "tokens_per_s", "turn_s", "postprocess_s"):
+                values = [r[field] for r in group if r[field] is not None]
+                entry[field] = {pct: percentile(values, pct) for pct in (50, 90, 99)}
+            summary[name] = entry
+        return summary
+
+def load_metrics(metrics_path):
+    """
+    Read all records from a metrics file.
+
+    Args:
+        metrics_path (str): Path to the JSONL metrics file
+
+    Returns:
+        list: Metrics records
+    """
+    if not os.path.exists(metrics_path):
+        return []
+    records = []
+    with open(metrics_path, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                records.append(json.loads(line))
+            except json.JSONDecodeError:
+                continue
+    return records
@@ -0,0 +1,226 @@
+"""
+Voice input for Music Theory AI Chat.
+This module listens to the microphone in the background with a recognizer
+that is calibrated once (the energy threshold is kept between sessions) and
+transcribes phrases on a worker thread, online (Google) or offline-first
+(Sphinx), so recognized text reaches the chat as soon as the speaker stops.
+"""
+
+import json
+import os
+import queue
+import threading
+import time
+
+# Seconds of silence that end a phrase (SpeechRecognition's default is 0.8)
+PAUSE_THRESHOLD = 0.5
+# Longest phrase that is recorded in one piece
+PHRASE_TIME_LIMIT = 15
+# Seconds of ambient noise measured during calibration
+CALIBRATION_SECONDS = 1.0
+
+class VoiceListener:
+    """
+    Background microphone listener with a recognition worker thread.
+    """
+
+    def __init__(self, settings_path=None):
+        """
+        Args:
+            settings_path (str, optional): JSON file for the calibrated threshold and options
+        """
+        import speech_recognition as sr
+
+        self.sr = sr
+        self.settings_path = settings_path
+        self.settings = {"energy_threshold": None, "offline_first": False}
+        if settings_path and os.path.exists(settings_path):
+            try:
+                with open(settings_path, 'r', encoding='utf-8') as f:
+                    self.settings.update(json.load(f))
+            except (json.JSONDecodeError, IOError):
+                pass
+
+        self.recognizer = sr.Recognizer()
+        self.recognizer.pause_threshold = PAUSE_THRESHOLD
+        self.recognizer.non_speaking_duration = min(self.recognizer.non_speaking_duration, PAUSE_THRESHOLD)
+        self.recognizer.dynamic_energy_threshold = True
+        if self.settings["energy_threshold"]:
+            self.recognizer.energy_threshold = self.settings["energy_threshold"]
+
+        self.microphone = None
+        self.on_text = None
+        self.on_error = None
+        # Incremented whenever the callbacks change; phrases captured for older callbacks are dropped
+        self._generation = 0
+        self._callback_lock = threading.Lock()
+        self._stop_listening = None
+        self._audio = queue.Queue()
+        self.stats = {"phrases": 0, "recognized": 0, "latency_total": 0.0, "dropped": 0}
+        self._worker = threading.Thread(target=self._recognize_loop, name="voice-recognition", daemon=True)
+        self._worker.start()
+
+    @property
+    def listening(self):
+        return self._stop_listening is not None
+
+    @property
+    def calibrated(self):
+        return bool(self.settings["energy_threshold"])
+
+    def _save_settings(self):
+        if not self.settings_path:
+            return
+        try:
+            with open(self.settings_path, 'w', encoding='utf-8') as f:
+                json.dump(self.settings, f, indent=2)
+        except IOError:
+            pass
+
+    def _get_microphone(self):
+        if self.microphone is None:
+            self.microphone = self.sr.Microphone()
+        return self.microphone
+
+    def calibrate(self, force=False):
+        """
+        Measure the ambient noise once and keep the energy threshold.
+
+        Args:
+            force (bool): Calibrate again even if a threshold was saved
+
+        Returns:
+            float: The energy threshold
+
+        Raises:
+            RuntimeError: If continuous listening holds the microphone
+        """
+        if self.calibrated and not force:
+            return self.recognizer.energy_threshold
+        # The listening thread has the microphone open, and a source cannot be entered twice
+        if self.listening:
+            raise RuntimeError("stop continuous listening ('voice listen off') before calibrating")
+        with self._get_microphone() as source:
+            self.recognizer.adjust_for_ambient_noise(source, duration=CALIBRATION_SECONDS)
+        self.settings["energy_threshold"] = self.recognizer.energy_threshold
+        self._save_settings()
+        return self.recognizer.energy_threshold
+
+    def set_offline_first(self, offline_first):
+        """Prefer offline Sphinx recognition over the Google web service."""
+        self.settings["offline_first"] = offline_first
+        self._save_settings()
+
+    def _recognizers(self):
+        online = ("google", self.recognizer.recognize_google)
+        offline = ("sphinx", getattr(self.recognizer, "recognize_sphinx", None))
+        order = [offline, online] if self.settings["offline_first"] else [online, offline]
+        return [(name, fn) for name, fn in order if fn is not None]
+
+    def transcribe(self, audio):
+        """
+        Turn recorded audio into text.
+
+        Returns:
+            tuple: (text, engine name), or (None, None) if nothing was understood
+        """
+        for name, recognize in self._recognizers():
+            try:
+                text = recognize(audio)
+            except self.sr.UnknownValueError:
+                continue
+            except (self.sr.RequestError, OSError, LookupError):
+                # Service unreachable or offline models missing, try the next engine
+                continue
+            if text and text.strip():
+                return text.strip(), name
+        return None, None
+
+    def _set_callbacks(self, on_text, on_error):
+        with self._callback_lock:
+            self._generation += 1
+            self.on_text, self.on_error = on_text, on_error
+
+    def _current_callbacks(self, generation):
+        """The callbacks for a phrase, or (None, None) if they changed since it was captured."""
+        with self._callback_lock:
+            if generation != self._generation:
+                return None, None
+            return self.on_text, self.on_error
+
+    def _on_audio(self, recognizer, audio):
+        # Runs on the listening thread: hand the phrase off immediately
+        self._audio.put((time.perf_counter(), self._generation, audio))
+
+    def _recognize_loop(self):
+        while True:
+            captured_at, generation, audio = self._audio.get()
+            self.stats["phrases"] += 1
+            try:
+                text, engine = self.transcribe(audio)
+            except Exception as e:
+                _, on_error = self._current_callbacks(generation)
+                if on_error:
+                    on_error(e)
+                continue
+            if not text:
+                continue
+            latency = time.perf_counter() - captured_at
+            self.stats["recognized"] += 1
+            self.stats["latency_total"] += latency
+            on_text, _ = self._current_callbacks(generation)
+            if on_text:
+                on_text(text, engine, latency)
+            else:
+                # E.g. a push-to-talk phrase recognized after listen_once timed out
+                self.stats["dropped"] += 1
+
+    def start(self, on_text, on_error=None):
+        """
+        Listen continuously in the background.
+
+        Args:
+            on_text: Callback receiving (text, engine name, seconds from end of phrase to text)
+            on_error: Optional callback receiving recognition errors
+        """
+        self._set_callbacks(on_text, on_error)
+        if self._stop_listening is None:
+            self.calibrate()
+            self._stop_listening = self.recognizer.listen_in_background(
+                self._get_microphone(), self._on_audio, phrase_time_limit=PHRASE_TIME_LIMIT)
+
+    def stop(self):
+        """Stop background listening, waiting until the listening thread has released the microphone."""
+        if self._stop_listening is not None:
+            self._stop_listening(wait_for_stop=True)
+            self._stop_listening = None
+
+    def listen_once(self, timeout=10):
+        """
+        Push-to-talk: listen until one phrase is recognized.
+
+        Args:
+            timeout (float): Seconds to wait for a recognized phrase
+
+        Returns:
+            tuple: (text, engine name, latency), or None on timeout
+        """
+        result = queue.Queue()
+        previous = self.on_text, self.on_error
+        was_listening = self.listening
+        self.start(lambda text, engine, latency: result.put((text, engine, latency)), previous[1])
+        try:
+            return result.get(timeout=timeout)
+        except queue.Empty:
+            return None
+        finally:
+            if not was_listening:
+                self.stop()
+            # A phrase still being recognized now belongs to an old generation and is dropped
+            self._set_callbacks(*previous)
+
+    def mean_latency(self):
+        """Average seconds from the end of a phrase to its recognized text."""
+        if not self.stats["recognized"]:
+            return None
+        return self.stats["latency_total"] / self.stats["recognized"]